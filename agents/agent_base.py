@@ -2,14 +2,77 @@ import openai
 from abc import ABC, abstractmethod
 import os
 from loguru import logger
+from utils.circuit_breaker import breakers
+from utils.hedging import latency_tracker
+from utils.logger import preview, sample_payloads
+from utils.model_router import router
+from utils.ollama_pool import ollama_pool
+from utils.retry import groq_rate_limiter, retry_policy
+from utils.scheduler import scheduler
+from utils.tokens import estimate_message_tokens, estimate_tokens
+from utils.tracing import current_span, propagate, tracer
+from utils.warmup import KEEP_ALIVE
 from dotenv import load_dotenv
 import requests
 import json
+import queue
+import socket
+import threading
+import time
 
 load_dotenv()
 
 openai.base_url = os.getenv("GROQ_API_BASE")
 openai.api_key = os.getenv("GROQ_API_KEY")
+# Retries are handled by AgentBase, with backoff and rate limiting
+openai.max_retries = 0
+openai.timeout = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+
+
+class StreamCancel:
+    """
+    Cancels a streaming call from another thread
+    The stream attaches its open response; cancel() shuts that connection's socket down,
+    so a read blocked waiting for the next chunk fails at once instead of at the read timeout.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, connection):
+        """Register the open response (a requests.Response or an openai Stream)"""
+        with self._lock:
+            self._connection = connection
+            if self._event.is_set():
+                self._abort(connection)
+
+    def detach(self):
+        """Called before the response is closed, as its connection may then go back to a pool"""
+        with self._lock:
+            self._connection = None
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            if self._connection is not None:
+                self._abort(self._connection)
+
+    @staticmethod
+    def _abort(connection):
+        try:
+            if isinstance(connection, requests.Response):
+                sock = connection.raw._fp.fp.raw._sock
+            else:
+                sock = connection.response.extensions["network_stream"].get_extra_info("socket")
+            # shutdown, unlike close, also wakes a recv blocked in the streaming thread
+            sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, KeyError, OSError):
+            pass  # Already finished or closed
 
 
 class AgentBase(ABC):
@@ -17,45 +80,103 @@ class AgentBase(ABC):
         self.name = name
         self.max_retries = max_retries
         self.verbose = verbose
-        self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        # OLLAMA_BASE_URLS (comma-separated) spreads requests over several servers
+        self.ollama_pool = ollama_pool
+        self.ollama_base_url = ollama_pool.endpoints[0]
+        # (connect, read) timeouts for Ollama; the read timeout applies between streamed chunks
+        self.ollama_timeout = (
+            float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            float(os.getenv("LLM_READ_TIMEOUT", "120")),
+        )
+        # Defaults; the model of each call is picked by utils.model_router from model_routes.json
         self.ollama_model = os.getenv("OLLAMA_MODEL", "tinyllama:latest").strip('"')
+        self.openai_model = os.getenv("GROQ_MODEL", "llama-3.2-3b-preview")
+        self.ollama_num_ctx = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+        # Scheduling class for this agent's LLM calls: interactive, default or batch.
+        # Bulk callers lower it per agent or pass priority= per call.
+        self.priority = os.getenv("LLM_PRIORITY", "interactive")
+        # Race the other backend when the first is slow to start answering
+        self.hedge = os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
         self.logger = logger
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every agent's execute runs in its own span
+        if "execute" in cls.__dict__:
+            cls.execute = tracer.traced(f"{cls.__name__}.execute", kind="agent")(cls.__dict__["execute"])
+
     @abstractmethod
     def execute(self, *args, **kwargs):
         pass
 
-    def call_ollama(self, messages, max_tokens=150, temperature=0.0):
+    def call_ollama(self, messages, max_tokens=150, temperature=0.0, priority=None, hedge=None, model=None):
+        """model overrides the router, for callers that sized their prompt for a particular model"""
+        with tracer.span("llm.ollama", kind="llm", agent=self.name, max_tokens=max_tokens):
+            if self.hedge if hedge is None else hedge:
+                return self._hedged_call("ollama", messages, max_tokens, temperature, priority or self.priority, model)
+            # Refuse before queueing when the backend is known to be down
+            breakers["ollama"].before_call()
+            with scheduler.slot("ollama", priority or self.priority):
+                return self._call_ollama(messages, max_tokens, temperature, model)
+
+    def _route(self, backend, messages, max_tokens):
+        """Model for this call, by prompt size, max_tokens and the agent's latency target"""
+        default = self.ollama_model if backend == "ollama" else self.openai_model
+        return router.choose(backend, self.name, estimate_message_tokens(messages), max_tokens, default)
+
+    def _log_messages(self, messages):
+        """Message bodies at DEBUG level, size-capped and only formatted when a sink takes them"""
+        if sample_payloads():
+            for message in messages:
+                self.logger.opt(lazy=True).debug(
+                    "[{}] {}", lambda: message["role"].upper(), lambda: preview(message["content"])
+                )
+
+    def _log_reply(self, content):
+        if sample_payloads():
+            self.logger.opt(lazy=True).debug("[{}] Reply: {}", lambda: self.name, lambda: preview(content))
+
+    def ollama_num_ctx_for(self, model):
+        """Context window to request for model: OLLAMA_NUM_CTX, capped at what the model supports"""
+        return min(self.ollama_num_ctx, router.context_window(model))
+
+    def _ollama_payload(self, messages, max_tokens, temperature, stream, model=None):
+        model = model or self.ollama_model
+        return {
+            "model": model,
+            "messages": messages,
+            "options": {
+                "num_predict": max_tokens,
+                "num_ctx": self.ollama_num_ctx_for(model),
+                "temperature": temperature,
+                "top_k": 10,  # Limit token selection to top 10 most likely
+                "top_p": 0.9  # Sample from 90% most likely tokens
+            },
+            "stream": stream,
+            # Keep the model resident between calls instead of reloading it after idle
+            "keep_alive": KEEP_ALIVE,
+        }
+
+    def _call_ollama(self, messages, max_tokens=150, temperature=0.0, model=None):
+        model = model or self._route("ollama", messages, max_tokens)
+        current_span().set(backend="ollama", model=model)
         retries = 0
         while retries < self.max_retries:
+            breakers["ollama"].before_call()
+            endpoint = self.ollama_pool.acquire(model)
             try:
                 if self.verbose:
-                    self.logger.info(f"\n{'='*50}")
-                    self.logger.info(f"[{self.name}] Sending message to Ollama:")
-                    self.logger.info(f"Model: {self.ollama_model}")
-                    self.logger.info(f"Temperature: {temperature}")
-                    self.logger.info(f"Max tokens: {max_tokens}")
-                    self.logger.info("Model being used: {self.ollama_model}")
-                    self.logger.info(f"Model path: {self.ollama_base_url}/api/chat")
-                    self.logger.info("\nMessages:")
-                    for msg in messages:
-                        self.logger.info(f"\n[{msg['role'].upper()}]")
-                        self.logger.info(f"{msg['content']}")
-                    self.logger.info(f"\n{'='*50}")
+                    self.logger.info(
+                        f"[{self.name}] Sending {len(messages)} messages to Ollama "
+                        f"({model} at {endpoint}/api/chat, temperature {temperature}, max tokens {max_tokens})"
+                    )
+                    self._log_messages(messages)
 
+                started = time.perf_counter()
                 response = requests.post(
-                    f"{self.ollama_base_url}/api/chat",
-                    json={
-                        "model": self.ollama_model,
-                        "messages": messages,
-                        "options": {
-                            "num_predict": max_tokens,
-                            "temperature": temperature,
-                            "top_k": 10,  # Limit token selection to top 10 most likely
-                            "top_p": 0.9  # Sample from 90% most likely tokens
-                        },
-                        "stream": False  # Disable streaming to get a single response
-                    }
+                    f"{endpoint}/api/chat",
+                    json=self._ollama_payload(messages, max_tokens, temperature, stream=False, model=model),
+                    timeout=self.ollama_timeout,
                 )
                 
                 if response.status_code != 200:
@@ -65,56 +186,371 @@ class AgentBase(ABC):
                         error_msg += f": {json.dumps(error_json)}"
                     except:
                         error_msg += f": {response.text}"
-                    raise Exception(error_msg)
+                    raise requests.HTTPError(error_msg, response=response)
                 
                 response.raise_for_status()
                 
                 # Get the last message from the response
                 reply = response.json()
                 content = reply.get('message', {}).get('content', '')
+                # Ollama reports token counts and durations in nanoseconds
+                current_span().set(
+                    prompt_tokens=reply.get('prompt_eval_count', 0),
+                    completion_tokens=reply.get('eval_count', 0),
+                ).mark_first_token(reply.get('eval_duration', 0) / 1e9)
+                router.record(
+                    model,
+                    reply.get('prompt_eval_count', 0), reply.get('prompt_eval_duration', 0) / 1e9,
+                    reply.get('eval_count', 0), reply.get('eval_duration', 0) / 1e9,
+                )
+                # Time to first token: everything but the decode
+                latency_tracker.record(
+                    "ollama", max(time.perf_counter() - started - reply.get('eval_duration', 0) / 1e9, 0.0)
+                )
                 
                 if self.verbose:
-                    self.logger.info(f"\n{'='*50}")
-                    self.logger.info(f"[{self.name}] Ollama replied:")
-                    self.logger.info(f"\n{content}")
-                    self.logger.info(f"\n{'='*50}")
+                    self.logger.info(f"[{self.name}] Ollama replied with {len(content)} chars")
+                    self._log_reply(content)
+                self.ollama_pool.release(endpoint, model)
+                breakers["ollama"].record_success()
                 return content
             except Exception as e:
+                self.ollama_pool.release(endpoint, model, e)
                 retries += 1
                 self.logger.error(
                     f"[{self.name}] Error calling Ollama: {e}, Retry {retries}/{self.max_retries}"
                 )
+                self._backoff(e, retries, "Ollama")
                 continue
         raise Exception(
             f"[{self.name}] Failed to call Ollama after {self.max_retries} retries"
         )
 
-    def call_openai(self, messages, max_tokens=150, temperature=0.7):
+    def call_openai(self, messages, max_tokens=150, temperature=0.7, priority=None, hedge=None):
+        with tracer.span("llm.openai", kind="llm", agent=self.name, max_tokens=max_tokens):
+            if self.hedge if hedge is None else hedge:
+                return self._hedged_call("openai", messages, max_tokens, temperature, priority or self.priority)
+            # Refuse before queueing when the backend is known to be down
+            breakers["openai"].before_call()
+            with scheduler.slot("openai", priority or self.priority):
+                return self._call_openai(messages, max_tokens, temperature)
+
+    def _call_openai(self, messages, max_tokens=150, temperature=0.7):
+        model = self._route("openai", messages, max_tokens)
+        current_span().set(backend="openai", model=model)
         retries = 0
         while retries < self.max_retries:
+            breakers["openai"].before_call()
             try:
                 if self.verbose:
-                    self.logger.info(f"[{self.name}] Sending message to OpenAi:")
-                    for message in messages:
-                        self.logger.debug(f"{message['role']}: {message['content']}")
+                    self.logger.info(f"[{self.name}] Sending {len(messages)} messages to OpenAi ({model})")
+                    self._log_messages(messages)
 
+                groq_rate_limiter.acquire(estimate_message_tokens(messages) + max_tokens)
+                started = time.perf_counter()
                 response = openai.chat.completions.create(
-                    model="llama-3.2-3b-preview",
+                    model=model,
                     messages=messages,
                     max_tokens=max_tokens,
                     temperature=temperature,
                 )
                 reply = response.choices[0].message
+                self._record_openai_usage(model, response, time.perf_counter() - started)
                 if self.verbose:
-                    self.logger.info(f"[{self.name}] OpenAi replied: {reply.content}")
+                    self.logger.info(f"[{self.name}] OpenAi replied with {len(reply.content or '')} chars")
+                    self._log_reply(reply.content)
+                breakers["openai"].record_success()
                 return reply.content
             except Exception as e:
                 retries += 1
                 self.logger.error(
                     f"[{self.name}] Error calling OpenAI: {e}, Retry {retries}/{self.max_retries}"
                 )
-                retries += 1
+                self._backoff(e, retries, "OpenAI")
                 continue
         raise Exception(
             f"[{self.name}] Failed to call OpenAI after {self.max_retries} retries"
         )
+
+    def _record_openai_usage(self, model, response, elapsed):
+        usage = getattr(response, "usage", None)
+        completion_time = getattr(usage, "completion_time", None)
+        # Time to first token: everything but the decode, when Groq reports it
+        latency_tracker.record("openai", max(elapsed - (completion_time or 0.0), 0.0))
+        if usage is None:
+            return
+        span = current_span().set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        if completion_time:
+            span.mark_first_token(completion_time)
+        # Groq reports prompt and completion times; otherwise the wall time is all we have
+        router.record(
+            model,
+            usage.prompt_tokens or 0, getattr(usage, "prompt_time", None) or 0.0,
+            usage.completion_tokens or 0, completion_time or elapsed,
+        )
+
+    def _backoff(self, error, retries, backend):
+        """Wait before the next attempt, or fail fast when retrying cannot help"""
+        breakers[backend.lower()].record_failure(error)
+        current_span().incr("retries")
+        if not retry_policy.is_retryable(error):
+            raise Exception(f"[{self.name}] Non-retryable error from {backend}: {error}") from error
+        if retries >= self.max_retries:
+            return
+        delay = retry_policy.delay(error, retries)
+        if backend == "OpenAI" and retry_policy.is_rate_limited(error):
+            # Hold back every caller, not just this one, until the limit resets
+            groq_rate_limiter.pause(delay)
+        time.sleep(delay)
+
+    def stream_openai(self, messages, max_tokens=150, temperature=0.7, priority=None):
+        """Yield the OpenAI reply chunk by chunk as it is generated"""
+        model = self._route("openai", messages, max_tokens)
+        # Not activated: the span stays open across yields into the caller's code
+        with tracer.span(
+            "llm.openai.stream", kind="llm", activate=False, agent=self.name, max_tokens=max_tokens,
+            backend="openai", model=model, prompt_tokens=estimate_message_tokens(messages),
+        ) as span:
+            # The slot is held until the stream is exhausted or closed
+            with scheduler.slot("openai", priority or self.priority):
+                completion_tokens = 0
+                try:
+                    for delta in self._stream_openai(messages, max_tokens, temperature, model):
+                        span.mark_first_token()
+                        completion_tokens += estimate_tokens(delta)
+                        yield delta
+                finally:
+                    span.set(completion_tokens=completion_tokens)
+
+    def _stream_openai(self, messages, max_tokens=150, temperature=0.7, model=None, cancel=None):
+        """cancel, a StreamCancel, lets another thread abandon the call, ending the stream quietly"""
+        model = model or self._route("openai", messages, max_tokens)
+        retries = 0
+        while retries < self.max_retries:
+            breakers["openai"].before_call()
+            streamed = False
+            try:
+                if self.verbose:
+                    self.logger.info(f"[{self.name}] Streaming {len(messages)} messages from OpenAi ({model})")
+                    self._log_messages(messages)
+
+                groq_rate_limiter.acquire(estimate_message_tokens(messages) + max_tokens)
+                started = time.perf_counter()
+                first_token = None
+                completion_tokens = 0
+                stream = openai.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                )
+                if cancel is not None:
+                    cancel.attach(stream)
+                try:
+                    for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if not streamed:
+                                first_token = time.perf_counter() - started
+                                latency_tracker.record("openai", first_token)
+                            streamed = True
+                            completion_tokens += estimate_tokens(delta)
+                            yield delta
+                finally:
+                    if cancel is not None:
+                        cancel.detach()
+                    # Also reached when the consumer stops early; drops the connection
+                    stream.close()
+                if cancel is not None and cancel.is_set():
+                    return
+                # Streams carry no usage: decode speed only, from estimated token counts
+                router.record(
+                    model,
+                    completion_tokens=completion_tokens,
+                    completion_seconds=time.perf_counter() - started - (first_token or 0.0),
+                )
+                breakers["openai"].record_success()
+                return
+            except Exception as e:
+                if cancel is not None and cancel.is_set():
+                    # Our own abort, not the backend's fault
+                    return
+                # Part of the reply already reached the caller, so a retry would duplicate it
+                if streamed:
+                    breakers["openai"].record_failure(e)
+                    raise
+                retries += 1
+                self.logger.error(
+                    f"[{self.name}] Error streaming from OpenAI: {e}, Retry {retries}/{self.max_retries}"
+                )
+                self._backoff(e, retries, "OpenAI")
+                continue
+        raise Exception(
+            f"[{self.name}] Failed to stream from OpenAI after {self.max_retries} retries"
+        )
+
+    def _stream_ollama(self, messages, max_tokens=150, temperature=0.0, model=None, cancel=None):
+        """Yield the Ollama reply chunk by chunk as it is generated; cancel as for _stream_openai"""
+        model = model or self._route("ollama", messages, max_tokens)
+        retries = 0
+        while retries < self.max_retries:
+            breakers["ollama"].before_call()
+            streamed = False
+            endpoint = self.ollama_pool.acquire(model)
+            try:
+                if self.verbose:
+                    self.logger.info(f"[{self.name}] Streaming {len(messages)} messages from Ollama ({model} at {endpoint})")
+                    self._log_messages(messages)
+
+                started = time.perf_counter()
+                response = requests.post(
+                    f"{endpoint}/api/chat",
+                    json=self._ollama_payload(messages, max_tokens, temperature, stream=True, model=model),
+                    stream=True,
+                    timeout=self.ollama_timeout,
+                )
+                if cancel is not None:
+                    cancel.attach(response)
+                try:
+                    if response.status_code != 200:
+                        raise requests.HTTPError(f"HTTP {response.status_code}: {response.text}", response=response)
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise Exception(chunk["error"])
+                        delta = chunk.get("message", {}).get("content", "")
+                        if delta:
+                            if not streamed:
+                                latency_tracker.record("ollama", time.perf_counter() - started)
+                            streamed = True
+                            yield delta
+                        if chunk.get("done"):
+                            # The final chunk carries the same counts and durations as a non-streamed reply
+                            router.record(
+                                model,
+                                chunk.get('prompt_eval_count', 0), chunk.get('prompt_eval_duration', 0) / 1e9,
+                                chunk.get('eval_count', 0), chunk.get('eval_duration', 0) / 1e9,
+                            )
+                            break
+                finally:
+                    if cancel is not None:
+                        cancel.detach()
+                    # Ollama stops generating once the connection is closed
+                    response.close()
+                if cancel is not None and cancel.is_set():
+                    return
+                breakers["ollama"].record_success()
+                return
+            except Exception as e:
+                if cancel is not None and cancel.is_set():
+                    # Our own abort: the endpoint is released as healthy below
+                    return
+                self.ollama_pool.release(endpoint, model, e)
+                endpoint = None
+                if streamed:
+                    breakers["ollama"].record_failure(e)
+                    raise
+                retries += 1
+                self.logger.error(
+                    f"[{self.name}] Error streaming from Ollama: {e}, Retry {retries}/{self.max_retries}"
+                )
+                self._backoff(e, retries, "Ollama")
+                continue
+            finally:
+                # Success, or the consumer closed the stream early
+                if endpoint is not None:
+                    self.ollama_pool.release(endpoint, model)
+        raise Exception(
+            f"[{self.name}] Failed to stream from Ollama after {self.max_retries} retries"
+        )
+
+    def _hedged_call(self, primary, messages, max_tokens, temperature, priority, model=None):
+        """
+        Stream from primary and, if it has not produced a token within its p95
+        time-to-first-token, fire the same request at the other backend
+        The first backend to produce a token wins; the other one is cancelled, which
+        drops its connection so its scheduler slot is released straight away.
+        """
+        streams = {"ollama": self._stream_ollama, "openai": self._stream_openai}
+        secondary = "openai" if primary == "ollama" else "ollama"
+        events = queue.Queue()
+        cancels = {}
+
+        launched = {}
+
+        def attempt(backend):
+            cancel = cancels[backend] = StreamCancel()
+            launched[backend] = time.monotonic()
+
+            def run():
+                try:
+                    with scheduler.slot(backend, priority):
+                        if cancel.is_set():
+                            return
+                        started = time.monotonic()
+                        stream = streams[backend](
+                            messages, max_tokens, temperature, model if backend == primary else None, cancel
+                        )
+                        parts = []
+                        try:
+                            for delta in stream:
+                                if cancel.is_set():
+                                    return
+                                if not parts:
+                                    events.put(("first", backend, time.monotonic() - started))
+                                parts.append(delta)
+                        finally:
+                            stream.close()
+                        if cancel.is_set():
+                            return
+                    events.put(("done", backend, "".join(parts)))
+                except Exception as e:
+                    events.put(("error", backend, e))
+
+            threading.Thread(target=propagate(run), name=f"hedge-{backend}", daemon=True).start()
+
+        delay = latency_tracker.hedge_delay(primary)
+        started = time.monotonic()
+        attempt(primary)
+        winner = None
+        errors = {}
+        while True:
+            timeout = None
+            if secondary not in cancels:
+                timeout = max(delay - (time.monotonic() - started), 0)
+            try:
+                kind, backend, value = events.get(timeout=timeout)
+            except queue.Empty:
+                self.logger.info(f"[{self.name}] No first token from {primary} after {delay:.2f}s, hedging to {secondary}")
+                attempt(secondary)
+                continue
+
+            if kind == "first" and winner is None:
+                winner = backend
+                # The winner's stream recorded its own latency. A beaten primary waited at least
+                # this long, a sample from exactly the tail the hedge delay is meant to cover.
+                if backend != primary:
+                    latency_tracker.record(primary, time.monotonic() - launched[primary])
+                current_span().set(backend=backend, hedged=secondary in cancels).mark_first_token()
+                for other, cancel in cancels.items():
+                    if other != backend:
+                        cancel.cancel()
+            elif kind == "done" and winner in (None, backend):
+                for other, cancel in cancels.items():
+                    if other != backend:
+                        cancel.cancel()
+                return value
+            elif kind == "error":
+                errors[backend] = value
+                if backend == winner:
+                    raise value
+                if secondary not in cancels:
+                    # The primary failed outright; fall over without waiting out the delay
+                    attempt(secondary)
+                elif len(errors) == len(cancels):
+                    raise errors[primary]
@@ -1,5 +1,6 @@
 from .agent_base import AgentBase
 import yfinance as yf
+from utils.logger import preview
 from typing import List, Dict
 from datetime import datetime, timedelta
 from enum import Enum
@@ -73,6 +74,12 @@ class MarketDataTool(AgentBase):
                 self.logger.error(f"Error fetching data for {asset}: {e}")
                 market_data[asset] = {"error": str(e)}
                 
-        # Log the market data before returning
-        self.logger.info(f"Market Data Retrieved: {market_data}")
+        # Log a summary; historical records only as a bar count, the rest size-capped at DEBUG level
+        failed = [asset for asset, data in market_data.items() if "error" in data]
+        self.logger.info(f"Market Data Retrieved: {len(market_data) - len(failed)} assets ({len(failed)} failed)")
+        self.logger.opt(lazy=True).debug("Market Data: {}", lambda: preview({
+            asset: {key: value for key, value in data.items() if key != "historical_data"}
+            | {"bars": len(data.get("historical_data", []))}
+            for asset, data in market_data.items()
+        }))
         return market_data
@@ -202,19 +202,21 @@ class MarketDataAnalyzer(AgentBase):
         insights = []
         
         # Trend-based insights
-        if trend_analysis['direction'] == 'bullish' and trend_analysis['strength'] > 0.7:
+        # Short series come back as {'trend': 'insufficient_data'} and the like
+        if trend_analysis.get('direction') == 'bullish' and trend_analysis['strength'] > 0.7:
             insights.append(f"Strong bullish trend detected (R² = {trend_analysis['r_squared']})")
-        elif trend_analysis['direction'] == 'bearish' and trend_analysis['strength'] > 0.7:
+        elif trend_analysis.get('direction') == 'bearish' and trend_analysis['strength'] > 0.7:
             insights.append(f"Strong bearish trend detected (R² = {trend_analysis['r_squared']})")
         
         # Volatility insights
-        if volatility_analysis['is_high_volatility']:
+        if volatility_analysis.get('is_high_volatility'):
             insights.append(f"High volatility period (percentile: {volatility_analysis['volatility_percentile']}%)")
         
         # Support/Resistance insights
-        if support_resistance['price_position'] > 0.8:
+        price_position = support_resistance.get('price_position', 0.5)
+        if price_position > 0.8:
             insights.append("Price near resistance level - potential reversal zone")
-        elif support_resistance['price_position'] < 0.2:
+        elif price_position < 0.2:
             insights.append("Price near support level - potential bounce zone")
         
         # Technical indicator insights
@@ -223,7 +225,8 @@ class MarketDataAnalyzer(AgentBase):
         elif indicators['RSI'] and indicators['RSI'] < 30:
             insights.append("Oversold conditions (RSI)")
         
-        if indicators['MACD']:
+        # The signal line, and with it the histogram, may be missing
+        if indicators['MACD'] and indicators['MACD']['histogram'] is not None:
             macd = indicators['MACD']
             if macd['histogram'] > 0 and macd['macd'] > macd['signal']:
                 insights.append("Positive MACD crossover - bullish signal")
@@ -265,8 +268,8 @@ class MarketDataAnalyzer(AgentBase):
             'max_drawdown': self._calculate_max_drawdown(prices),
             'risk_reward_ratio': self._calculate_risk_reward_ratio(
                 prices, 
-                support_resistance['support'], 
-                support_resistance['resistance']
+                support_resistance.get('support', prices[-1]),
+                support_resistance.get('resistance', prices[-1])
             )
         }
         
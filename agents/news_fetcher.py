@@ -3,7 +3,8 @@ from datetime import datetime, timedelta
 import os
 import json
 import feedparser
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict
 from pathlib import Path
 import re
 
@@ -23,13 +24,38 @@ class NewsFetcherTool(AgentBase):
             assets: List of asset symbols (e.g., ["BTC-USD", "ETH-USD"])
             period: Time period (will be used to filter articles by date)
         """
-        news_items = []
-        
+        return self.select_recent(list(self.iter_execute(assets, period)))
+
+    def select_recent(self, news_items: List[Dict], limit: int = 20) -> List[Dict]:
+        """Sort by publishedAt and take the most recent articles"""
+        news_items = sorted(news_items, key=lambda x: x.get('publishedAt', ''), reverse=True)
+        return news_items[:limit]
+
+    def iter_execute(self, assets: List[str], period: str = "1y") -> Iterator[Dict]:
+        """
+        Yield matching articles as soon as their feed has been parsed
+        Feeds are fetched concurrently; articles are unsorted and not capped
+        """
         # Convert period to timedelta for date filtering
         delta = self._period_to_timedelta(period)
         cutoff_date = datetime.now() - delta
         
-        # Prepare search terms for each asset
+        asset_terms = self._asset_terms(assets)
+
+        # Fetch and parse RSS feeds
+        with ThreadPoolExecutor(max_workers=max(1, len(self.rss_feeds))) as executor:
+            futures = {executor.submit(self._fetch_feed, feed_url): feed_url for feed_url in self.rss_feeds}
+            for future in as_completed(futures):
+                feed_url = futures[future]
+                try:
+                    feed = future.result()
+                    yield from self._match_entries(feed, feed_url, asset_terms, cutoff_date)
+                except Exception as e:
+                    self.logger.error(f"Error fetching RSS feed {feed_url}: {e}")
+                    continue
+
+    def _asset_terms(self, assets: List[str]) -> Dict:
+        """Search terms for each asset"""
         asset_terms = {}
         for asset in assets:
             base_symbol = asset.replace('-USD', '')
@@ -37,76 +63,71 @@ class NewsFetcherTool(AgentBase):
                 'symbol': base_symbol,
                 'name': self._get_full_name(base_symbol).lower()
             }
-        
-        # Fetch and parse RSS feeds
-        for feed_url in self.rss_feeds:
+        return asset_terms
+
+    def _fetch_feed(self, feed_url: str):
+        self.logger.info(f"Fetching RSS feed: {feed_url}")
+        return feedparser.parse(feed_url)
+
+    def _match_entries(self, feed, feed_url: str, asset_terms: Dict, cutoff_date: datetime) -> List[Dict]:
+        """Articles of a parsed feed that mention one of the assets"""
+        news_items = []
+        for entry in feed.entries:
+            # Convert entry date to datetime
             try:
-                self.logger.info(f"Fetching RSS feed: {feed_url}")
-                feed = feedparser.parse(feed_url)
+                pub_date = datetime(*entry.published_parsed[:6])
+            except (AttributeError, TypeError):
+                # If date parsing fails, skip date filtering
+                pub_date = datetime.now()
+            
+            # Skip if article is too old
+            if pub_date < cutoff_date:
+                continue
+            
+            # Check if article mentions any of our assets
+            title = entry.get('title', '').lower()
+            description = entry.get('description', '').lower()
+            content = title + ' ' + description
+            
+            for asset, terms in asset_terms.items():
+                # Use word boundaries to match whole words only
+                symbol_pattern = r'\b' + terms['symbol'].lower() + r'\b'
+                name_pattern = r'\b' + terms['name'].lower() + r'\b'
                 
-                for entry in feed.entries:
-                    # Convert entry date to datetime
-                    try:
-                        pub_date = datetime(*entry.published_parsed[:6])
-                    except (AttributeError, TypeError):
-                        # If date parsing fails, skip date filtering
-                        pub_date = datetime.now()
-                    
-                    # Skip if article is too old
-                    if pub_date < cutoff_date:
-                        continue
+                if re.search(symbol_pattern, content) or re.search(name_pattern, content):
+                    # Double check it's not a false positive (e.g., AAVE when looking for SOL)
+                    # by checking if any other crypto name appears in the title
+                    other_cryptos = {
+                        'AAVE': 'Aave', 'LINK': 'Chainlink', 'UNI': 'Uniswap',
+                        'MATIC': 'Polygon', 'AVAX': 'Avalanche', 'ATOM': 'Cosmos',
+                        'ALGO': 'Algorand', 'XLM': 'Stellar', 'FTM': 'Fantom',
+                        'NEAR': 'NEAR Protocol'
+                    }
                     
-                    # Check if article mentions any of our assets
-                    title = entry.get('title', '').lower()
-                    description = entry.get('description', '').lower()
-                    content = title + ' ' + description
+                    is_false_positive = False
+                    for other_symbol, other_name in other_cryptos.items():
+                        if other_symbol != terms['symbol'] and other_name != terms['name']:
+                            other_pattern = r'\b' + other_symbol.lower() + r'\b'
+                            other_name_pattern = r'\b' + other_name.lower() + r'\b'
+                            if re.search(other_pattern, title.lower()) or re.search(other_name_pattern, title.lower()):
+                                is_false_positive = True
+                                break
                     
-                    for asset, terms in asset_terms.items():
-                        # Use word boundaries to match whole words only
-                        symbol_pattern = r'\b' + terms['symbol'].lower() + r'\b'
-                        name_pattern = r'\b' + terms['name'].lower() + r'\b'
-                        
-                        if re.search(symbol_pattern, content) or re.search(name_pattern, content):
-                            # Double check it's not a false positive (e.g., AAVE when looking for SOL)
-                            # by checking if any other crypto name appears in the title
-                            other_cryptos = {
-                                'AAVE': 'Aave', 'LINK': 'Chainlink', 'UNI': 'Uniswap',
-                                'MATIC': 'Polygon', 'AVAX': 'Avalanche', 'ATOM': 'Cosmos',
-                                'ALGO': 'Algorand', 'XLM': 'Stellar', 'FTM': 'Fantom',
-                                'NEAR': 'NEAR Protocol'
-                            }
-                            
-                            is_false_positive = False
-                            for other_symbol, other_name in other_cryptos.items():
-                                if other_symbol != terms['symbol'] and other_name != terms['name']:
-                                    other_pattern = r'\b' + other_symbol.lower() + r'\b'
-                                    other_name_pattern = r'\b' + other_name.lower() + r'\b'
-                                    if re.search(other_pattern, title.lower()) or re.search(other_name_pattern, title.lower()):
-                                        is_false_positive = True
-                                        break
-                            
-                            if not is_false_positive:
-                                article = {
-                                    'title': entry.get('title'),
-                                    'description': entry.get('description'),
-                                    'url': entry.get('link'),
-                                    'publishedAt': pub_date.isoformat(),
-                                    'source': {
-                                        'name': feed.feed.get('title', feed_url)
-                                    },
-                                    'asset': asset,
-                                    'matched_term': terms['symbol'] if re.search(symbol_pattern, content) else terms['name']
-                                }
-                                news_items.append(article)
-                                break  # One article can only be assigned to one asset
-                            
-            except Exception as e:
-                self.logger.error(f"Error fetching RSS feed {feed_url}: {e}")
-                continue
-
-        # Sort by publishedAt and take most recent/relevant articles
-        news_items.sort(key=lambda x: x.get('publishedAt', ''), reverse=True)
-        return news_items[:20]  # Return top 20 most recent articles
+                    if not is_false_positive:
+                        article = {
+                            'title': entry.get('title'),
+                            'description': entry.get('description'),
+                            'url': entry.get('link'),
+                            'publishedAt': pub_date.isoformat(),
+                            'source': {
+                                'name': feed.feed.get('title', feed_url)
+                            },
+                            'asset': asset,
+                            'matched_term': terms['symbol'] if re.search(symbol_pattern, content) else terms['name']
+                        }
+                        news_items.append(article)
+                        break  # One article can only be assigned to one asset
+        return news_items
 
     def _period_to_timedelta(self, period: str) -> timedelta:
         """Convert yfinance period format to timedelta"""
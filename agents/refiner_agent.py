@@ -1,11 +1,44 @@
 from .agent_base import AgentBase
+from utils.tracing import current_span, propagate
+import difflib
+import hashlib
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"[A-Za-z']+")
+PARAGRAPH_REFERENCE = re.compile(r"\bparagraphs?\s+\d+(?:\s*(?:,|and|-|to)\s*\d+)*", re.IGNORECASE)
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "was",
+    "were", "be", "been", "by", "as", "at", "that", "this", "it", "its", "from", "which", "these",
+}
+
+# Process-wide cache shared by every RefinerAgent: paragraph hash -> refined paragraph.
+# Paragraphs that passed scoring map to themselves, so later rounds skip them.
+_paragraph_cache = OrderedDict()
+_paragraph_cache_lock = threading.Lock()
+
+
+def _paragraph_key(paragraph: str) -> str:
+    return hashlib.sha1(paragraph.strip().encode("utf-8")).hexdigest()
 
 
 class RefinerAgent(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
         super().__init__(name="RefinerAgent", max_retries=max_retries, verbose=verbose)
+        self.paragraph_workers = int(os.getenv("REFINER_WORKERS", "4"))
+        self.weak_threshold = float(os.getenv("REFINER_WEAK_THRESHOLD", "0.6"))
+        self.cache_size = int(os.getenv("REFINER_CACHE_SIZE", "2048"))
+
+    def execute(self, draft, feedback=None, targeted=False):
+        if targeted:
+            return self.refine_paragraphs(draft, feedback)["article"]
 
-    def execute(self, draft):
         messages = [
             {
                 "role": "system",
@@ -34,3 +67,156 @@ class RefinerAgent(AgentBase):
         ]
         article = self.call_openai(messages, max_tokens=1000)
         return article
+
+    def _score_paragraph(self, paragraph: str) -> float:
+        """Local quality heuristic between 0 (needs work) and 1 (fine)"""
+        text = paragraph.strip()
+        if text.startswith("#"):
+            return 1.0  # Headings are never rewritten
+
+        sentences = [s for s in SENTENCE_BREAK.split(text) if s.strip()]
+        words = WORD.findall(text)
+        if not words:
+            return 1.0
+
+        score = 1.0
+        # Very short paragraphs are usually underdeveloped
+        if len(words) < 25:
+            score -= 0.2
+
+        # Average sentence length outside a readable academic range
+        average_length = len(words) / max(len(sentences), 1)
+        if average_length > 30:
+            score -= min((average_length - 30) / 30, 0.4)
+        elif average_length < 8:
+            score -= 0.2
+
+        # Run-on sentences
+        long_sentences = sum(1 for s in sentences if len(WORD.findall(s)) > 40)
+        score -= 0.3 * long_sentences / max(len(sentences), 1)
+
+        # Heavy repetition of the same content word
+        content_words = [w.lower() for w in words if w.lower() not in STOPWORDS and len(w) > 3]
+        if len(content_words) >= 20:
+            _, top_count = Counter(content_words).most_common(1)[0]
+            if top_count / len(content_words) > 0.08:
+                score -= 0.2
+
+        # Unfinished paragraph
+        if text[-1] not in ".!?\"')":
+            score -= 0.2
+
+        return max(score, 0.0)
+
+    def _flagged_by_feedback(self, feedback: Optional[str], paragraphs: List[str]) -> Set[int]:
+        """Paragraph indices the validator's feedback refers to, by number or shared vocabulary"""
+        if not feedback:
+            return set()
+        flagged = set()
+        for match in PARAGRAPH_REFERENCE.finditer(feedback):
+            for number in re.findall(r"\d+", match.group()):
+                if 1 <= int(number) <= len(paragraphs):
+                    flagged.add(int(number) - 1)
+
+        # Feedback sentences that share several content words with a paragraph point at it
+        for sentence in SENTENCE_BREAK.split(feedback):
+            terms = {w.lower() for w in WORD.findall(sentence) if w.lower() not in STOPWORDS and len(w) > 4}
+            if len(terms) < 3:
+                continue
+            for index, paragraph in enumerate(paragraphs):
+                paragraph_terms = {w.lower() for w in WORD.findall(paragraph)}
+                if len(terms & paragraph_terms) >= 3:
+                    flagged.add(index)
+        return flagged
+
+    def _refine_paragraph(self, paragraph: str, feedback: Optional[str] = None) -> str:
+        user_content = (
+            "Refine the following paragraph of a research article to improve its language, coherence and academic quality. "
+            "Keep its meaning, facts and approximate length. Reply with the refined paragraph only.\n\n"
+        )
+        if feedback:
+            user_content += f"Reviewer feedback on the article:\n{feedback}\n\n"
+        user_content += f"Paragraph:\n{paragraph}\n\nRefined Paragraph:"
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an expert editor who refines and enhances research articles for clarity, coherence, and academic quality.",
+            },
+            {"role": "user", "content": user_content},
+        ]
+        # Roughly 1.3 tokens per word, with headroom for a somewhat longer rewrite
+        max_tokens = max(128, int(len(paragraph.split()) * 2))
+        return self.call_openai(messages, max_tokens=max_tokens).strip()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with _paragraph_cache_lock:
+            value = _paragraph_cache.get(key)
+            if value is not None:
+                _paragraph_cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, key: str, value: str):
+        with _paragraph_cache_lock:
+            _paragraph_cache[key] = value
+            _paragraph_cache.move_to_end(key)
+            while len(_paragraph_cache) > self.cache_size:
+                _paragraph_cache.popitem(last=False)
+
+    def refine_paragraphs(self, draft: str, feedback: Optional[str] = None, force: bool = False) -> Dict:
+        """
+        Refine only the weak paragraphs of draft, concurrently
+        Returns the spliced article, the indices of all changed paragraphs (refined now or
+        taken from the cache), cache hits and a unified diff
+        force=True refines every paragraph except headings (a full rewrite, paragraph-parallel).
+        Paragraphs flagged by feedback bypass the cache, so new feedback is always acted on.
+        """
+        paragraphs = [p.strip() for p in PARAGRAPH_BREAK.split(draft.strip()) if p.strip()]
+        flagged = self._flagged_by_feedback(feedback, paragraphs)
+        if force:
+            flagged.update(i for i, p in enumerate(paragraphs) if not p.startswith("#"))
+
+        result = list(paragraphs)
+        to_refine = []
+        from_cache = []
+        cache_hits = 0
+        for index, paragraph in enumerate(paragraphs):
+            key = _paragraph_key(paragraph)
+            cached = self._cache_get(key) if index not in flagged else None
+            if cached is not None:
+                # Either a previous refinement, or a paragraph that already passed
+                result[index] = cached
+                cache_hits += 1
+                if cached != paragraph:
+                    from_cache.append(index)
+                continue
+            if index in flagged or self._score_paragraph(paragraph) < self.weak_threshold:
+                to_refine.append(index)
+            else:
+                self._cache_put(key, paragraph)
+
+        if to_refine:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.paragraph_workers, len(to_refine)))) as executor:
+                refined = list(executor.map(
+                    propagate(lambda i: self._refine_paragraph(paragraphs[i], feedback)), to_refine
+                ))
+            for index, text in zip(to_refine, refined):
+                text = text or paragraphs[index]
+                result[index] = text
+                self._cache_put(_paragraph_key(paragraphs[index]), text)
+                # The refined text counts as accepted in the next round
+                self._cache_put(_paragraph_key(text), text)
+
+        current_span().set(cache_hits=cache_hits, refined=len(to_refine) + len(from_cache), paragraphs=len(paragraphs))
+        if self.verbose:
+            self.logger.info(
+                f"[{self.name}] Refined {len(to_refine)} of {len(paragraphs)} paragraphs, "
+                f"{len(from_cache)} more from the cache ({cache_hits} cache hits)"
+            )
+        return {
+            "article": "\n\n".join(result),
+            "refined": sorted(to_refine + from_cache),
+            "cache_hits": cache_hits,
+            "diff": "\n".join(difflib.unified_diff(
+                paragraphs, result, fromfile="draft", tofile="refined", lineterm=""
+            )),
+        }
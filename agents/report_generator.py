@@ -1,51 +1,214 @@
 from .agent_base import AgentBase
-from typing import Dict, List
+from utils.model_router import router
+from utils.tokens import estimate_tokens, pack_lines, truncate_to_tokens
+from utils.tracing import propagate
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import zip_longest
+from typing import Dict, List, Optional, Tuple
+
+REPORT_SYSTEM_MESSAGE = "You are a professional financial analyst. Generate a comprehensive report based on the provided market data and news analysis. Focus on key trends, sentiment analysis, and potential market implications."
+SECTION_SYSTEM_MESSAGE = "You are a professional financial analyst writing one section of a multi-asset market report. Cover only the asset you are given: price action, news sentiment and potential market implications. Do not write an introduction or conclusion for the whole report."
+SYNTHESIS_SYSTEM_MESSAGE = "You are a professional financial analyst. Write a short executive overview of the market report below: the main trends across assets, how their sentiment compares and the key implications. Do not repeat the per-asset details."
 
 class ReportGeneratorTool(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
         super().__init__(name="ReportGeneratorTool", max_retries=max_retries, verbose=verbose)
+        self.section_workers = int(os.getenv("REPORT_SECTION_WORKERS", "8"))
+        self.section_max_tokens = int(os.getenv("REPORT_SECTION_MAX_TOKENS", "800"))
+        # Scheduling class of the per-asset fan-out; unset, the sections share the caller's class
+        self.section_priority = os.getenv("REPORT_SECTION_PRIORITY") or None
+        self.synthesis_max_tokens = int(os.getenv("REPORT_SYNTHESIS_MAX_TOKENS", "500"))
+        # Prompt and reply share the model's window (2048 tokens for tinyllama), so the single-pass
+        # report cannot ask for the 4000 tokens it used to without its prompt being truncated
+        self.report_max_tokens = int(os.getenv("REPORT_MAX_TOKENS", "1500"))
+        # Upper bound for the prompt context; the routed model's window may leave less
+        self.context_tokens = int(os.getenv("REPORT_CONTEXT_TOKENS", "1500"))
+        self.news_half_life_hours = float(os.getenv("REPORT_NEWS_HALF_LIFE_HOURS", "24"))
+
+    def execute(self, market_data: Dict, analyzed_news: List[Dict], map_reduce: bool = True) -> str:
+        """
+        Generate a comprehensive financial report using Ollama
+        With map_reduce, one section per asset is generated concurrently and a short
+        synthesis pass writes the overview, so latency does not grow with the asset list.
+        """
+        assets = self._report_assets(market_data, analyzed_news)
+        if map_reduce and len(assets) > 1:
+            return self._map_reduce_report(assets, market_data, analyzed_news)
 
-    def execute(self, market_data: Dict, analyzed_news: List[Dict]) -> str:
-        """Generate a comprehensive financial report using Ollama"""
-        
         # Prepare the context for the report
-        context = self._prepare_context(market_data, analyzed_news)
-        
+        model, budget = self._plan_call(REPORT_SYSTEM_MESSAGE, self.report_max_tokens)
+        context = self._prepare_context(market_data, analyzed_news, budget)
+
         messages = [
             {
                 "role": "system",
-                "content": "You are a professional financial analyst. Generate a comprehensive report based on the provided market data and news analysis. Focus on key trends, sentiment analysis, and potential market implications.",
+                "content": REPORT_SYSTEM_MESSAGE,
             },
             {
                 "role": "user",
                 "content": context,
             },
         ]
-        
-        report = self.call_ollama(messages, max_tokens=4000)
+
+        report = self.call_ollama(messages, max_tokens=self.report_max_tokens, model=model)
         return report
 
-    def _prepare_context(self, market_data: Dict, analyzed_news: List[Dict]) -> str:
-        """Prepare context for the report generation"""
-        context = "Market Data Summary:\n"
-        
-        # Add market data (limit to key metrics)
-        for asset, data in market_data.items():
-            if "error" not in data:
-                context += f"\n{asset.upper()}:\n"
-                context += f"Current Price: ${data['current_price']:.2f}\n"
-                context += f"Price Change ({data['period']}): {data['price_change']:.2f}%\n"
-                # Only include high/low if significant movement
-                if abs(data['price_change']) > 1.0:
-                    context += f"Period High: ${data['high']:.2f}\n"
-                    context += f"Period Low: ${data['low']:.2f}\n"
-        
-        # Add news analysis (limit to 3 most relevant items)
-        context += "\nNews Analysis:\n"
-        for news in analyzed_news[:3]:  # Reduced from 5 to 3 items
-            context += f"\nHeadline: {news.get('title', '')}\n"
-            context += f"Sentiment: {news.get('sentiment_analysis', '')}\n"
-            if news.get('asset'):
-                context += f"Related Asset: {news['asset']}\n"
-        
+    def _report_assets(self, market_data: Dict, analyzed_news: List[Dict]) -> List[str]:
+        """Assets with usable market data or news, in market data order"""
+        assets = [asset for asset, data in market_data.items() if "error" not in data]
+        for news in analyzed_news:
+            if news.get('asset') and news['asset'] not in assets:
+                assets.append(news['asset'])
+        return assets
+
+    def _plan_call(self, system_message: str, max_tokens: int) -> Tuple[str, int]:
+        """
+        The model for a call and the tokens left for its user context
+        The model is routed for the largest context we would send; the budget is what remains of
+        that model's window once the system prompt and num_predict are reserved.
+        """
+        system_tokens = estimate_tokens(system_message)
+        model = router.choose("ollama", self.name, system_tokens + self.context_tokens, max_tokens, self.ollama_model)
+        num_ctx = self.ollama_num_ctx_for(model)
+        available = num_ctx - max_tokens - system_tokens - 32
+        if available < self.context_tokens:
+            self.logger.debug(
+                f"[{self.name}] Context budget limited to {available} tokens by num_ctx={num_ctx} ({model})"
+            )
+        return model, max(min(self.context_tokens, available), 128)
+
+    def _market_line(self, asset: str, data: Dict) -> str:
+        """Key metrics of an asset on one line"""
+        line = f"{asset.upper()}: ${data['current_price']:.2f}, {data['price_change']:+.2f}% over {data['period']}"
+        # Only include high/low if significant movement
+        if abs(data['price_change']) > 1.0:
+            line += f", range ${data['low']:.2f}-${data['high']:.2f}"
+        return line
+
+    def _news_line(self, news: Dict) -> str:
+        """Headline with its asset, sentiment score and explanation on one line"""
+        sentiment = news.get('sentiment_analysis') or {}
+        tags = [news['asset']] if news.get('asset') else []
+        if 'score' in sentiment:
+            tags.append(f"{sentiment['score']:+.2f}")
+        line = f"- [{', '.join(tags)}] " if tags else "- "
+        line += truncate_to_tokens(" ".join((news.get('title') or '').split()), 40)
+        if sentiment.get('explanation'):
+            line += f" ({sentiment['explanation']})"
+        return line
+
+    def _news_relevance(self, news: Dict, now: datetime) -> float:
+        """Mix of recency (exponential decay) and sentiment strength, between 0 and 1"""
+        try:
+            age_hours = max((now - datetime.fromisoformat(news['publishedAt'])).total_seconds() / 3600, 0.0)
+            recency = 0.5 ** (age_hours / self.news_half_life_hours)
+        except (KeyError, TypeError, ValueError):
+            recency = 0.5
+        strength = abs((news.get('sentiment_analysis') or {}).get('score', 0) or 0)
+        return 0.6 * recency + 0.4 * min(strength, 1.0)
+
+    def _rank_news(self, analyzed_news: List[Dict]) -> List[Dict]:
+        """
+        Deduplicated news, most relevant first
+        Assets take turns, so each asset's best article comes before any asset's second.
+        """
+        now = datetime.now()
+        seen = set()
+        by_asset = {}
+        for news in sorted(analyzed_news, key=lambda n: self._news_relevance(n, now), reverse=True):
+            title = " ".join((news.get('title') or '').casefold().split())
+            if not title or title in seen:
+                continue
+            seen.add(title)
+            by_asset.setdefault(news.get('asset'), []).append(news)
+        return [news for round_ in zip_longest(*by_asset.values()) for news in round_ if news is not None]
+
+    def _prepare_context(self, market_data: Dict, analyzed_news: List[Dict], budget: Optional[int] = None) -> str:
+        """
+        Prepare context for the report generation within budget tokens
+        Market facts go in first, biggest movers first, and may take up to two thirds of
+        the budget when there is news; the most relevant news fills the rest.
+        """
+        budget = budget or self.context_tokens
+        market_lines = []
+        movers = sorted(
+            (item for item in market_data.items() if "error" not in item[1]),
+            key=lambda item: abs(item[1]['price_change']),
+            reverse=True,
+        )
+        for asset, data in movers:
+            market_lines.append(self._market_line(asset, data))
+        unavailable = [asset.upper() for asset, data in market_data.items() if "error" in data]
+        if unavailable:
+            market_lines.append(f"No market data: {', '.join(unavailable)}")
+
+        news_lines = [self._news_line(news) for news in self._rank_news(analyzed_news)]
+        headers = "Market Data Summary:\n\nNews Analysis:\n"
+        remaining = budget - estimate_tokens(headers)
+        market_share = remaining * 2 // 3 if news_lines else remaining
+        packed_market = pack_lines(market_lines, market_share)
+        remaining -= sum(estimate_tokens(line) + 1 for line in packed_market)
+        packed_news = pack_lines(news_lines, remaining)
+
+        context = "Market Data Summary:\n" + "\n".join(packed_market or ["No market data available"])
+        context += "\n\nNews Analysis:\n" + "\n".join(packed_news or ["No recent news"])
+        if self.verbose:
+            self.logger.info(
+                f"[{self.name}] Context: {len(packed_market)}/{len(market_lines)} market lines, "
+                f"{len(packed_news)}/{len(news_lines)} news items, ~{estimate_tokens(context)}/{budget} tokens"
+            )
         return context
+
+    def _write_asset_section(self, asset: str, data: Optional[Dict], analyzed_news: List[Dict]) -> str:
+        model, budget = self._plan_call(SECTION_SYSTEM_MESSAGE, self.section_max_tokens)
+        asset_news = [news for news in analyzed_news if news.get('asset') == asset]
+        messages = [
+            {
+                "role": "system",
+                "content": SECTION_SYSTEM_MESSAGE,
+            },
+            {
+                "role": "user",
+                "content": self._prepare_context({asset: data or {"error": "No data available"}}, asset_news, budget),
+            },
+        ]
+        return self.call_ollama(
+            messages, max_tokens=self.section_max_tokens, priority=self.section_priority or self.priority, model=model
+        ).strip()
+
+    def _synthesize(self, sections: Dict[str, str]) -> str:
+        """Short cross-asset overview written from the finished sections"""
+        model, budget = self._plan_call(SYNTHESIS_SYSTEM_MESSAGE, self.synthesis_max_tokens)
+        # Every section gets an equal share, so no asset is left out of the overview
+        share = max(budget // max(len(sections), 1) - 4, 16)
+        context = "Asset sections:\n"
+        for asset, section in sections.items():
+            context += f"\n{asset.upper()}:\n{truncate_to_tokens(section, share)}\n"
+        messages = [
+            {
+                "role": "system",
+                "content": SYNTHESIS_SYSTEM_MESSAGE,
+            },
+            {
+                "role": "user",
+                "content": context,
+            },
+        ]
+        return self.call_ollama(messages, max_tokens=self.synthesis_max_tokens, model=model).strip()
+
+    def _map_reduce_report(self, assets: List[str], market_data: Dict, analyzed_news: List[Dict]) -> str:
+        """Generate the asset sections concurrently, then the overview over their output"""
+        with ThreadPoolExecutor(max_workers=max(1, min(self.section_workers, len(assets)))) as executor:
+            futures = {
+                asset: executor.submit(propagate(self._write_asset_section), asset, market_data.get(asset), analyzed_news)
+                for asset in assets
+            }
+            sections = {asset: future.result() for asset, future in futures.items()}
+
+        overview = self._synthesize(sections)
+        report = f"## Overview\n\n{overview}"
+        for asset, section in sections.items():
+            report += f"\n\n## {asset.upper()}\n\n{section}"
+        return report
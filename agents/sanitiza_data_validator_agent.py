@@ -1,6 +1,19 @@
 # agents/sanitize_data_validator_agent.py
 
 from .agent_base import AgentBase
+from .sanitize_data_tool import (
+    AMBIGUOUS_LABELS,
+    ENTITY_CATEGORIES,
+    LONG_NUMBER,
+    PHI_PATTERNS,
+    PLACEHOLDER_PATTERN,
+)
+from utils.nlp import load_spacy
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+# "4/5", "4 out of 5" or "Rating: 4" in the LLM's verdict
+LLM_RATING = re.compile(r"\b([1-5])\s*(?:/|out of)\s*5\b|\brating\W{0,3}([1-5])\b", re.IGNORECASE)
 
 
 class SanitizeDataValidatorAgent(AgentBase):
@@ -8,13 +21,75 @@ class SanitizeDataValidatorAgent(AgentBase):
         super().__init__(
             name="SanitizeDataValidatorAgent", max_retries=max_retries, verbose=verbose
         )
+        # spaCy model, shared with the other agents
+        self.nlp = load_spacy()
+
+    def _original_identifiers(self, original_data: str) -> Set[Tuple[str, str]]:
+        """(category, text) of every identifier the local rules find in the original data"""
+        identifiers = set()
+        for category, pattern in PHI_PATTERNS:
+            group = "value" if "value" in pattern.groupindex else 0
+            for match in pattern.finditer(original_data):
+                identifiers.add((category, match.group(group)))
+        for ent in self.nlp(original_data).ents:
+            category = ENTITY_CATEGORIES.get(ent.label_)
+            if category:
+                identifiers.add((category, ent.text))
+        # A surname or first name on its own is still PHI
+        for category, text in list(identifiers):
+            if category == "NAME":
+                identifiers.update((category, part) for part in text.split() if len(part) > 2)
+        return identifiers
+
+    def _find_residual(self, sanitized_data: str, identifiers: Set[Tuple[str, str]]) -> List[Dict]:
+        """Identifiers from the original, or pattern matches, still present in the sanitized data"""
+        residual = {}
+        if identifiers:
+            categories = {}
+            for category, text in identifiers:
+                categories.setdefault(text.casefold(), category)
+            # One pass over the sanitized text for all original identifiers
+            pattern = re.compile(
+                r"(?<!\w)(?:" + "|".join(map(re.escape, sorted(categories, key=len, reverse=True))) + r")(?!\w)",
+                re.IGNORECASE,
+            )
+            for match in pattern.finditer(sanitized_data):
+                residual.setdefault(match.group().casefold(), {
+                    "category": categories.get(match.group().casefold(), "PHI"),
+                    "text": match.group(),
+                    "source": "original",
+                })
+
+        for category, pattern in PHI_PATTERNS:
+            group = "value" if "value" in pattern.groupindex else 0
+            for match in pattern.finditer(sanitized_data):
+                text = match.group(group)
+                if PLACEHOLDER_PATTERN.search(text):
+                    continue
+                residual.setdefault(text.casefold(), {"category": category, "text": text, "source": "pattern"})
+        return list(residual.values())
+
+    def _find_suspicious(self, sanitized_data: str, residual: List[Dict]) -> List[str]:
+        """Spans that might be PHI but could not be matched against the original"""
+        known = {finding["text"].casefold() for finding in residual}
+        suspicious = set()
+        for ent in self.nlp(sanitized_data).ents:
+            if ent.label_ in ENTITY_CATEGORIES or ent.label_ in AMBIGUOUS_LABELS:
+                if not PLACEHOLDER_PATTERN.search(ent.text) and ent.text.casefold() not in known:
+                    suspicious.add(ent.text)
+        for match in LONG_NUMBER.finditer(sanitized_data):
+            if match.group().casefold() not in known:
+                suspicious.add(match.group())
+        return sorted(suspicious)
 
-    def execute(self, original_data, sanitized_data):
+    def _llm_validation(self, sanitized_data: str, suspicious: List[str]) -> str:
+        """Ask the LLM about the spans the rules could not decide on"""
         system_message = "You are an AI assistant that validates the sanitization of medical data by checking for the removal of Protected Health Information (PHI)."
         user_content = (
-            "Given the original data and the sanitized data, verify that all PHI has been removed.\n"
+            "Verify that all PHI has been removed from the sanitized data below. Placeholders such as [NAME_1] are safe.\n"
+            "The following spans could not be verified automatically: "
+            f"{', '.join(suspicious)}\n"
             "List any remaining PHI in the sanitized data and rate the sanitization process on a scale of 1 to 5, where 5 indicates complete sanitization.\n\n"
-            f"Original Data:\n{original_data}\n\n"
             f"Sanitized Data:\n{sanitized_data}\n\n"
             "Validation:"
         )
@@ -22,5 +97,58 @@ class SanitizeDataValidatorAgent(AgentBase):
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_content},
         ]
-        validation = self.call_openai(messages, max_tokens=512)
-        return validation
+        return self.call_openai(messages, max_tokens=256)
+
+    @staticmethod
+    def _llm_rating(verdict: str) -> Optional[int]:
+        """The 1-5 rating in the LLM's verdict, or None if it gave none"""
+        match = LLM_RATING.search(verdict or "")
+        return int(match.group(1) or match.group(2)) if match else None
+
+    def execute(self, original_data, sanitized_data, escalate=True):
+        """
+        Validate the sanitized data with local rules first
+        Returns a validation report; the LLM is only consulted, and then rates the result, when the rules are inconclusive
+        """
+        identifiers = self._original_identifiers(original_data)
+        residual = self._find_residual(sanitized_data, identifiers)
+        suspicious = self._find_suspicious(sanitized_data, residual)
+
+        # Residual PHI is a definite failure; a clean scan without suspicious spans a definite pass
+        conclusive = bool(residual) or not suspicious
+        validation_report = {
+            "quality_score": max(1, 5 - len(residual)),
+            "conclusive": conclusive,
+            "method": "rules",
+            "identifiers_checked": len(identifiers),
+            "residual_phi": residual,
+            "suspicious_spans": suspicious,
+            "recommendations": [],
+        }
+
+        if residual:
+            validation_report["recommendations"].append(
+                "Remove the residual PHI listed above before sharing the data"
+            )
+        elif suspicious and escalate:
+            validation_report["method"] = "rules+llm"
+            validation_report["llm_validation"] = self._llm_validation(sanitized_data, suspicious)
+            # The local scan found nothing definite, so the LLM's rating decides the score
+            rating = self._llm_rating(validation_report["llm_validation"])
+            if rating is not None:
+                validation_report["quality_score"] = rating
+            else:
+                validation_report["recommendations"].append(
+                    "The LLM gave no rating; the quality score reflects the local scan only"
+                )
+        elif suspicious:
+            validation_report["recommendations"].append(
+                "Review the suspicious spans manually"
+            )
+
+        if self.verbose:
+            self.logger.info(
+                f"[{self.name}] {len(residual)} residual, {len(suspicious)} suspicious spans "
+                f"({validation_report['method']})"
+            )
+        return validation_report
@@ -1,4 +1,54 @@
 from .agent_base import AgentBase
+from utils.nlp import load_spacy
+from utils.tracing import propagate
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from spacy.lang.en.stop_words import STOP_WORDS
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Identifiers redacted locally without asking the LLM. A named group "value"
+# narrows the redaction to the identifier itself (e.g. keeps the "MRN:" label).
+PHI_PATTERNS = [
+    ("EMAIL", re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")),
+    ("SSN", re.compile(r"\b\d{3}-\d{2}-\d{4}\b")),
+    ("MRN", re.compile(
+        r"\b(?:MRN|medical record(?: number| no\.?)?|patient id|account(?: number| no\.?)?)"
+        r"\s*[:#]?\s*(?P<value>[A-Z0-9-]*\d[A-Z0-9-]{3,})\b",
+        re.IGNORECASE,
+    )),
+    ("PHONE", re.compile(r"(?<!\w)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]\d{4}\b")),
+    ("DATE", re.compile(
+        r"\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2}|"
+        r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})\b",
+        re.IGNORECASE,
+    )),
+    ("ADDRESS", re.compile(
+        r"\b\d{1,5}\s+(?:[A-Z][a-z]+\s+){1,3}"
+        r"(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way)\b"
+    )),
+    ("NAME", re.compile(r"\b(?:Dr|Mr|Mrs|Ms|Miss)\.?\s+(?P<value>[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)")),
+]
+
+# spaCy entity labels that are always redacted locally
+ENTITY_CATEGORIES = {
+    "PERSON": "NAME",
+    "GPE": "LOCATION",
+    "ORG": "ORGANIZATION",
+}
+
+# spaCy entity labels that may or may not be PHI; the LLM decides in hybrid mode
+AMBIGUOUS_LABELS = {"LOC", "FAC"}
+
+PLACEHOLDER_PATTERN = re.compile(r"\[[A-Z_]+_\d+\]")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+LONG_NUMBER = re.compile(r"\b\d{5,}\b")
+LLM_FINDING = re.compile(r"^\s*[-*\d.)]*\s*([A-Za-z_ ]+?)\s*:\s*(.+?)\s*$")
+# LLM findings shorter than this are too likely to be common words or fragments
+MIN_FINDING_CHARS = 3
+
+SANITIZE_MODES = ("local", "hybrid", "llm")
 
 
 class SanitizeDataTool(AgentBase):
@@ -6,20 +56,250 @@ class SanitizeDataTool(AgentBase):
         super().__init__(
             name="SanitizeDataTool", max_retries=max_retries, verbose=verbose
         )
+        # "local": regex + spaCy only, "hybrid": LLM reviews ambiguous sentences only,
+        # "llm": LLM reviews the whole (pre-redacted) record
+        self.mode = os.getenv("SANITIZE_MODE", "hybrid")
+        # Large records are reviewed by the LLM in overlapping chunks, concurrently
+        self.chunk_chars = int(os.getenv("SANITIZE_CHUNK_CHARS", "4000"))
+        self.chunk_overlap = int(os.getenv("SANITIZE_CHUNK_OVERLAP", "200"))
+        self.chunk_workers = int(os.getenv("SANITIZE_WORKERS", "4"))
+        # spaCy model for English, shared with the other agents
+        self.nlp = load_spacy()
+
+    def _find_spans(self, text: str, doc) -> List[Tuple[int, int, str]]:
+        """Locate obvious identifiers with the compiled patterns and spaCy NER"""
+        spans = []
+        for category, pattern in PHI_PATTERNS:
+            for match in pattern.finditer(text):
+                group = "value" if "value" in pattern.groupindex else 0
+                spans.append((match.start(group), match.end(group), category))
+        for ent in doc.ents:
+            category = ENTITY_CATEGORIES.get(ent.label_)
+            if category:
+                spans.append((ent.start_char, ent.end_char, category))
+
+        # Keep the earliest, then longest span where spans overlap
+        spans.sort(key=lambda span: (span[0], -(span[1] - span[0])))
+        resolved = []
+        for start, end, category in spans:
+            if resolved and start < resolved[-1][1]:
+                continue
+            resolved.append((start, end, category))
+        return resolved
+
+    def _find_ambiguous(self, doc, spans: List[Tuple[int, int, str]]) -> Set[str]:
+        """Collect strings that might be PHI but are not redacted by the local rules"""
+        covered = [(start, end) for start, end, _ in spans]
+
+        def is_covered(start, end):
+            return any(s <= start and end <= e for s, e in covered)
+
+        candidates = set()
+        for ent in doc.ents:
+            if ent.label_ in AMBIGUOUS_LABELS and not is_covered(ent.start_char, ent.end_char):
+                candidates.add(ent.text)
+        for token in doc:
+            # Capitalized proper nouns spaCy could not classify, e.g. uncommon surnames
+            if (token.pos_ == "PROPN" and not token.ent_type_ and token.is_title
+                    and not token.is_sent_start and not is_covered(token.idx, token.idx + len(token))):
+                candidates.add(token.text)
+        for match in LONG_NUMBER.finditer(doc.text):
+            if not is_covered(match.start(), match.end()):
+                candidates.add(match.group())
+        return candidates
+
+    @staticmethod
+    def _normalize(value: str) -> str:
+        return " ".join(value.split()).casefold()
+
+    def _assign_placeholder(self, mapping: Dict[Tuple[str, str], str], category: str, value: str) -> str:
+        """Return the placeholder for value, numbering new ones per category"""
+        key = (category, self._normalize(value))
+        if key not in mapping:
+            count = sum(1 for c, _ in mapping if c == category)
+            mapping[key] = f"[{category}_{count + 1}]"
+        return mapping[key]
+
+    def _apply_mapping(self, text: str, mapping: Dict[Tuple[str, str], str]) -> str:
+        """Replace every occurrence of every known identifier with its placeholder"""
+        if not mapping:
+            return text
+        by_value = {}
+        for (_, value), placeholder in mapping.items():
+            by_value.setdefault(value, placeholder)
+        # Longest values first so "John Smith" wins over "John"
+        alternatives = sorted(by_value, key=len, reverse=True)
+        pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(r"\s+".join(map(re.escape, v.split())) for v in alternatives) + r")(?!\w)",
+            re.IGNORECASE,
+        )
+        return pattern.sub(lambda m: by_value.get(self._normalize(m.group()), m.group()), text)
+
+    def _redact_locally(self, text: str, mapping: Dict[Tuple[str, str], str]) -> Tuple[str, Set[str]]:
+        """Deterministic redaction pass; returns the redacted text and ambiguous candidates"""
+        doc = self.nlp(text)
+        spans = self._find_spans(text, doc)
+        for start, end, category in spans:
+            self._assign_placeholder(mapping, category, text[start:end])
+        return self._apply_mapping(text, mapping), self._find_ambiguous(doc, spans)
 
-    def execute(self, medical_data):
+    def _llm_find_phi(self, text: str) -> List[Tuple[str, str]]:
+        """Ask the LLM for PHI left in text, as (category, value) pairs found verbatim in text"""
         messages = [
             {
                 "role": "system",
-                "content": "You are an AI assistant that sanitizes medical data by removing Protectedd Health Information (PHI) and other sensitive information.",
+                "content": "You are an AI assistant that finds Protected Health Information (PHI) and other sensitive information in medical data.",
             },
             {
                 "role": "user",
                 "content": (
-                    f"Remove all PHI from the following data:\n\n"
-                    f"{medical_data}\n\nSanitized Data:"
+                    "The following text has already been partially de-identified; placeholders such as [NAME_1] are safe.\n"
+                    "List every remaining piece of PHI exactly as it appears in the text, one per line, formatted as CATEGORY: text "
+                    "(categories: NAME, LOCATION, ORGANIZATION, DATE, ID, CONTACT, OTHER). Reply NONE if there is no PHI left.\n\n"
+                    f"{text}\n\nRemaining PHI:"
                 ),
             },
         ]
-        sanitized_data = self.call_openai(messages, max_tokens=300)
-        return sanitized_data
+        reply = self.call_openai(messages, max_tokens=300, temperature=0.0)
+
+        findings = []
+        for line in (reply or "").splitlines():
+            match = LLM_FINDING.match(line)
+            if not match:
+                continue
+            category = match.group(1).strip().upper().replace(" ", "_")
+            value = match.group(2).strip().strip("\"'`")
+            if self._plausible_finding(text, category, value):
+                findings.append((category, value))
+        return findings
+
+    @staticmethod
+    def _plausible_finding(text: str, category: str, value: str) -> bool:
+        """
+        Whether an LLM finding may go into the shared mapping, which redacts it everywhere
+        It must occur as a whole word in the text it was found in, and not be a placeholder,
+        a very short token or only stopwords (a common word would be redacted throughout).
+        Uncategorized (OTHER) findings must also look like an identifier: a digit or a capital.
+        """
+        if len(value) < MIN_FINDING_CHARS or PLACEHOLDER_PATTERN.fullmatch(value):
+            return False
+        words = re.findall(r"\w+", value)
+        if all(word.casefold() in STOP_WORDS for word in words):
+            return False
+        if category == "OTHER" and not any(c.isdigit() for c in value) and not any(w[0].isupper() for w in words):
+            return False
+        occurrence = r"(?<!\w)" + r"\s+".join(map(re.escape, value.split())) + r"(?!\w)"
+        return re.search(occurrence, text, re.IGNORECASE) is not None
+
+    def _split_ranges(self, text: str) -> List[Tuple[int, int]]:
+        """Partition text into ranges of at most chunk_chars, cutting at line, sentence or word breaks"""
+        ranges = []
+        start = 0
+        while start < len(text):
+            end = min(start + self.chunk_chars, len(text))
+            if end < len(text):
+                window = text[start:end]
+                for separator in ("\n", ". ", " "):
+                    cut = window.rfind(separator, len(window) // 2)
+                    if cut != -1:
+                        end = start + cut + len(separator)
+                        break
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def _review_text(self, window: str, mode: str, ambiguous: Set[str]) -> str:
+        """The part of a chunk window the LLM has to look at in the given mode"""
+        if mode == "llm":
+            return window
+        if mode == "hybrid" and ambiguous:
+            # Only the sentences that still contain ambiguous spans go to the LLM
+            sentences = [s for s in SENTENCE_BREAK.split(window) if s.strip()]
+            return "\n".join(s for s in sentences if any(c in s for c in ambiguous))
+        return ""
+
+    def _sanitize_chunks(self, medical_data: str, mode: str, state: Dict) -> Iterator[int]:
+        """
+        Redact locally, review chunk windows with the LLM concurrently and yield the number
+        of chunks done as reviews finish. state receives the chunk count, the shared
+        placeholder mapping and, once the generator is exhausted, the fully stitched text.
+        """
+        if mode not in SANITIZE_MODES:
+            raise ValueError(f"[{self.name}] Unknown sanitize mode '{mode}', expected one of {SANITIZE_MODES}")
+
+        mapping = state.setdefault("mapping", {})
+        state["llm_reviewed_chars"] = 0
+        sanitized, ambiguous = self._redact_locally(medical_data, mapping)
+        ranges = self._split_ranges(sanitized)
+        state["chunks"] = len(ranges)
+
+        # One review per chunk, widened by the overlap so spans on a boundary are seen whole
+        reviews = {}
+        for index, (start, end) in enumerate(ranges):
+            window = sanitized[max(0, start - self.chunk_overlap):end + self.chunk_overlap]
+            review = self._review_text(window, mode, ambiguous)
+            if review:
+                reviews[index] = review
+                state["llm_reviewed_chars"] += len(review)
+
+        # Chunks without anything to review are done as soon as the local pass is
+        done = len(ranges) - len(reviews)
+        if done:
+            yield done
+        if not reviews:
+            state["sanitized"] = sanitized
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.chunk_workers, len(reviews)))) as executor:
+            futures = [executor.submit(propagate(self._llm_find_phi), review) for review in reviews.values()]
+            for future in as_completed(futures):
+                # Findings from every chunk share one mapping, so a name keeps its placeholder everywhere
+                for category, value in future.result():
+                    self._assign_placeholder(mapping, category, value)
+                done += 1
+                yield done
+
+        # The mapping is only complete now; applying it once replaces every finding in every chunk
+        state["sanitized"] = self._apply_mapping(sanitized, mapping)
+
+    def iter_sanitize(self, medical_data: str, mode: Optional[str] = None,
+                      state: Optional[Dict] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Sanitize medical_data, yielding (chunks done, chunks in total) as the chunk reviews finish
+        The text itself is only available once complete, as state["sanitized"]:
+        an identifier the LLM finds in a later chunk may still appear in earlier ones.
+        """
+        state = {} if state is None else state
+        for done in self._sanitize_chunks(medical_data, mode or self.mode, state):
+            yield done, state["chunks"]
+
+    def sanitize(self, medical_data: str, mode: Optional[str] = None, include_placeholders: bool = False) -> Dict:
+        """
+        Remove PHI from medical_data
+        Returns the sanitized text, the number of identifiers redacted per category and how
+        much text the LLM reviewed. The placeholder -> original value map re-identifies the
+        data, so it is only included with include_placeholders=True.
+        """
+        mode = mode or self.mode
+        state = {}
+        for _ in self._sanitize_chunks(medical_data, mode, state):
+            pass
+        mapping = state["mapping"]
+        sanitized = state["sanitized"]
+
+        if self.verbose:
+            self.logger.info(
+                f"[{self.name}] Redacted {len(mapping)} identifiers ({mode} mode, "
+                f"{state['llm_reviewed_chars']} of {len(medical_data)} chars reviewed by LLM)"
+            )
+        result = {
+            "sanitized": sanitized,
+            "redacted": dict(Counter(category for category, _ in mapping)),
+            "llm_reviewed_chars": state["llm_reviewed_chars"],
+        }
+        if include_placeholders:
+            result["placeholders"] = {placeholder: value for (_, value), placeholder in mapping.items()}
+        return result
+
+    def execute(self, medical_data, mode=None):
+        return self.sanitize(medical_data, mode)["sanitized"]
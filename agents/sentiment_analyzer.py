@@ -1,23 +1,16 @@
 from .agent_base import AgentBase
-from typing import List, Dict
-import os
+from utils.nlp import load_spacy
+from typing import Dict, Iterable, Iterator, List
 import json
 import re
-import spacy
 from textblob import TextBlob
 from pathlib import Path
 
 class SentimentAnalyzerTool(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
         super().__init__(name="SentimentAnalyzerTool", max_retries=max_retries, verbose=verbose)
-        # Load spaCy model for English
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            # If model not found, download it
-            self.logger.info("Downloading spaCy model...")
-            os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        # spaCy model for English, shared with the other agents
+        self.nlp = load_spacy()
 
     def _analyze_sentiment(self, text: str) -> Dict:
         """
@@ -86,8 +79,10 @@ class SentimentAnalyzerTool(AgentBase):
 
     def execute(self, news_items: List[Dict]) -> List[Dict]:
         """Analyze sentiment of news articles using spaCy and TextBlob"""
-        analyzed_items = []
-        
+        return list(self.iter_execute(news_items))
+
+    def iter_execute(self, news_items: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield each news item with its sentiment as soon as it is analyzed"""
         for item in news_items:
             try:
                 # Combine title and description for analysis
@@ -102,6 +97,4 @@ class SentimentAnalyzerTool(AgentBase):
                     'explanation': 'Error analyzing sentiment'
                 }
             
-            analyzed_items.append(item)
-            
-        return analyzed_items
+            yield item
@@ -1,6 +1,5 @@
 from .agent_base import AgentBase
-import spacy
-import os
+from utils.nlp import load_spacy
 from textblob import TextBlob
 from typing import Dict, List, Union
 import re
@@ -11,13 +10,8 @@ class SentimentValidatorAgent(AgentBase):
         super().__init__(
             name="SentimentValidatorAgent", max_retries=max_retries, verbose=verbose
         )
-        # Load spaCy model
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            self.logger.info("Downloading spaCy model...")
-            os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        # spaCy model, shared with the other agents
+        self.nlp = load_spacy()
 
     def _validate_price_terms(self, text: str, sentiment_score: float) -> Dict[str, Union[float, List[str]]]:
         """Validate sentiment against price-related terms"""
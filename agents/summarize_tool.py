@@ -1,25 +1,62 @@
 from .agent_base import AgentBase
-import spacy
+from utils.nlp import load_spacy
 import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from spacy.tokens import DocBin
 from textblob import TextBlob
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Blank lines and ALL-CAPS headings ("HISTORY OF PRESENT ILLNESS:") start a new section
+SECTION_BREAK = re.compile(r"\n\s*\n|\n(?=[A-Z][A-Z /&-]{2,}:)")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+MEDICAL_TERMS = {'patient', 'treatment', 'diagnosis', 'symptoms', 'disease',
+                 'condition', 'medical', 'clinical', 'health', 'care'}
+
+# Process-wide worker pool for chunked summarization, created on first use
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+# SummarizeTool instance owned by each worker process
+_chunk_worker = None
+
+
+def _init_chunk_worker():
+    """Load the spaCy model once per worker process"""
+    global _chunk_worker
+    _chunk_worker = SummarizeTool(verbose=False)
+    _chunk_worker.chunk_workers = 1
+
+
+def _map_chunk_in_worker(index: int, text: str, num_sentences: int) -> Dict:
+    return _chunk_worker._map_chunk(index, text, num_sentences)
+
+
+def _get_chunk_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    The shared chunk pool, sized by its first user
+    Sessions summarize concurrently, so the pool is never swapped while another may be submitting
+    to it; a later, different workers value only changes that caller's number of chunks in flight.
+    """
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            _chunk_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker)
+        return _chunk_pool
+
 
 class SummarizeTool(AgentBase):
     def __init__(self, max_retries=2, verbose=True):
         super().__init__(name="SummarizeTool", max_retries=max_retries, verbose=verbose)
-        # Load spaCy model for English
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            # If model not found, download it
-            self.logger.info("Downloading spaCy model...")
-            os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
-
-    def _extract_key_info(self, text: str) -> Dict:
-        """Extract key information using spaCy"""
-        doc = self.nlp(text)
-        
+        # Texts longer than this are summarized chunk by chunk (map-reduce)
+        self.chunk_chars = int(os.getenv("SUMMARIZE_CHUNK_CHARS", "20000"))
+        self.chunk_workers = int(os.getenv("SUMMARIZE_WORKERS", str(os.cpu_count() or 1)))
+        # spaCy model for English, shared with the other agents
+        self.nlp = load_spacy()
+
+    def _extract_key_info(self, doc) -> Dict:
+        """Extract key information from a parsed spaCy doc"""
         # Extract named entities
         entities = {
             'conditions': [],    # Medical conditions
@@ -46,42 +83,65 @@ class SummarizeTool(AgentBase):
         
         return entities
 
-    def _get_key_sentences(self, text: str, num_sentences: int = 3) -> List[str]:
-        """Extract key sentences using TextBlob"""
-        blob = TextBlob(text)
-        
-        # Score sentences by importance
-        sentence_scores = []
-        for sentence in blob.sentences:
+    def _score_sentences(self, blob: TextBlob) -> List[Tuple[int, float, float, str]]:
+        """Score sentences by length and medical terms, independent of position"""
+        scored = []
+        for index, sentence in enumerate(blob.sentences):
+            words = sentence.words
+            if not words:
+                continue
             # Score based on length (not too short, not too long)
-            length_score = min(len(sentence.words) / 20.0, 1.0)
+            length_score = min(len(words) / 20.0, 1.0)
             
             # Score based on presence of medical terms
-            medical_terms = ['patient', 'treatment', 'diagnosis', 'symptoms', 'disease', 
-                           'condition', 'medical', 'clinical', 'health', 'care']
-            term_score = sum(1 for word in sentence.words if word.lower() in medical_terms) / len(sentence.words)
-            
+            term_score = sum(1 for word in words if word.lower() in MEDICAL_TERMS) / len(words)
+            scored.append((index, length_score, term_score, str(sentence)))
+        return scored
+
+    def _rank_sentences(self, scored: List[Tuple[int, float, float, str]], total: int,
+                        num_sentences: int, offset: int = 0) -> List[Tuple[int, float, float, str]]:
+        """Rank scored sentences, adding the position score relative to the whole text"""
+        def total_score(item):
+            index, length_score, term_score, _ = item
             # Score based on sentence position (earlier sentences often more important)
-            position_score = 1.0 - (blob.sentences.index(sentence) / len(blob.sentences))
-            
-            # Combine scores
-            total_score = (length_score + term_score + position_score) / 3
-            sentence_scores.append((sentence, total_score))
-        
-        # Sort by score and get top sentences
-        sentence_scores.sort(key=lambda x: x[1], reverse=True)
-        return [str(sent[0]) for sent in sentence_scores[:num_sentences]]
+            position_score = 1.0 - ((offset + index) / total)
+            return (length_score + term_score + position_score) / 3
+
+        return sorted(scored, key=total_score, reverse=True)[:num_sentences]
 
-    def execute(self, text: str) -> Dict:
+    def _get_key_sentences(self, blob: TextBlob, num_sentences: int = 3) -> List[str]:
+        """Extract key sentences using TextBlob"""
+        scored = self._score_sentences(blob)
+        ranked = self._rank_sentences(scored, len(blob.sentences), num_sentences)
+        return [sentence for _, _, _, sentence in ranked]
+
+    def execute(self, text: str, include_artifacts: bool = False, chunked: Optional[bool] = None) -> Dict:
         """
         Summarize medical text using NLP techniques
         Returns a dictionary with key information and summary
+
+        With include_artifacts=True the summary also carries the parsed
+        artifacts under 'artifacts' so SummarizeValidatorAgent can skip
+        re-parsing the same text.
+
+        chunked=None switches to map-reduce summarization automatically for
+        texts longer than chunk_chars; pass True/False to force either mode.
         """
+        if chunked is None:
+            chunked = len(text) > self.chunk_chars
+        if chunked:
+            return self._execute_chunked(text, include_artifacts)
+
+        # Parse once and share the results between all the steps below
+        doc = self.nlp(text)
+        blob = TextBlob(text)
+        sentence_count = len(blob.sentences)
+
         # Extract entities and key information
-        entities = self._extract_key_info(text)
+        entities = self._extract_key_info(doc)
         
         # Get key sentences
-        key_sentences = self._get_key_sentences(text)
+        key_sentences = self._get_key_sentences(blob)
         
         # Create structured summary
         summary = {
@@ -89,7 +149,7 @@ class SummarizeTool(AgentBase):
             'entities': entities,
             'statistics': {
                 'word_count': len(text.split()),
-                'sentence_count': len(TextBlob(text).sentences),
+                'sentence_count': sentence_count,
                 'medical_terms_found': len(entities['conditions']) + 
                                      len(entities['medications']) + 
                                      len(entities['procedures'])
@@ -97,10 +157,149 @@ class SummarizeTool(AgentBase):
         }
         
         # Add sentiment analysis for context
-        blob = TextBlob(text)
         summary['sentiment'] = {
             'polarity': round(blob.sentiment.polarity, 2),  # -1 to 1
             'subjectivity': round(blob.sentiment.subjectivity, 2)  # 0 to 1
         }
+
+        if include_artifacts:
+            summary['artifacts'] = self._build_artifacts(doc, entities, sentence_count, summary['sentiment'])
         
         return summary
+
+    def _build_artifacts(self, doc, entities: Dict, sentence_count: int, sentiment: Dict) -> Dict:
+        """Package parse results of the original text for downstream validation"""
+        return {
+            'doc_bin': DocBin(docs=[doc]).to_bytes(),
+            'entities': {
+                category: [e.lower() for e in values]
+                for category, values in entities.items()
+            },
+            'sentence_count': sentence_count,
+            'sentiment': dict(sentiment),
+        }
+
+    def _iter_chunks(self, text: str) -> Iterator[str]:
+        """Split text into chunks of at most chunk_chars on section, then sentence boundaries"""
+        buffer = ""
+        for section in SECTION_BREAK.split(text):
+            pieces = [section]
+            if len(section) > self.chunk_chars:
+                pieces = SENTENCE_BREAK.split(section)
+            for piece in pieces:
+                # Hard split anything that still does not fit (e.g. tables without punctuation)
+                while len(piece) > self.chunk_chars:
+                    if buffer:
+                        yield buffer
+                        buffer = ""
+                    yield piece[:self.chunk_chars]
+                    piece = piece[self.chunk_chars:]
+                if buffer and len(buffer) + len(piece) + 1 > self.chunk_chars:
+                    yield buffer
+                    buffer = ""
+                buffer = f"{buffer}\n{piece}" if buffer else piece
+        if buffer.strip():
+            yield buffer
+
+    def _map_chunk(self, index: int, text: str, num_sentences: int = 3) -> Dict:
+        """Summarize a single chunk into a small partial result for the reduce step"""
+        doc = self.nlp(text)
+        blob = TextBlob(text)
+        sentence_count = len(blob.sentences)
+        scored = self._score_sentences(blob)
+        return {
+            'index': index,
+            'entities': self._extract_key_info(doc),
+            'candidates': self._rank_sentences(scored, max(sentence_count, 1), num_sentences),
+            'sentence_count': sentence_count,
+            'word_count': len(text.split()),
+            'polarity': blob.sentiment.polarity,
+            'subjectivity': blob.sentiment.subjectivity,
+        }
+
+    def _reduce_chunks(self, partials: List[Dict], num_sentences: int = 3) -> Tuple[List[str], Dict, Dict, Dict]:
+        """Merge chunk partials into key points, entities, statistics and sentiment"""
+        partials = sorted(partials, key=lambda p: p['index'])
+        total_sentences = sum(p['sentence_count'] for p in partials)
+        total_words = sum(p['word_count'] for p in partials)
+
+        # Re-rank every chunk's candidates with positions relative to the whole text
+        candidates = []
+        offset = 0
+        for partial in partials:
+            candidates.extend(
+                (offset + index, length_score, term_score, sentence)
+                for index, length_score, term_score, sentence in partial['candidates']
+            )
+            offset += partial['sentence_count']
+        candidates = self._rank_sentences(candidates, max(total_sentences, 1), num_sentences)
+        key_points = [sentence for _, _, _, sentence in candidates]
+
+        # Merge entity sets, keeping first-seen order
+        entities = {}
+        for partial in partials:
+            for category, values in partial['entities'].items():
+                merged = entities.setdefault(category, {})
+                for value in values:
+                    merged.setdefault(value, None)
+        entities = {category: list(values) for category, values in entities.items()}
+
+        statistics = {
+            'word_count': total_words,
+            'sentence_count': total_sentences,
+            'medical_terms_found': len(entities.get('conditions', [])) +
+                                 len(entities.get('medications', [])) +
+                                 len(entities.get('procedures', []))
+        }
+
+        # Word-weighted average of the chunk sentiments
+        weight = max(total_words, 1)
+        sentiment = {
+            'polarity': round(sum(p['polarity'] * p['word_count'] for p in partials) / weight, 2),
+            'subjectivity': round(sum(p['subjectivity'] * p['word_count'] for p in partials) / weight, 2)
+        }
+        return key_points, entities, statistics, sentiment
+
+    def _map_chunks(self, text: str, num_sentences: int) -> List[Dict]:
+        """Summarize chunks in parallel worker processes, keeping a bounded number in flight"""
+        chunks = enumerate(self._iter_chunks(text))
+        if self.chunk_workers <= 1:
+            return [self._map_chunk(index, chunk, num_sentences) for index, chunk in chunks]
+
+        pool = _get_chunk_pool(self.chunk_workers)
+        max_in_flight = self.chunk_workers * 2
+        partials = []
+        pending = set()
+        for index, chunk in chunks:
+            pending.add(pool.submit(_map_chunk_in_worker, index, chunk, num_sentences))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                partials.extend(future.result() for future in done)
+        done, _ = wait(pending)
+        partials.extend(future.result() for future in done)
+        return partials
+
+    def _execute_chunked(self, text: str, include_artifacts: bool = False, num_sentences: int = 3) -> Dict:
+        """Map-reduce summarization for texts too long to parse as a single doc"""
+        partials = self._map_chunks(text, num_sentences)
+        if self.verbose:
+            self.logger.info(f"[{self.name}] Summarized {len(partials)} chunks of up to {self.chunk_chars} chars")
+        key_points, entities, statistics, sentiment = self._reduce_chunks(partials, num_sentences)
+
+        summary = {
+            'key_points': key_points,
+            'entities': entities,
+            'statistics': statistics,
+            'sentiment': sentiment,
+        }
+        if include_artifacts:
+            # No DocBin here: keeping every chunk's doc would defeat the bounded memory
+            summary['artifacts'] = {
+                'entities': {
+                    category: [e.lower() for e in values]
+                    for category, values in entities.items()
+                },
+                'sentence_count': statistics['sentence_count'],
+                'sentiment': dict(sentiment),
+            }
+        return summary
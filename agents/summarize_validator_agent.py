@@ -1,10 +1,10 @@
 # agents/summarize_validator_agent.py
 
 from .agent_base import AgentBase
-import spacy
-import os
+from utils.nlp import load_spacy
+from spacy.tokens import DocBin
 from textblob import TextBlob
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 
 class SummarizeValidatorAgent(AgentBase):
@@ -12,16 +12,11 @@ class SummarizeValidatorAgent(AgentBase):
         super().__init__(
             name="SummarizeValidatorAgent", max_retries=max_retries, verbose=verbose
         )
-        # Load spaCy model
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            self.logger.info("Downloading spaCy model...")
-            os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        # spaCy model, shared with the other agents
+        self.nlp = load_spacy()
 
-    def _validate_entities(self, original_doc, summary_entities: Dict) -> Dict:
-        """Validate that important entities from original text are present in summary"""
+    def _original_entities(self, original_doc) -> Dict[str, List[str]]:
+        """Group the lowercased entities of the original text by category"""
         original_entities = {
             'conditions': [],
             'medications': [],
@@ -46,6 +41,29 @@ class SummarizeValidatorAgent(AgentBase):
             elif ent.label_ == 'ORG':
                 original_entities['organizations'].append(ent.text.lower())
 
+        return original_entities
+
+    @staticmethod
+    def _is_covered(entity: str, summary_set: Set[str], summary_lengths: Set[int], haystack: str) -> bool:
+        """True if entity equals, contains or is contained in a summary entity"""
+        if entity in summary_set:
+            return True
+        if not entity:
+            return bool(summary_set)
+        # entity inside a summary entity: one substring search over the joined set
+        if entity and entity in haystack:
+            return True
+        # summary entity inside entity: hash lookups of the entity's substrings
+        for length in summary_lengths:
+            if length > len(entity):
+                continue
+            for start in range(len(entity) - length + 1):
+                if entity[start:start + length] in summary_set:
+                    return True
+        return False
+
+    def _validate_entities(self, original_entities: Dict[str, List[str]], summary_entities: Dict) -> Dict:
+        """Validate that important entities from original text are present in summary"""
         # Compare entities
         entity_coverage = {}
         for category in original_entities:
@@ -53,19 +71,27 @@ class SummarizeValidatorAgent(AgentBase):
                 entity_coverage[category] = 1.0  # Perfect score if no entities of this type
                 continue
                 
-            summary_ents = [e.lower() for e in summary_entities[category]]
-            matched = sum(1 for e in original_entities[category] if any(s in e or e in s for s in summary_ents))
+            summary_set = {e.lower() for e in summary_entities[category]}
+            summary_lengths = {len(e) for e in summary_set}
+            # NUL never occurs in entity text, so matches cannot span two entities
+            haystack = "\0".join(summary_set)
+            matched = sum(
+                1 for e in original_entities[category]
+                if self._is_covered(e, summary_set, summary_lengths, haystack)
+            )
             entity_coverage[category] = matched / len(original_entities[category])
 
         return entity_coverage
 
-    def _validate_sentiment_consistency(self, original_text: str, summary_sentiment: Dict) -> float:
+    def _validate_sentiment_consistency(self, original_text: str, summary_sentiment: Dict,
+                                        original_sentiment: Optional[Dict] = None) -> float:
         """Check if summary sentiment aligns with original text sentiment"""
-        original_blob = TextBlob(original_text)
-        original_sentiment = {
-            'polarity': round(original_blob.sentiment.polarity, 2),
-            'subjectivity': round(original_blob.sentiment.subjectivity, 2)
-        }
+        if original_sentiment is None:
+            original_blob = TextBlob(original_text)
+            original_sentiment = {
+                'polarity': round(original_blob.sentiment.polarity, 2),
+                'subjectivity': round(original_blob.sentiment.subjectivity, 2)
+            }
         
         # Calculate sentiment similarity (1 = perfect match, 0 = complete opposite)
         polarity_diff = abs(original_sentiment['polarity'] - summary_sentiment['polarity'])
@@ -79,18 +105,34 @@ class SummarizeValidatorAgent(AgentBase):
         """
         Validate the structured summary against the original text
         Returns a detailed validation report
+
+        Parse artifacts attached by SummarizeTool (include_artifacts=True)
+        are reused instead of re-running spaCy and TextBlob on original_text.
         """
-        # Process original text with spaCy
-        original_doc = self.nlp(original_text)
+        artifacts = summary.get('artifacts') or {}
+
+        # Reuse the entities already extracted from the original text when available
+        if 'entities' in artifacts:
+            original_entities = artifacts['entities']
+        elif 'doc_bin' in artifacts:
+            original_doc = next(DocBin().from_bytes(artifacts['doc_bin']).get_docs(self.nlp.vocab))
+            original_entities = self._original_entities(original_doc)
+        else:
+            original_entities = self._original_entities(self.nlp(original_text))
         
         # Validate entity coverage
-        entity_coverage = self._validate_entities(original_doc, summary['entities'])
+        entity_coverage = self._validate_entities(original_entities, summary['entities'])
         
         # Validate sentiment consistency
-        sentiment_score = self._validate_sentiment_consistency(original_text, summary['sentiment'])
+        sentiment_score = self._validate_sentiment_consistency(
+            original_text, summary['sentiment'], artifacts.get('sentiment')
+        )
         
         # Calculate content density score
-        content_density = min(len(summary['key_points']) / (len(TextBlob(original_text).sentences) * 0.3), 1.0)
+        sentence_count = artifacts.get('sentence_count')
+        if sentence_count is None:
+            sentence_count = len(TextBlob(original_text).sentences)
+        content_density = min(len(summary['key_points']) / (sentence_count * 0.3), 1.0)
         
         # Calculate overall quality score (1-5 scale)
         entity_score = sum(entity_coverage.values()) / len(entity_coverage)
@@ -46,3 +46,23 @@ class ValidatorAgent(AgentBase):
             # response_format={"type": "text"}
         )
         return validation
+
+    def validate_section(self, topic, section):
+        """Short assessment of a single article section, used when validating incrementally"""
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an AI assistant that validates research articles for accuracy, completeness, and adherence to academic standards.",
+            },
+            {
+                "role": "user",
+                "content": (
+                    "Given the topic and one section of a research article, assess its accuracy, clarity and academic quality in two or three sentences.\n"
+                    "End with a rating on a scale of 1 to 5 formatted as 'Rating: N/5'.\n\n"
+                    f"Topic: {topic}\n\n"
+                    f"Section:\n{section}\n\n"
+                    "Validation:"
+                ),
+            },
+        ]
+        return self.call_openai(messages=messages, temperature=0.3, max_tokens=200)
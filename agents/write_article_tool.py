@@ -1,4 +1,13 @@
 from .agent_base import AgentBase
+from utils.tracing import propagate
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Leading bullets, numbering ("1.", "II)", "a.") and markdown heading marks on outline lines
+OUTLINE_MARKER = re.compile(r"^\s*(?:[-*+#]+|\(?(?:\d+|[ivxlcIVXLC]+|[a-zA-Z])[.)])\s*")
 
 
 class WriteArticleTool(AgentBase):
@@ -6,9 +15,14 @@ class WriteArticleTool(AgentBase):
         super().__init__(
             name="WriteArticleTool", max_retries=max_retries, verbose=verbose
         )
+        self.section_workers = int(os.getenv("ARTICLE_SECTION_WORKERS", "4"))
+        self.section_max_tokens = int(os.getenv("ARTICLE_SECTION_MAX_TOKENS", "1000"))
+
+    def execute(self, topic, outline=None, parallel=False):
+        if parallel:
+            return self._write_sections(topic, outline)
 
-    def execute(self, topic, outline=None):
-        system_message = ("You are an expert academic writer.",)
+        system_message = "You are an expert academic writer."
         user_content = (
             f"Write a research article about the following topic:\nTopic: {topic}\n\n"
         )
@@ -23,3 +37,116 @@ class WriteArticleTool(AgentBase):
         ]
         article = self.call_openai(messages, max_tokens=4000)
         return article
+
+    def _parse_outline(self, outline: str) -> List[Tuple[str, List[str]]]:
+        """Split an outline into (section title, notes) pairs; indented lines are notes"""
+        sections = []
+        for line in outline.splitlines():
+            if not line.strip():
+                continue
+            text = OUTLINE_MARKER.sub("", line).strip()
+            if not text:
+                continue
+            if line[:1].isspace() and sections:
+                sections[-1][1].append(text)
+            else:
+                sections.append((text, []))
+        return sections
+
+    def _generate_outline(self, topic: str) -> str:
+        """Ask for a short list of section headings for the topic"""
+        messages = [
+            {"role": "system", "content": "You are an expert academic writer."},
+            {
+                "role": "user",
+                "content": (
+                    f"Create an outline for a research article about the following topic:\nTopic: {topic}\n\n"
+                    "Reply with 4 to 6 section headings only, one per line, without numbering or commentary.\n\n"
+                    "Outline:\n"
+                ),
+            },
+        ]
+        return self.call_openai(messages, max_tokens=200, temperature=0.3)
+
+    def _style_brief(self, topic: str, sections: List[Tuple[str, List[str]]]) -> str:
+        """Shared instructions that keep independently written sections consistent"""
+        headings = "\n".join(f"{i}. {title}" for i, (title, _) in enumerate(sections, start=1))
+        return (
+            "You are an expert academic writer working on one section of a research article.\n"
+            f"Article topic: {topic}\n"
+            f"Full outline:\n{headings}\n\n"
+            "Style: formal academic register, third person, present tense, concise paragraphs, "
+            "no repetition of material that belongs to other sections. "
+            "Write only the body of the requested section, without its heading."
+        )
+
+    def _write_section(self, brief: str, index: int, title: str, notes: List[str]) -> str:
+        user_content = f"Write section {index}: {title}\n\n"
+        if notes:
+            user_content += "Cover the following points:\n" + "\n".join(f"- {n}" for n in notes) + "\n\n"
+        user_content += "Section:\n"
+        messages = [
+            {"role": "system", "content": brief},
+            {"role": "user", "content": user_content},
+        ]
+        return self.call_openai(messages, max_tokens=self.section_max_tokens)
+
+    def _write_sections(self, topic: str, outline: Optional[str] = None) -> str:
+        """Write every outline section concurrently and assemble them in order"""
+        return "\n\n".join(self.iter_sections(topic, outline, parallel=True))
+
+    def iter_sections(self, topic: str, outline: Optional[str] = None, parallel: bool = False) -> Iterator[str]:
+        """
+        Yield the article piece by piece, in order, as soon as each piece is complete
+        parallel=True yields whole outline sections written concurrently; otherwise the
+        single streamed draft is cut at paragraph breaks, headings kept with their paragraph.
+        """
+        if not parallel:
+            yield from self._stream_paragraphs(topic, outline)
+            return
+
+        if not outline or not outline.strip():
+            outline = self._generate_outline(topic)
+        sections = self._parse_outline(outline)
+        if not sections:
+            raise Exception(f"[{self.name}] Could not derive any sections from the outline")
+
+        brief = self._style_brief(topic, sections)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.section_workers, len(sections)))) as executor:
+            futures = [
+                executor.submit(propagate(self._write_section), brief, index, title, notes)
+                for index, (title, notes) in enumerate(sections, start=1)
+            ]
+            for (title, _), future in zip(sections, futures):
+                yield f"## {title}\n\n{future.result().strip()}"
+
+    def _stream_paragraphs(self, topic: str, outline: Optional[str] = None) -> Iterator[str]:
+        user_content = (
+            f"Write a research article about the following topic:\nTopic: {topic}\n\n"
+        )
+        if outline:
+            user_content += f"Outline: {outline}\n\n"
+        user_content += "Article:\n"
+        messages = [
+            {"role": "system", "content": "You are an expert academic writer."},
+            {"role": "user", "content": user_content},
+        ]
+
+        buffer = ""
+        heading = ""
+        for delta in self.stream_openai(messages, max_tokens=4000):
+            buffer += delta
+            *complete, buffer = PARAGRAPH_BREAK.split(buffer)
+            for block in complete:
+                block = block.strip()
+                if not block:
+                    continue
+                # Hold a bare heading back until its first paragraph is complete
+                if block.startswith("#") and "\n" not in block:
+                    heading = f"{heading}\n\n{block}" if heading else block
+                    continue
+                yield f"{heading}\n\n{block}" if heading else block
+                heading = ""
+        tail = "\n\n".join(part for part in (heading, buffer.strip()) if part)
+        if tail:
+            yield tail
@@ -2,13 +2,25 @@
 
 import streamlit as st
 from agents import AgentManager
+from utils.cassette import cassette
+from utils.circuit_breaker import breakers
 from utils.logger import logger
+from utils.model_router import router
+from utils.pipeline import DAGExecutor, pipeline
+from utils.profiler import NO_AGENT, SamplingProfiler, profiling_enabled
+from utils.ollama_pool import ollama_pool
+from utils.scheduler import scheduler
+from utils.tracing import tracer
+from utils.warmup import keep_warm
 import os
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env if present
 load_dotenv()
 
+SECTION_RATING = re.compile(r"Rating:\s*([1-5])\s*/\s*5")
+
 
 def main():
     st.set_page_config(page_title="Multi-Agent AI System", layout="wide")
@@ -25,16 +37,115 @@ def main():
         ],
     )
 
+    if os.getenv("CASSETTE_MODE"):
+        # Record or replay every outbound HTTP and LLM interaction, once per process
+        cassette.start()
     agent_manager = AgentManager(max_retries=2, verbose=True)
+    if os.getenv("OLLAMA_WARMUP", "true").lower() in ("1", "true", "yes"):
+        # Once per process: preload the models, then keep them resident
+        keep_warm.start()
+    if os.getenv("METRICS_PORT"):
+        # Prometheus scrape endpoint for the span metrics, once per process
+        tracer.start_metrics_server(int(os.getenv("METRICS_PORT")))
+
+    profile = st.sidebar.checkbox(
+        "Profile runs",
+        value=profiling_enabled(),
+        help="Sample the stacks of each run and save a speedscope profile and hot functions per agent.",
+    )
+    profiler = SamplingProfiler(name=re.sub(r"\W+", "-", task.lower()).strip("-")).start() if profile else None
+    try:
+        if task == "Summarize Medical Text":
+            summarize_section(agent_manager)
+        elif task == "Write and Refine Research Article":
+            write_and_refine_article_section(agent_manager)
+        elif task == "Sanitize Medical Data (PHI)":
+            sanitize_data_section(agent_manager)
+        elif task == "Financial Digital Assets Analysis":
+            financial_analysis_section(agent_manager)
+    finally:
+        if profiler:
+            profiler.stop()
+    if profiler:
+        profiler_sidebar(profiler)
+
+    llm_backends_sidebar()
+
+
+def profiler_sidebar(profiler):
+    """Save and summarize the profile of a run in which agents did work"""
+    # Reruns that only redraw widgets run no agent code and are not worth keeping
+    if not any(agent != NO_AGENT for _, _, agent in profiler.samples):
+        return
+    paths = profiler.save()
+    with st.sidebar.expander("Profile", expanded=True):
+        st.caption(f"{len(profiler.samples)} samples over {profiler.duration:.2f}s, saved to {paths['speedscope']}")
+        for agent, functions in profiler.top_functions().items():
+            st.markdown(f"**{agent}**")
+            st.table(functions)
+        with open(paths["speedscope"], "rb") as f:
+            st.download_button(
+                "Download speedscope profile",
+                f,
+                file_name=os.path.basename(paths["speedscope"]),
+                mime="application/json",
+            )
+
 
-    if task == "Summarize Medical Text":
-        summarize_section(agent_manager)
-    elif task == "Write and Refine Research Article":
-        write_and_refine_article_section(agent_manager)
-    elif task == "Sanitize Medical Data (PHI)":
-        sanitize_data_section(agent_manager)
-    elif task == "Financial Digital Assets Analysis":
-        financial_analysis_section(agent_manager)
+def llm_backends_sidebar():
+    """Show the LLM backends' circuit breakers and the shared scheduler's queue"""
+    with st.sidebar.expander("LLM backends"):
+        circuits = {}
+        for breaker in breakers.values():
+            status = breaker.status()
+            circuits[breaker.name] = {
+                "circuit": status["state"],
+                "failures": status["failures"],
+                "retry in (s)": f"{status['retry_in']:.0f}",
+            }
+        st.table(circuits)
+        if keep_warm.report:
+            st.caption("Model warm-up")
+            st.table({
+                f"{entry['model']} @ {entry['endpoint']}": {
+                    "state": "error" if "error" in entry else entry["state"],
+                    "load (s)": f"{entry['seconds']:.2f}",
+                }
+                for entry in keep_warm.report
+            })
+        throughput = router.stats()
+        if throughput:
+            st.caption("Measured throughput (tokens/s)")
+            st.table({
+                model: {
+                    "prompt": f"{rates.get('prompt_tps', 0):.0f}",
+                    "decode": f"{rates.get('decode_tps', 0):.0f}",
+                }
+                for model, rates in throughput.items()
+            })
+        stats = scheduler.stats()
+        if stats:
+            st.caption("Queue")
+            st.table({
+                backend: {
+                    "in flight": f"{s['in_flight']}/{s['limit']}",
+                    "queued": s["queued"],
+                    "completed": s["completed"],
+                    "wait avg (s)": f"{s['wait_avg']:.2f}",
+                    "wait p95 (s)": f"{s['wait_p95']:.2f}",
+                }
+                for backend, s in stats.items()
+            })
+        if len(ollama_pool.endpoints) > 1:
+            st.caption("Ollama endpoints")
+            st.table({
+                url: {
+                    "healthy": e["healthy"],
+                    "outstanding": e["outstanding"],
+                    "loaded": ", ".join(e["loaded"]),
+                }
+                for url, e in ollama_pool.stats().items()
+            })
 
 
 def summarize_section(agent_manager):
@@ -46,9 +157,9 @@ def summarize_section(agent_manager):
             validator_agent = agent_manager.get_agent("SummarizeValidatorAgent")
             with st.spinner("Summarizing..."):
                 try:
-                    summary = main_agent.execute(text)
+                    summary = main_agent.execute(text, include_artifacts=True)
                     st.subheader("Summary:")
-                    st.write(summary)
+                    st.write({k: v for k, v in summary.items() if k != "artifacts"})
                 except Exception as e:
                     st.error(f"Error: {e}")
                     logger.error(f"SummarizeAgent Error: {e}")
@@ -72,14 +183,31 @@ def write_and_refine_article_section(agent_manager):
     st.header("Write and Refine Research Article")
     topic = st.text_input("Enter the topic for the research article:")
     outline = st.text_area("Enter an outline (optional):", height=150)
+    parallel = st.checkbox(
+        "Write sections in parallel",
+        help="Generate (or use) an outline and write all sections concurrently.",
+    )
+    targeted = st.checkbox(
+        "Refine only weak paragraphs",
+        help="Score paragraphs locally and rewrite only the ones that need it.",
+    )
+    pipelined = st.checkbox(
+        "Pipeline writing, refining and validation",
+        help="Refine and validate each section as soon as the writer finishes it.",
+    )
     if st.button("Write and Refine Article"):
         if topic:
-            writer_agent = agent_manager.get_agent("write_article")
-            refiner_agent = agent_manager.get_agent("refiner")
-            validator_agent = agent_manager.get_agent("validator")
+            writer_agent = agent_manager.get_agent("WriteArticleTool")
+            refiner_agent = agent_manager.get_agent("RefinerAgent")
+            validator_agent = agent_manager.get_agent("ValidatorAgent")
+            if pipelined:
+                pipelined_article_section(
+                    topic, outline, parallel, targeted, writer_agent, refiner_agent, validator_agent
+                )
+                return
             with st.spinner("Writing article..."):
                 try:
-                    draft = writer_agent.execute(topic, outline)
+                    draft = writer_agent.execute(topic, outline, parallel=parallel)
                     st.subheader("Draft Article:")
                     st.write(draft)
                 except Exception as e:
@@ -89,9 +217,16 @@ def write_and_refine_article_section(agent_manager):
 
             with st.spinner("Refining article..."):
                 try:
-                    refined_article = refiner_agent.execute(draft)
+                    if targeted:
+                        refinement = refiner_agent.refine_paragraphs(draft)
+                        refined_article = refinement["article"]
+                    else:
+                        refined_article = refiner_agent.execute(draft)
                     st.subheader("Refined Article:")
                     st.write(refined_article)
+                    if targeted:
+                        with st.expander(f"Changes ({len(refinement['refined'])} paragraphs refined)"):
+                            st.code(refinement["diff"] or "No changes", language="diff")
                 except Exception as e:
                     st.error(f"Refinement Error: {e}")
                     logger.error(f"RefinerAgent Error: {e}")
@@ -111,18 +246,64 @@ def write_and_refine_article_section(agent_manager):
             st.warning("Please enter a topic for the research article.")
 
 
+def pipelined_article_section(topic, outline, parallel, targeted, writer_agent, refiner_agent, validator_agent):
+    st.subheader("Article:")
+    stages = [
+        ("refine", lambda section: refiner_agent.refine_paragraphs(section, force=not targeted)["article"]),
+        ("validate", lambda refined: validator_agent.validate_section(topic, refined)),
+    ]
+    ratings = []
+    with st.spinner("Writing, refining and validating article..."):
+        try:
+            sections = writer_agent.iter_sections(topic, outline, parallel=parallel)
+            for draft, refined, validation in pipeline(sections, stages):
+                st.markdown(refined)
+                with st.expander("Draft and validation for this section"):
+                    st.markdown(draft)
+                    st.write(validation)
+                rating = SECTION_RATING.search(validation or "")
+                if rating:
+                    ratings.append(int(rating.group(1)))
+        except Exception as e:
+            st.error(f"Error: {e}")
+            logger.error(f"Article pipeline Error: {e}")
+            return
+
+    st.subheader("Validation:")
+    if ratings:
+        st.write(f"Average section rating: {sum(ratings) / len(ratings):.1f}/5 ({len(ratings)} sections rated)")
+    else:
+        st.write("No section ratings could be parsed from the validator output.")
+
+
 def sanitize_data_section(agent_manager):
     st.header("Sanitize Medical Data (PHI)")
     medical_data = st.text_area("Enter medical data to sanitize:", height=200)
+    mode = st.radio(
+        "Sanitization mode",
+        ["hybrid", "local", "llm"],
+        format_func=lambda x: {
+            "hybrid": "Hybrid (local rules, LLM for ambiguous spans)",
+            "local": "Local only (no LLM)",
+            "llm": "Full LLM review",
+        }.get(x, x),
+        horizontal=True,
+    )
     if st.button("Sanitize Data"):
         if medical_data:
             main_agent = agent_manager.get_agent("SanitizeDataTool")
             validator_agent = agent_manager.get_agent("SanitizeDataValidatorAgent")
             with st.spinner("Sanitizing data..."):
                 try:
-                    sanitized_data = main_agent.execute(medical_data)
+                    progress = st.progress(0.0, text="Reviewing chunks...")
+                    state = {}
+                    # Only progress while reviewing: chunks are final once every chunk's findings are in
+                    for done, total in main_agent.iter_sanitize(medical_data, mode=mode, state=state):
+                        progress.progress(done / total, text=f"Reviewed {done} of {total} chunks")
+                    progress.empty()
+                    sanitized_data = state["sanitized"]
                     st.subheader("Sanitized Data:")
-                    st.write(sanitized_data)
+                    st.text(sanitized_data)
                 except Exception as e:
                     st.error(f"Error: {e}")
                     logger.error(f"SanitizeDataAgent Error: {e}")
@@ -142,6 +323,36 @@ def sanitize_data_section(agent_manager):
             st.warning("Please enter medical data to sanitize.")
 
 
+def run_financial_pipeline(agent_manager, assets, period):
+    """
+    Run the financial report stages as a dependency graph
+    Market data and news are fetched concurrently and sentiment analysis
+    consumes news items as they arrive. Returns (market_data, analyzed_news,
+    report, timings).
+    """
+    market_agent = agent_manager.get_agent("MarketDataTool")
+    news_agent = agent_manager.get_agent("NewsFetcherTool")
+    sentiment_agent = agent_manager.get_agent("SentimentAnalyzerTool")
+    report_agent = agent_manager.get_agent("ReportGeneratorTool")
+
+    dag = DAGExecutor()
+    dag.add_stage("market_data", lambda: market_agent.execute(assets, period))
+    dag.add_stage("news", lambda: news_agent.iter_execute(assets, period))
+    dag.add_stage("sentiment", lambda news: sentiment_agent.iter_execute(news), streams=["news"])
+    # The report sees the same capped, most recent news as before the stages were pipelined
+    dag.add_stage("recent_news", lambda sentiment: news_agent.select_recent(sentiment), deps=["sentiment"])
+    dag.add_stage(
+        "report",
+        lambda market_data, recent_news: report_agent.execute(market_data, recent_news),
+        deps=["market_data", "recent_news"],
+    )
+    with tracer.span("pipeline.financial", kind="pipeline", assets=len(assets)):
+        results = dag.run()
+    logger.info(f"Financial pipeline timings: {dag.timings}")
+
+    return results["market_data"], results["recent_news"], results["report"], dag.timings
+
+
 def financial_analysis_section(agent_manager):
     st.header("Financial Digital Assets Analysis")
 
@@ -184,21 +395,9 @@ def financial_analysis_section(agent_manager):
         if assets:
             with st.spinner("Analyzing market data and news..."):
                 try:
-                    # 1. Fetch market data
-                    market_agent = agent_manager.get_agent("MarketDataTool")
-                    market_data = market_agent.execute(assets, period)
-                    
-                    # 2. Fetch news
-                    news_agent = agent_manager.get_agent("NewsFetcherTool")
-                    news_data = news_agent.execute(assets, period)
-                    
-                    # 3. Analyze sentiment
-                    sentiment_agent = agent_manager.get_agent("SentimentAnalyzerTool")
-                    analyzed_news = sentiment_agent.execute(news_data)
-                    
-                    # 4. Generate report
-                    report_agent = agent_manager.get_agent("ReportGeneratorTool")
-                    report = report_agent.execute(market_data, analyzed_news)
+                    market_data, analyzed_news, report, timings = run_financial_pipeline(
+                        agent_manager, assets, period
+                    )
                     
                     # Display market data
                     st.header("Market Overview")
@@ -249,6 +448,18 @@ def financial_analysis_section(agent_manager):
                     # Display AI analysis
                     st.header("AI Market Analysis")
                     st.markdown(report)
+
+                    with st.expander("Stage timings"):
+                        st.table([
+                            {
+                                "stage": stage,
+                                "start (s)": round(t["start"], 2),
+                                "first item (s)": round(t["first_item"], 2) if "first_item" in t else None,
+                                "end (s)": round(t["end"], 2),
+                                "duration (s)": round(t["duration"], 2),
+                            }
+                            for stage, t in timings.items()
+                        ])
                     
                 except Exception as e:
                     st.error(f"FinancialAnalysis Error: {str(e)}")
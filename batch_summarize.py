@@ -0,0 +1,206 @@
+# batch_summarize.py
+
+"""
+Headless batch summarization of medical notes.
+
+Streams records from a JSONL file ({"id": ..., "text": ...} per line) or a
+directory of .txt files, summarizes and validates them on a pool of worker
+processes with the spaCy models preloaded, and appends one JSON line per
+record to the output file as soon as it completes.
+
+    python batch_summarize.py notes.jsonl summaries.jsonl --workers 8
+    python batch_summarize.py notes_dir/ summaries.jsonl --resume
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, Set, Tuple
+
+from utils.logger import logger
+
+# Agents owned by each worker process, created once by _init_worker
+_summarizer = None
+_validator = None
+
+
+def _init_worker():
+    """Load the agents (and their spaCy models) once per worker process"""
+    global _summarizer, _validator
+    from agents.summarize_tool import SummarizeTool
+    from agents.summarize_validator_agent import SummarizeValidatorAgent
+
+    _summarizer = SummarizeTool(verbose=False)
+    # Records are already spread over processes, so chunked mode runs in-process
+    _summarizer.chunk_workers = 1
+    _validator = SummarizeValidatorAgent(verbose=False)
+    # Offline work queues behind interactive requests sharing the LLM backends
+    _summarizer.priority = _validator.priority = "batch"
+
+
+def _process_record(record_id: str, text: str, validate: bool) -> Dict:
+    started = time.perf_counter()
+    try:
+        summary = _summarizer.execute(text, include_artifacts=validate)
+        validation = _validator.execute(original_text=text, summary=summary) if validate else None
+        summary.pop("artifacts", None)
+        result = {"id": record_id, "summary": summary}
+        if validation is not None:
+            result["validation"] = validation
+    except Exception as e:
+        result = {"id": record_id, "error": str(e)}
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def iter_records(source: Path, id_field: str = "id", text_field: str = "text") -> Iterator[Tuple[str, str]]:
+    """Yield (id, text) pairs from a JSONL file or a directory of .txt files"""
+    if source.is_dir():
+        for path in sorted(source.rglob("*.txt")):
+            yield str(path.relative_to(source)), path.read_text(encoding="utf-8", errors="replace")
+        return
+
+    with open(source, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping invalid JSON on line {line_number}: {e}")
+                continue
+            record_id = str(record.get(id_field, line_number))
+            text = record.get(text_field)
+            if not text:
+                logger.warning(f"Skipping record {record_id}: no '{text_field}' field")
+                continue
+            yield record_id, text
+
+
+def load_checkpoint(output: Path) -> Set[str]:
+    """Ids already written successfully to the output file"""
+    done = set()
+    if not output.exists():
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if "error" not in result:
+                done.add(result["id"])
+    return done
+
+
+def truncate_partial_line(output: Path):
+    """Cut an interrupted run's unterminated last line, so appended records start on a line of their own"""
+    if not output.exists():
+        return
+    with open(output, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            block = min(65536, position)
+            f.seek(position - block)
+            newline = f.read(block).rfind(b"\n")
+            if newline != -1:
+                position = position - block + newline + 1
+                break
+            position -= block
+        if position < end:
+            logger.warning(f"Dropping {end - position} bytes of a partially written record from {output}")
+            f.truncate(position)
+
+
+def run_batch(source: Path, output: Path, workers: int, resume: bool = False, validate: bool = True,
+              id_field: str = "id", text_field: str = "text", report_every: int = 100) -> Dict:
+    """Summarize every record of source into output, returning run statistics"""
+    if resume:
+        truncate_partial_line(output)
+    completed_ids = load_checkpoint(output) if resume else set()
+    if completed_ids:
+        logger.info(f"Resuming: {len(completed_ids)} records already in {output}")
+
+    stats = {"processed": 0, "failed": 0, "skipped": 0}
+    started = time.perf_counter()
+    max_in_flight = workers * 4
+
+    def report():
+        elapsed = time.perf_counter() - started
+        rate = stats["processed"] / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"{stats['processed']} processed ({stats['failed']} failed, {stats['skipped']} skipped) "
+            f"in {elapsed:.1f}s - {rate:.1f} records/s"
+        )
+
+    def drain(done, out):
+        for future in done:
+            result = future.result()
+            out.write(json.dumps(result, default=str) + "\n")
+            stats["processed"] += 1
+            if "error" in result:
+                stats["failed"] += 1
+                logger.error(f"Record {result['id']} failed: {result['error']}")
+            if stats["processed"] % report_every == 0:
+                out.flush()
+                report()
+
+    with open(output, "a" if resume else "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = set()
+        for record_id, text in iter_records(source, id_field, text_field):
+            if record_id in completed_ids:
+                stats["skipped"] += 1
+                continue
+            pending.add(pool.submit(_process_record, record_id, text, validate))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                drain(done, out)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            drain(done, out)
+
+    report()
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch summarize medical notes")
+    parser.add_argument("source", type=Path, help="JSONL file or directory of .txt files")
+    parser.add_argument("output", type=Path, help="Output JSONL file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip records already written successfully to the output file")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Skip SummarizeValidatorAgent")
+    parser.add_argument("--id-field", default="id", help="JSONL field holding the record id")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the note text")
+    parser.add_argument("--report-every", type=int, default=100,
+                        help="Log throughput every N records")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        parser.error(f"{args.source} does not exist")
+
+    stats = run_batch(
+        args.source,
+        args.output,
+        workers=max(1, args.workers),
+        resume=args.resume,
+        validate=not args.no_validate,
+        id_field=args.id_field,
+        text_field=args.text_field,
+        report_every=max(1, args.report_every),
+    )
+    logger.info(f"Batch finished: {stats}")
+
+
+if __name__ == "__main__":
+    main()
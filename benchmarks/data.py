@@ -0,0 +1,140 @@
+# benchmarks/data.py
+# Seeded synthetic inputs, so benchmark runs are reproducible and need no network
+
+import random
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from typing import Dict, List
+from xml.sax.saxutils import escape
+
+import feedparser
+import numpy as np
+
+ASSETS = ["BTC-USD", "ETH-USD", "SOL-USD"]
+
+_COINS = [
+    ("BTC", "Bitcoin"), ("ETH", "Ethereum"), ("SOL", "Solana"), ("XRP", "Ripple"),
+    ("AAVE", "Aave"), ("LINK", "Chainlink"), ("UNI", "Uniswap"), ("AVAX", "Avalanche"),
+]
+_HEADLINES = [
+    "{name} rallies as institutional demand grows",
+    "{symbol} slips after regulators weigh new rules",
+    "Analysts see {name} testing resistance this week",
+    "{name} network upgrade draws record developer activity",
+    "Traders brace for {symbol} volatility ahead of options expiry",
+    "Exchange outflows of {symbol} hit a three-month high",
+    "Central bank comments weigh on equities and commodities",
+]
+_SENTENCES = [
+    "Patient {name} was admitted to {hospital} on {date} with chest pain and shortness of breath.",
+    "An ECG showed sinus tachycardia and troponin levels were mildly elevated.",
+    "The patient was started on aspirin {dose} mg and metoprolol {dose} mg twice daily.",
+    "Past medical history includes hypertension, type 2 diabetes and hyperlipidemia.",
+    "Follow-up with Dr. {doctor} in cardiology was scheduled for {date}.",
+    "Symptoms improved significantly after treatment and vital signs remained stable.",
+    "The patient denied smoking and reported occasional alcohol use.",
+    "Discharge instructions included a low-sodium diet and daily blood pressure monitoring.",
+]
+_NAMES = ["John Smith", "Jane Doe", "Maria Garcia", "Wei Chen", "Ahmed Khan"]
+_HOSPITALS = ["Mercy Hospital", "St. Mary's Medical Center", "Boston General"]
+
+
+def market_data(bars: int, seed: int = 0) -> Dict:
+    """Hourly prices (a geometric random walk), volumes and ISO timestamps ending now"""
+    rng = np.random.default_rng(seed)
+    prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    volumes = rng.lognormal(10, 0.5, bars)
+    end = datetime.now()
+    timestamps = [(end - timedelta(hours=bars - 1 - i)).isoformat() for i in range(bars)]
+    return {"prices": prices.tolist(), "volumes": volumes.tolist(), "timestamps": timestamps}
+
+
+def rss_feed(entries: int, seed: int = 0):
+    """A parsed RSS feed of entries published over the last 30 days"""
+    rng = random.Random(seed)
+    now = datetime.now().astimezone()
+    items = []
+    for i in range(entries):
+        symbol, name = rng.choice(_COINS)
+        title = rng.choice(_HEADLINES).format(symbol=symbol, name=name)
+        published = now - timedelta(minutes=rng.randrange(30 * 24 * 60))
+        items.append(
+            "<item>"
+            f"<title>{escape(title)}</title>"
+            f"<description>{escape(title)}. Market participants discussed {escape(name)} at length.</description>"
+            f"<link>https://news.example.com/{i}</link>"
+            f"<pubDate>{format_datetime(published)}</pubDate>"
+            "</item>"
+        )
+    xml = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Synthetic feed</title>{"".join(items)}</channel></rss>'
+    return feedparser.parse(xml)
+
+
+def news_items(count: int, seed: int = 0) -> List[Dict]:
+    """Articles in the shape NewsFetcherTool returns"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        symbol, name = rng.choice(_COINS[:3])
+        title = rng.choice(_HEADLINES).format(symbol=symbol, name=name)
+        items.append({
+            "title": title,
+            "description": f"{title}. Market participants discussed {name} and the wider crypto market.",
+            "url": f"https://news.example.com/{i}",
+            "publishedAt": datetime.now().isoformat(),
+            "source": {"name": "Synthetic feed"},
+            "asset": f"{symbol}-USD",
+        })
+    return items
+
+
+def medical_text(chars: int, seed: int = 0) -> str:
+    """Clinical-note-like text of about chars characters, in paragraphs of five sentences"""
+    rng = random.Random(seed)
+    sentences = []
+    length = 0
+    while length < chars:
+        sentence = rng.choice(_SENTENCES).format(
+            name=rng.choice(_NAMES),
+            hospital=rng.choice(_HOSPITALS),
+            date=f"March {rng.randint(1, 28)}",
+            dose=rng.choice([25, 50, 81, 100]),
+            doctor=rng.choice(_NAMES).split()[-1],
+        )
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "\n\n".join(paragraphs)
+
+
+def market_snapshot(assets: List[str] = None, seed: int = 0) -> Dict:
+    """Per-asset summaries in the shape MarketDataTool returns, without the historical records"""
+    rng = random.Random(seed)
+    snapshot = {}
+    for asset in assets or ASSETS:
+        price = rng.uniform(1, 60000)
+        snapshot[asset] = {
+            "current_price": price,
+            "price_change": rng.uniform(-15, 15),
+            "volume_24h": rng.uniform(1e6, 1e9),
+            "high": price * 1.2,
+            "low": price * 0.8,
+            "period": "1mo",
+            "start_date": (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"),
+            "end_date": datetime.now().strftime("%Y-%m-%d"),
+            "historical_data": [],
+        }
+    return snapshot
+
+
+def analyzed_news(count: int, seed: int = 0) -> List[Dict]:
+    """news_items with the sentiment SentimentAnalyzerTool adds"""
+    rng = random.Random(seed)
+    items = news_items(count, seed)
+    for item in items:
+        score = round(rng.uniform(-1, 1), 2)
+        item["sentiment_analysis"] = {
+            "score": score,
+            "explanation": "Positive" if score > 0 else "Negative" if score < 0 else "Neutral",
+        }
+    return items
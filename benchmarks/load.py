@@ -0,0 +1,173 @@
+# benchmarks/load.py
+#
+# Concurrent-session load test of the agent layer against the mock LLM server
+#
+#   python -m benchmarks.load --sessions 1,10,50 --scenario mixed
+#   python -m benchmarks.load --url http://gpu-box:11434 --scenario report   (an existing server)
+#
+# Each session replays pipeline runs back to back with its own agents, as a Streamlit session
+# would. Reports latency percentiles and throughput per concurrency level.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks import data
+from benchmarks.mock_llm import argument_parser, config_from_args, serve
+
+SCENARIOS = ("chat", "report", "article", "mixed")
+
+
+def _configure(url: str, mock: bool):
+    """Point both backends at url; must run before the agents are imported"""
+    os.environ["OLLAMA_BASE_URLS"] = url
+    os.environ["GROQ_API_BASE"] = f"{url}/v1/"
+    os.environ.setdefault("GROQ_API_KEY", "mock")
+    os.environ.setdefault("LLM_HEDGE", "false")
+    if mock:
+        # The mock has no quota; Groq's free-tier limits would otherwise dominate the curve
+        os.environ.setdefault("GROQ_RPM_LIMIT", "1000000")
+        os.environ.setdefault("GROQ_TPM_LIMIT", "1000000000")
+
+
+def _scenarios(priority: str) -> Dict[str, Callable[[], Callable[[int], None]]]:
+    """Per scenario, a factory building one session's agents, at priority, and returning its run function"""
+    from agents import RefinerAgent, ReportGeneratorTool, ValidatorAgent, WriteArticleTool
+
+    def at_priority(agent):
+        agent.priority = priority
+        return agent
+
+    def chat():
+        agent = at_priority(ValidatorAgent(verbose=False))
+        messages = [{"role": "user", "content": "Rate this market summary from 1 to 5."}]
+
+        def run(index):
+            if index % 2:
+                agent.call_openai(messages, max_tokens=64)
+            else:
+                agent.call_ollama(messages, max_tokens=64)
+        return run
+
+    def report():
+        agent = at_priority(ReportGeneratorTool(verbose=False))
+        market_data = data.market_snapshot()
+        analyzed_news = data.analyzed_news(30)
+        return lambda index: agent.execute(market_data, analyzed_news)
+
+    def article():
+        writer = at_priority(WriteArticleTool(verbose=False))
+        refiner = at_priority(RefinerAgent(verbose=False))
+        validator = at_priority(ValidatorAgent(verbose=False))
+
+        def run(index):
+            topic = f"Effects of interest rates on digital asset markets, part {index}"
+            draft = writer.execute(topic)
+            refined = refiner.execute(draft)
+            validator.execute(topic=topic, article=refined)
+        return run
+
+    def mixed():
+        runs = [chat(), report(), article()]
+        return lambda index: runs[index % len(runs)](index)
+
+    return {"chat": chat, "report": report, "article": article, "mixed": mixed}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def run_level(factory: Callable, sessions: int, runs_per_session: int) -> Dict:
+    """Run sessions concurrent sessions of runs_per_session runs each"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def session(number: int):
+        run = factory()
+        for index in range(runs_per_session):
+            started = time.perf_counter()
+            try:
+                run(number * runs_per_session + index)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(session, range(sessions)))
+    wall = time.perf_counter() - started
+    return {
+        "sessions": sessions,
+        "runs": len(latencies) + len(errors),
+        "errors": len(errors),
+        "first_errors": errors[:3],
+        "wall_s": wall,
+        "runs_per_s": len(latencies) / wall,
+        "p50_s": _percentile(latencies, 0.50),
+        "p95_s": _percentile(latencies, 0.95),
+        "p99_s": _percentile(latencies, 0.99),
+        "mean_s": statistics.mean(latencies) if latencies else 0.0,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Load test the agents against a mock LLM server", parents=[argument_parser(add_help=False)]
+    )
+    parser.add_argument("--url", help="use this server instead of starting the mock")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    parser.add_argument("--sessions", default="1,5,10,25,50", help="comma-separated concurrency levels")
+    parser.add_argument("--runs-per-session", type=int, default=3)
+    parser.add_argument("--priority", choices=("interactive", "default", "batch"), default="batch",
+                        help="scheduling class of the sessions' LLM calls")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = serve(config_from_args(args), args.host, args.port, background=True)
+        url = f"http://{args.host}:{server.server_port}"
+    _configure(url.rstrip("/"), mock=server is not None)
+    factory = _scenarios(args.priority)[args.scenario]
+
+    from utils.scheduler import scheduler
+
+    results = []
+    print(f"{args.scenario} scenario against {url}")
+    print(f"{'sessions':>8} {'runs':>6} {'errors':>6} {'runs/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for sessions in (int(level) for level in args.sessions.split(",")):
+        result = run_level(factory, sessions, args.runs_per_session)
+        result["scheduler"] = scheduler.stats()
+        if server is not None:
+            result["server"] = dict(server.llm.stats)
+        results.append(result)
+        print(
+            f"{sessions:>8} {result['runs']:>6} {result['errors']:>6} {result['runs_per_s']:>8.2f} "
+            f"{result['p50_s']:>7.2f}s {result['p95_s']:>7.2f}s {result['p99_s']:>7.2f}s",
+            flush=True,
+        )
+        for error in result["first_errors"]:
+            print(f"{'':>8} {error}")
+
+    if args.json:
+        args.json.write_text(json.dumps({"scenario": args.scenario, "url": url, "levels": results}, indent=2))
+    if server is not None:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+# benchmarks/mock_llm.py
+#
+# Stand-in LLM server speaking the Ollama and OpenAI chat protocols, for load tests without a GPU
+#
+#   python -m benchmarks.mock_llm --port 11500 --latency 0.3 --tps 40 --slots 4 --error-rate 0.02
+#
+# Point the app at it with OLLAMA_BASE_URLS=http://localhost:11500 and
+# GROQ_API_BASE=http://localhost:11500/v1/ (any GROQ_API_KEY works).
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+_WORDS = (
+    "market momentum remains constructive while volatility stays elevated and liquidity "
+    "conditions improve across major venues as investors weigh macro signals"
+).split()
+
+
+class MockLLMConfig:
+    """Latency, throughput and failure behaviour of the mock server; defaults from MOCK_LLM_* variables"""
+
+    def __init__(self, **overrides):
+        # Seconds before the first token, plus up to jitter seconds at random
+        self.latency = float(os.getenv("MOCK_LLM_LATENCY", "0.2"))
+        self.jitter = float(os.getenv("MOCK_LLM_JITTER", "0.05"))
+        # Prefill and decode speed
+        self.prompt_tps = float(os.getenv("MOCK_LLM_PROMPT_TPS", "1000"))
+        self.tps = float(os.getenv("MOCK_LLM_TPS", "50"))
+        # Reply length, capped by the request's max_tokens / num_predict
+        self.reply_tokens = int(os.getenv("MOCK_LLM_REPLY_TOKENS", "120"))
+        # Requests generated at once, like a GPU's batch; the rest wait
+        self.slots = int(os.getenv("MOCK_LLM_SLOTS", "4"))
+        # Fraction of requests failing with error_status (429 responses carry Retry-After)
+        self.error_rate = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+        self.error_status = int(os.getenv("MOCK_LLM_ERROR_STATUS", "500"))
+        self.models = os.getenv("MOCK_LLM_MODELS", "tinyllama:latest,llama-3.2-3b-preview").split(",")
+        for key, value in overrides.items():
+            if value is not None:
+                setattr(self, key, value)
+
+
+class MockLLM:
+    """Generation, queueing and statistics shared by all request handlers"""
+
+    def __init__(self, config: MockLLMConfig = None, seed: int = 0):
+        self.config = config or MockLLMConfig()
+        self._slots = threading.Semaphore(self.config.slots)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "in_flight": 0, "queued": 0, "completion_tokens": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def fail(self) -> bool:
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self._random.random() < self.config.error_rate
+            if failed:
+                self.stats["errors"] += 1
+            return failed
+
+    @staticmethod
+    def prompt_tokens(messages: List[Dict]) -> int:
+        return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 4 * len(messages)
+
+    def reply_tokens(self, max_tokens) -> List[str]:
+        count = min(self.config.reply_tokens, int(max_tokens or self.config.reply_tokens))
+        # Validators look for a rating, so every reply starts with one
+        words = ["Rating:", "4/5."] + [_WORDS[i % len(_WORDS)] for i in range(max(count - 2, 0))]
+        return [word + " " for word in words[:count]]
+
+    def generate(self, prompt_tokens: int, max_tokens) -> Iterator[str]:
+        """Yield reply tokens paced like a real server: queue, prefill, then decode at tps"""
+        self._count("queued")
+        with self._slots:
+            self._count("queued", -1)
+            self._count("in_flight")
+            try:
+                with self._lock:
+                    jitter = self._random.random() * self.config.jitter
+                time.sleep(self.config.latency + jitter + prompt_tokens / self.config.prompt_tps)
+                started = time.perf_counter()
+                for index, token in enumerate(self.reply_tokens(max_tokens)):
+                    # Sleep until this token is due, so pacing does not drift
+                    delay = started + index / self.config.tps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self._count("completion_tokens")
+                    yield token
+            finally:
+                self._count("in_flight", -1)
+
+
+def _handler(llm: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, body: Dict, headers: Dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _error(self):
+            status = llm.config.error_status
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            self._json(status, {"error": {"message": f"injected error {status}", "type": "mock_error"}}, headers)
+
+        def _start_stream(self, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def _chunk(self, data: str):
+            payload = data.encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        def _end_stream(self):
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": model} for model in llm.config.models]})
+            elif self.path == "/api/ps":
+                self._json(200, {"models": [{"name": model} for model in llm.config.models]})
+            elif self.path.rstrip("/") == "/v1/models":
+                self._json(200, {"object": "list", "data": [{"id": model, "object": "model"} for model in llm.config.models]})
+            elif self.path == "/stats":
+                with llm._lock:
+                    self._json(200, dict(llm.stats))
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/api/generate" and not body.get("prompt"):
+                # Warm-up request: only loads the model
+                self._json(200, {"model": body.get("model"), "response": "", "done": True})
+            elif self.path == "/api/chat":
+                self._ollama_chat(body)
+            elif self.path.rstrip("/") == "/v1/chat/completions":
+                self._openai_chat(body)
+            else:
+                self._json(404, {"error": "not found"})
+
+        def _ollama_chat(self, body: Dict):
+            if llm.fail():
+                self._error()
+                return
+            model = body.get("model")
+            prompt_tokens = llm.prompt_tokens(body.get("messages", []))
+            max_tokens = body.get("options", {}).get("num_predict")
+            started = time.perf_counter()
+            first_token = None
+            tokens = []
+
+            def message(content, done, **extra):
+                return {
+                    "model": model,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "message": {"role": "assistant", "content": content},
+                    "done": done,
+                    **extra,
+                }
+
+            def summary():
+                decode = time.perf_counter() - (first_token or started)
+                return {
+                    "done_reason": "stop",
+                    "total_duration": int((time.perf_counter() - started) * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_tokens / llm.config.prompt_tps * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(decode * 1e9),
+                }
+
+            if body.get("stream", True):
+                self._start_stream("application/x-ndjson")
+                for token in llm.generate(prompt_tokens, max_tokens):
+                    first_token = first_token or time.perf_counter()
+                    tokens.append(token)
+                    self._chunk(json.dumps(message(token, False)) + "\n")
+                self._chunk(json.dumps(message("", True, **summary())) + "\n")
+                self._end_stream()
+            else:
+                for token in llm.generate(prompt_tokens, max_tokens):
+                    first_token = first_token or time.perf_counter()
+                    tokens.append(token)
+                self._json(200, message("".join(tokens), True, **summary()))
+
+        def _openai_chat(self, body: Dict):
+            if llm.fail():
+                self._error()
+                return
+            model = body.get("model")
+            prompt_tokens = llm.prompt_tokens(body.get("messages", []))
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            started = time.perf_counter()
+            first_token = None
+            tokens = []
+
+            def usage():
+                return {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                    # Groq's timing fields, used for time to first token and throughput
+                    "prompt_time": prompt_tokens / llm.config.prompt_tps,
+                    "completion_time": time.perf_counter() - (first_token or started),
+                }
+
+            if body.get("stream"):
+                self._start_stream("text/event-stream")
+                for token in llm.generate(prompt_tokens, body.get("max_tokens")):
+                    first_token = first_token or time.perf_counter()
+                    tokens.append(token)
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                self._chunk(f"data: {json.dumps(final)}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self._end_stream()
+            else:
+                for token in llm.generate(prompt_tokens, body.get("max_tokens")):
+                    first_token = first_token or time.perf_counter()
+                    tokens.append(token)
+                self._json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage(),
+                })
+
+    return Handler
+
+
+def serve(config: MockLLMConfig = None, host: str = "127.0.0.1", port: int = 11500, background: bool = False):
+    """Start the mock server; with background=True it runs on a daemon thread and the server is returned"""
+    llm = MockLLM(config)
+    server = ThreadingHTTPServer((host, port), _handler(llm))
+    server.daemon_threads = True
+    server.llm = llm
+    if background:
+        threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+        return server
+    print(f"Mock LLM listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return server
+
+
+def argument_parser(add_help: bool = True) -> argparse.ArgumentParser:
+    """The server options; benchmarks.load reuses them for the mock it starts"""
+    parser = argparse.ArgumentParser(description="Mock Ollama / OpenAI chat server", add_help=add_help)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, help="random extra latency, up to this many seconds")
+    parser.add_argument("--tps", type=float, help="decode tokens per second per request")
+    parser.add_argument("--prompt-tps", type=float, help="prefill tokens per second")
+    parser.add_argument("--reply-tokens", type=int, help="reply length in tokens")
+    parser.add_argument("--slots", type=int, help="requests generated concurrently")
+    parser.add_argument("--error-rate", type=float, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, help="HTTP status of injected failures")
+    return parser
+
+
+def config_from_args(args) -> MockLLMConfig:
+    return MockLLMConfig(
+        latency=args.latency, jitter=args.jitter, tps=args.tps, prompt_tps=args.prompt_tps,
+        reply_tokens=args.reply_tokens, slots=args.slots,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+
+
+if __name__ == "__main__":
+    arguments = argument_parser().parse_args()
+    serve(config_from_args(arguments), arguments.host, arguments.port)
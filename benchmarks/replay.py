@@ -0,0 +1,107 @@
+# benchmarks/replay.py
+#
+# Deterministic end-to-end pipeline benchmarks from recorded interactions
+#
+#   python -m benchmarks.replay record --pipeline financial --cassette cassettes/financial.jsonl
+#   python -m benchmarks.replay replay --pipeline financial --cassette cassettes/financial.jsonl --latency zero -n 10
+#
+# Recording needs the network and the LLM backends; replaying needs neither. With
+# --latency recorded the replay keeps the recorded network and LLM timings, so only
+# local work varies; with --latency zero it measures the local work alone.
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from utils.cassette import Cassette
+
+PIPELINES = ("financial", "article")
+
+
+def _pipeline(name: str, assets: List[str], period: str, topic: str) -> Callable[[], Dict]:
+    """A function running one pipeline end to end and returning its stage timings"""
+    from agents import AgentManager
+    agent_manager = AgentManager(max_retries=2, verbose=False)
+
+    if name == "financial":
+        from app import run_financial_pipeline
+
+        def run():
+            _, _, _, timings = run_financial_pipeline(agent_manager, assets, period)
+            return {stage: t["end"] - t["start"] for stage, t in timings.items()}
+        return run
+
+    writer = agent_manager.get_agent("WriteArticleTool")
+    refiner = agent_manager.get_agent("RefinerAgent")
+    validator = agent_manager.get_agent("ValidatorAgent")
+
+    def run():
+        timings = {}
+        started = time.perf_counter()
+        draft = writer.execute(topic, parallel=True)
+        timings["write"] = time.perf_counter() - started
+        started = time.perf_counter()
+        article = refiner.refine_paragraphs(draft)["article"]
+        timings["refine"] = time.perf_counter() - started
+        started = time.perf_counter()
+        validator.execute(topic=topic, article=article)
+        timings["validate"] = time.perf_counter() - started
+        return timings
+    return run
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record or replay end-to-end pipeline runs")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("--pipeline", choices=PIPELINES, default="financial")
+    parser.add_argument("--cassette", type=Path, help="defaults to cassettes/<pipeline>.jsonl")
+    parser.add_argument("--latency", default="recorded", help="recorded, zero or a scale factor (replay only)")
+    parser.add_argument("-n", "--iterations", type=int, default=1)
+    parser.add_argument("--assets", default="BTC-USD,ETH-USD,SOL-USD")
+    parser.add_argument("--period", default="1mo")
+    parser.add_argument("--topic", default="The impact of interest rates on digital asset markets")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    path = args.cassette or Path("cassettes") / f"{args.pipeline}.jsonl"
+    if args.mode == "record" and path.exists():
+        # A cassette holds exactly one recording session
+        path.unlink()
+    cassette = Cassette(str(path), args.mode, args.latency).start()
+    run = _pipeline(args.pipeline, args.assets.split(","), args.period, args.topic)
+
+    totals = []
+    stages: Dict[str, List[float]] = {}
+    for iteration in range(args.iterations):
+        started = time.perf_counter()
+        timings = run()
+        totals.append(time.perf_counter() - started)
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+        print(f"run {iteration + 1}: {totals[-1]:.3f}s " + ", ".join(f"{s} {t:.3f}s" for s, t in timings.items()),
+              flush=True)
+    cassette.stop()
+
+    summary = {
+        "pipeline": args.pipeline,
+        "mode": args.mode,
+        "latency": args.latency,
+        "cassette": str(path),
+        "total": {"median_s": statistics.median(totals), "min_s": min(totals), "max_s": max(totals)},
+        "stages": {stage: statistics.median(values) for stage, values in stages.items()},
+        "misses": cassette.misses,
+    }
+    print(f"median {summary['total']['median_s']:.3f}s, best {summary['total']['min_s']:.3f}s over {len(totals)} runs")
+    if cassette.misses:
+        print(f"{len(cassette.misses)} requests were not in the cassette, e.g. {cassette.misses[0]}")
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+    return 1 if cassette.misses and args.mode == "replay" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# benchmarks/run.py
+#
+# Offline benchmarks for the CPU-bound agent hot paths
+#
+#   python -m benchmarks.run                  run everything and compare with the baselines
+#   python -m benchmarks.run --quick          small sizes only
+#   python -m benchmarks.run -k analyzer      only cases whose name contains "analyzer"
+#   python -m benchmarks.run --save           store the results as the new baselines
+#
+# The spaCy model en_core_web_sm must already be installed; nothing else touches the network.
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks import data
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+
+BAR_SIZES = [10, 1_000, 100_000, 1_000_000]
+# The validator parses every timestamp on its own, so it gets smaller inputs
+VALIDATOR_SIZES = [10, 1_000, 10_000]
+FEED_SIZES = [100, 1_000, 10_000]
+NEWS_SIZES = [10, 100, 1_000]
+TEXT_SIZES = [2_000, 20_000, 100_000]
+QUICK_LIMIT = {"bars": 10_000, "entries": 1_000, "articles": 100, "chars": 20_000}
+
+
+class Case:
+    """One benchmark: setup() builds the input outside the timing, run(input) is measured"""
+
+    def __init__(self, name: str, unit: str, size: int, setup: Callable, run: Callable):
+        self.name = name
+        self.unit = unit
+        self.size = size
+        self.setup = setup
+        self.run = run
+
+
+def _cases() -> List[Case]:
+    # Imported here so --help works without the NLP models
+    from agents.market_data_analyzer import MarketDataAnalyzer
+    from agents.market_data_validator_agent import MarketDataValidatorAgent
+    from agents.news_fetcher import NewsFetcherTool
+    from agents.sentiment_analyzer import SentimentAnalyzerTool
+    from agents.summarize_tool import SummarizeTool
+
+    analyzer = MarketDataAnalyzer(verbose=False)
+    validator = MarketDataValidatorAgent(verbose=False)
+    fetcher = NewsFetcherTool(verbose=False)
+    sentiment = SentimentAnalyzerTool(verbose=False)
+    summarizer = SummarizeTool(verbose=False)
+    asset_terms = fetcher._asset_terms(data.ASSETS)
+    cutoff = datetime.now() - timedelta(days=30)
+
+    cases = []
+    for bars in BAR_SIZES:
+        cases.append(Case(f"market_data_analyzer[{bars}]", "bars", bars,
+                          lambda bars=bars: data.market_data(bars), analyzer.execute))
+    for bars in VALIDATOR_SIZES:
+        cases.append(Case(f"market_data_validator[{bars}]", "bars", bars,
+                          lambda bars=bars: data.market_data(bars), validator.execute))
+    for entries in FEED_SIZES:
+        cases.append(Case(f"news_fetcher_match[{entries}]", "entries", entries,
+                          lambda entries=entries: data.rss_feed(entries),
+                          lambda feed: fetcher._match_entries(feed, "synthetic", asset_terms, cutoff)))
+    for articles in NEWS_SIZES:
+        cases.append(Case(f"sentiment_analyzer[{articles}]", "articles", articles,
+                          lambda articles=articles: data.news_items(articles), sentiment.execute))
+    for chars in TEXT_SIZES:
+        cases.append(Case(f"summarize_tool[{chars}]", "chars", chars,
+                          lambda chars=chars: data.medical_text(chars), summarizer.execute))
+    return cases
+
+
+def _workers() -> Dict[int, Tuple[int, int]]:
+    """(resident bytes, CPU ticks) of each live child process, e.g. the chunk pool; empty without /proc"""
+    workers = {}
+    for child in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{child.pid}/statm") as f:
+                resident = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            with open(f"/proc/{child.pid}/stat") as f:
+                # utime and stime, counted from after the parenthesised command name
+                fields = f.read().rsplit(")", 1)[1].split()
+            workers[child.pid] = (resident, int(fields[11]) + int(fields[12]))
+        except (OSError, ValueError, IndexError):
+            continue
+    return workers
+
+
+def _traced_run(case: Case, argument) -> Tuple[float, Optional[float]]:
+    """
+    Peak MB traced in this process and peak resident MB of the worker processes that did work
+    tracemalloc cannot see into worker processes, so their memory is sampled from /proc
+    while the case runs. Resident memory includes pages still shared with this process after
+    the fork, so compare it between runs rather than with peak_mb. The second value is None
+    when no worker used CPU time.
+    """
+    samples = []
+    stop = threading.Event()
+
+    def sample():
+        while True:
+            samples.append({pid: resident for pid, (resident, _) in _workers().items()})
+            if stop.wait(0.01):
+                return
+
+    before = _workers()
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    tracemalloc.start()
+    try:
+        case.run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        stop.set()
+        sampler.join()
+
+    busy = [pid for pid, (_, ticks) in _workers().items() if ticks != before.get(pid, (0, 0))[1]]
+    if not busy:
+        return peak / 2**20, None
+    return peak / 2**20, max(sum(sample.get(pid, 0) for pid in busy) for sample in samples) / 2**20
+
+
+def measure(case: Case, repeat: int, min_time: float) -> Dict:
+    """
+    Median and best wall time over up to repeat runs, throughput and peak memory
+    peak_mb is traced in this process only; workers_peak_mb is the resident memory of the
+    worker processes the case used (the chunked summarizer's pool), None if it used none.
+    """
+    argument = case.setup()
+    started = time.perf_counter()
+    case.run(argument)  # Warm-up, which also sizes the number of timed runs
+    first = time.perf_counter() - started
+    runs = max(1, min(repeat, int(min_time / first) if first > 0 else repeat))
+
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        case.run(argument)
+        times.append(time.perf_counter() - started)
+
+    # A separate run, because tracing allocations slows the code down
+    peak_mb, workers_peak_mb = _traced_run(case, argument)
+
+    median = statistics.median(times)
+    return {
+        "unit": case.unit,
+        "size": case.size,
+        "runs": runs,
+        "median_s": median,
+        "min_s": min(times),
+        "throughput": case.size / median if median > 0 else None,
+        "peak_mb": peak_mb,
+        "workers_peak_mb": workers_peak_mb,
+    }
+
+
+def compare(results: Dict[str, Dict], baselines: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Names of the cases whose median time regressed by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        ratio = result["median_s"] / baseline["median_s"]
+        result["vs_baseline"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the agent hot paths")
+    parser.add_argument("-k", dest="filter", help="only run cases whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="skip the large input sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="maximum timed runs per case")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds of timed runs to aim for per case")
+    parser.add_argument("--baselines", type=Path, default=BASELINES_FILE)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown that counts as a regression")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    cases = [
+        case for case in _cases()
+        if (not args.filter or args.filter in case.name)
+        and (not args.quick or case.size <= QUICK_LIMIT[case.unit])
+    ]
+    baselines = json.loads(args.baselines.read_text())["results"] if args.baselines.exists() else {}
+
+    results = {}
+    regressions = []
+    print(f"{'case':<34} {'median':>10} {'best':>10} {'throughput':>22} {'parent MB':>9} {'workers MB':>10} {'vs base':>8}")
+    for case in cases:
+        result = measure(case, args.repeat, args.min_time)
+        results[case.name] = result
+        regressions += compare({case.name: result}, baselines, args.tolerance)
+        ratio = f"{result['vs_baseline']:.2f}x" if "vs_baseline" in result else "-"
+        workers = f"{result['workers_peak_mb']:.1f}" if result["workers_peak_mb"] is not None else "-"
+        print(
+            f"{case.name:<34} {result['median_s'] * 1000:>8.1f}ms {result['min_s'] * 1000:>8.1f}ms "
+            f"{result['throughput']:>14,.0f} {case.unit + '/s':<7} {result['peak_mb']:>9.1f} {workers:>10} {ratio:>8}",
+            flush=True,
+        )
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.save:
+        # Merge, so a filtered or quick run only replaces the cases it ran
+        merged = dict(baselines)
+        merged.update({name: {k: v for k, v in r.items() if k != "vs_baseline"} for name, r in results.items()})
+        args.baselines.write_text(json.dumps({**report, "results": merged}, indent=2))
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+    if regressions:
+        print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
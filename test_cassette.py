@@ -0,0 +1,63 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils.cassette import Cassette
+
+
+class EchoTurnHandler(BaseHTTPRequestHandler):
+    """Replies reply0, reply1, ... in request order"""
+    count = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"reply": f"reply{EchoTurnHandler.count}"}).encode("utf-8")
+        EchoTurnHandler.count += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def record(path, prompts):
+    """Record prompts against a live server; returns its URL and the replies"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoTurnHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/chat"
+    try:
+        with Cassette(str(path), "record", "zero"):
+            return url, [requests.post(url, json={"prompt": prompt}).json()["reply"] for prompt in prompts]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def replay(path, url, prompts):
+    with Cassette(str(path), "replay", "zero") as cassette:
+        replies = [requests.post(url, json={"prompt": prompt}).json()["reply"] for prompt in prompts]
+    return replies, cassette.misses
+
+
+def test_cassette_replays_exact_matches(tmp_path):
+    path = tmp_path / "exact.jsonl"
+    url, recorded = record(path, ["a", "b", "c"])
+
+    replies, misses = replay(path, url, ["c", "a", "b"])
+    assert replies == [recorded[2], recorded[0], recorded[1]]
+    assert misses == []
+
+
+def test_cassette_serves_unmatched_bodies_in_turn(tmp_path):
+    path = tmp_path / "drift.jsonl"
+    url, recorded = record(path, ["a", "b", "c"])
+
+    # Prompts that drifted since the recording (timestamps, say) take the URL's recordings in turn
+    replies, misses = replay(path, url, ["x", "y", "z", "w"])
+    assert replies == recorded + recorded[:1]
+    assert misses == []
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+import requests
+
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def server_error(status=503):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+def test_opens_after_consecutive_backend_failures():
+    breaker = CircuitBreaker("mock", probe=lambda: True, failure_threshold=3, reset_timeout=60)
+    breaker.record_failure(server_error())
+    breaker.record_failure(server_error())
+    breaker.record_success()
+    breaker.record_failure(server_error())
+    breaker.record_failure(server_error())
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+    breaker.record_failure(requests.ConnectionError("refused"))
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_request_errors_do_not_count():
+    breaker = CircuitBreaker("mock", probe=lambda: True, failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(server_error(400))
+    breaker.record_failure(ValueError("malformed reply"))
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit():
+    healthy = [False]
+    probes = []
+
+    def probe():
+        probes.append(breaker.state)
+        return healthy[0]
+
+    breaker = CircuitBreaker("mock", probe=probe, failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure(server_error())
+    time.sleep(0.06)
+
+    # A failed probe keeps the circuit open for another reset_timeout
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert probes == [HALF_OPEN]
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert len(probes) == 1
+
+    time.sleep(0.06)
+    healthy[0] = True
+    breaker.before_call()
+    assert probes == [HALF_OPEN, HALF_OPEN]
+    assert breaker.status()["state"] == CLOSED
+    assert breaker.failures == 0
@@ -0,0 +1,53 @@
+import time
+
+import openai
+
+from agents.agent_base import AgentBase
+from benchmarks.mock_llm import MockLLMConfig, serve
+from utils.circuit_breaker import breakers
+from utils.hedging import latency_tracker
+from utils.ollama_pool import OllamaPool
+from utils.scheduler import scheduler
+
+
+class EchoAgent(AgentBase):
+    def execute(self):
+        pass
+
+
+def mock(latency):
+    server = serve(MockLLMConfig(latency=latency, jitter=0.0, tps=500, error_rate=0.0), port=0, background=True)
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def in_flight(backend):
+    return scheduler.stats().get(backend, {}).get("in_flight", 0)
+
+
+def test_hedge_releases_the_stalled_losers_slot(monkeypatch):
+    stalled, stalled_url = mock(latency=60)
+    fast, fast_url = mock(latency=0.05)
+    try:
+        monkeypatch.setattr(openai, "base_url", f"{fast_url}/v1/")
+        monkeypatch.setattr(openai, "api_key", "test")
+        monkeypatch.setattr(latency_tracker, "hedge_delay", lambda backend: 0.2)
+        agent = EchoAgent("EchoAgent", verbose=False)
+        agent.ollama_pool = OllamaPool(endpoints=[stalled_url])
+
+        reply = agent.call_ollama([{"role": "user", "content": "hello"}], max_tokens=5, hedge=True)
+        assert reply.startswith("Rating:")
+
+        # Ollama is still sleeping before its first token; the loser must not wait that out
+        deadline = time.monotonic() + 2
+        while in_flight("ollama") and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert in_flight("ollama") == 0
+        assert in_flight("openai") == 0
+        endpoint = agent.ollama_pool.stats()[stalled_url]
+        assert endpoint["outstanding"] == 0
+        assert endpoint["healthy"]
+        # Our own cancel is not a backend failure
+        assert breakers["ollama"].failures == 0
+    finally:
+        for server in (stalled, fast):
+            server.shutdown()
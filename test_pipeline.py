@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from utils.pipeline import DAGExecutor
+
+
+def test_streaming_consumer_starts_before_the_producer_finishes():
+    consumed_first = threading.Event()
+
+    def produce():
+        yield 1
+        # Only finishes once the consumer has seen the first item
+        assert consumed_first.wait(timeout=5)
+        yield 2
+        yield 3
+
+    def consume(numbers):
+        doubled = []
+        for number in numbers:
+            doubled.append(number * 2)
+            consumed_first.set()
+        return doubled
+
+    dag = DAGExecutor()
+    dag.add_stage("numbers", produce)
+    dag.add_stage("doubled", consume, streams=["numbers"])
+    dag.add_stage("summed", lambda numbers: sum(numbers), deps=["numbers"])
+    results = dag.run()
+
+    assert results == {"numbers": [1, 2, 3], "doubled": [2, 4, 6], "summed": 6}
+    assert dag.timings["numbers"]["first_item"] <= dag.timings["doubled"]["end"]
+    assert set(dag.timings) == {"numbers", "doubled", "summed", "total"}
+
+
+def test_dependency_failure_skips_dependents_and_reports_the_root_cause():
+    ran = []
+
+    def fail():
+        raise KeyError("no market data")
+
+    dag = DAGExecutor()
+    dag.add_stage("fetch", fail)
+    dag.add_stage("analyze", lambda fetch: ran.append("analyze"), deps=["fetch"])
+    dag.add_stage("report", lambda analyze: ran.append("report"), deps=["analyze"])
+    dag.add_stage("independent", lambda: ran.append("independent"))
+
+    with pytest.raises(KeyError, match="no market data"):
+        dag.run()
+    assert ran == ["independent"]
+
+
+def test_streaming_producer_failure_reaches_its_consumer():
+    def produce():
+        yield "headline"
+        raise RuntimeError("feed dropped")
+
+    seen = []
+
+    def consume(news):
+        for item in news:
+            seen.append(item)
+        return seen
+
+    dag = DAGExecutor()
+    dag.add_stage("news", produce)
+    dag.add_stage("sentiment", consume, streams=["news"])
+    with pytest.raises(RuntimeError, match="feed dropped"):
+        dag.run()
+    assert seen == ["headline"]
+
+
+def test_stages_must_follow_their_dependencies():
+    with pytest.raises(ValueError):
+        DAGExecutor().add_stage("report", lambda market: market, deps=["market"])
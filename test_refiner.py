@@ -0,0 +1,66 @@
+import pytest
+
+from agents import refiner_agent
+from agents.refiner_agent import RefinerAgent
+
+STRONG = (
+    "Interest rates shape the cost of capital for every market participant. When central banks tighten, "
+    "speculative assets usually lose the marginal buyer first. Digital assets have followed this pattern "
+    "closely since the last easing cycle ended."
+)
+WEAK = "Rates matter a lot and stuff"
+HEADING = "# Rates and digital assets"
+
+
+@pytest.fixture
+def refiner(monkeypatch):
+    monkeypatch.setattr(refiner_agent, "_paragraph_cache", refiner_agent.OrderedDict())
+    refiner = RefinerAgent(verbose=False)
+    refiner.calls = []
+
+    def refine(paragraph, feedback=None):
+        refiner.calls.append(paragraph)
+        return f"Refined: {paragraph}."
+    refiner._refine_paragraph = refine
+    return refiner
+
+
+def test_only_weak_paragraphs_are_refined(refiner):
+    result = refiner.refine_paragraphs("\n\n".join([HEADING, STRONG, WEAK]))
+    assert refiner.calls == [WEAK]
+    assert result["refined"] == [2]
+    assert result["article"].split("\n\n") == [HEADING, STRONG, f"Refined: {WEAK}."]
+
+
+def test_cached_refinements_are_reused_and_reported(refiner):
+    draft = "\n\n".join([STRONG, WEAK])
+    first = refiner.refine_paragraphs(draft)
+    refiner.calls.clear()
+
+    second = refiner.refine_paragraphs(draft)
+    assert refiner.calls == []
+    assert second["cache_hits"] == 2
+    assert second["article"] == first["article"]
+    # The weak paragraph still changed, from the cache
+    assert second["refined"] == [1]
+
+    # The refined article is accepted as it is in the next round
+    third = refiner.refine_paragraphs(second["article"])
+    assert refiner.calls == []
+    assert third["refined"] == []
+
+
+def test_feedback_bypasses_the_cache(refiner):
+    draft = "\n\n".join([HEADING, STRONG, WEAK])
+    refiner.refine_paragraphs(draft)
+    refiner.calls.clear()
+
+    result = refiner.refine_paragraphs(draft, feedback="Paragraph 2 needs a source for its claim.")
+    assert refiner.calls == [STRONG]
+    assert result["refined"] == [1, 2]
+
+
+def test_force_refines_everything_but_headings(refiner):
+    result = refiner.refine_paragraphs("\n\n".join([HEADING, STRONG, WEAK]), force=True)
+    assert sorted(refiner.calls) == sorted([STRONG, WEAK])
+    assert result["refined"] == [1, 2]
@@ -0,0 +1,83 @@
+import pytest
+import requests
+
+from benchmarks.mock_llm import MockLLMConfig, serve
+from utils import retry
+from utils.retry import RateLimiter, RetryPolicy
+
+
+class FakeClock:
+    """Stands in for the time module in utils.retry; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retry, "time", clock)
+    return clock
+
+
+def test_rate_limited_reply_is_retried_after_retry_after():
+    server = serve(MockLLMConfig(error_rate=1.0, error_status=429), port=0, background=True)
+    try:
+        response = requests.post(f"http://127.0.0.1:{server.server_port}/api/chat", json={"messages": []})
+        with pytest.raises(requests.HTTPError) as failure:
+            response.raise_for_status()
+    finally:
+        server.shutdown()
+
+    policy = RetryPolicy(base_delay=0.5, max_delay=30)
+    assert policy.is_retryable(failure.value)
+    assert policy.is_rate_limited(failure.value)
+    # The mock asks for one second; backoff only adds jitter on top
+    for attempt in (1, 5):
+        assert 1.0 <= policy.delay(failure.value, attempt) <= 1.5
+
+
+def test_groq_reset_headers_are_capped_at_max_delay():
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["x-ratelimit-reset-tokens"] = "2m59.56s"
+    policy = RetryPolicy(base_delay=0.5, max_delay=30)
+    assert 30.0 <= policy.delay(requests.HTTPError(response=response), 1) <= 30.5
+
+
+def test_client_errors_are_not_retried():
+    response = requests.Response()
+    response.status_code = 400
+    assert not RetryPolicy().is_retryable(requests.HTTPError(response=response))
+
+
+def test_requests_per_minute_window(clock):
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=10_000)
+    assert limiter.acquire(10) == 0
+    clock.sleep(15)
+    assert limiter.acquire(10) == 0
+    # The third request waits until the first leaves the window
+    assert limiter.acquire(10) == pytest.approx(45)
+
+
+def test_tokens_per_minute_window(clock):
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=100)
+    limiter.acquire(60)
+    clock.sleep(10)
+    limiter.acquire(30)
+    # 60 + 30 + 40 is over budget until the first reservation expires
+    assert limiter.acquire(40) == pytest.approx(50)
+    # Larger than the whole budget: runs alone once the window is empty
+    assert limiter.acquire(500) == pytest.approx(60)
+
+
+def test_pause_holds_every_caller_back(clock):
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=10_000)
+    limiter.pause(7)
+    assert limiter.acquire(10) == pytest.approx(7)
@@ -0,0 +1,90 @@
+import re
+
+import pytest
+import spacy
+
+from agents import sanitize_data_tool
+from agents.sanitize_data_tool import SanitizeDataTool
+
+
+class FindNames:
+    """Stands in for the LLM reply: lists the given names that occur whole in the reviewed text"""
+
+    def __init__(self, *names):
+        self.names = names
+        self.reviewed = []
+
+    def __call__(self, messages, **kwargs):
+        text = messages[-1]["content"]
+        self.reviewed.append(text)
+        found = [f"NAME: {name}" for name in self.names if re.search(rf"\b{name}\b", text)]
+        return "\n".join(found) or "NONE"
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    # NER is not under test here; a blank pipeline keeps the local pass to the regex rules
+    monkeypatch.setattr(sanitize_data_tool, "load_spacy", lambda: spacy.blank("en"))
+    tool = SanitizeDataTool(verbose=False)
+    tool.chunk_chars = 120
+    tool.chunk_overlap = 30
+    tool.chunk_workers = 2
+    return tool
+
+
+def filler(words):
+    return " ".join(["stable"] * words)
+
+
+def test_identifier_on_a_chunk_boundary_is_seen_whole(tool):
+    text = filler(15) + " Zorblax Quillon " + filler(60)
+    start, end = tool._split_ranges(text)[0]
+    # The first cut falls between first and last name...
+    assert "Zorblax" in text[start:end] and "Quillon" not in text[start:end]
+    tool.call_openai = FindNames("Zorblax Quillon")
+
+    result = tool.sanitize(text, mode="llm")
+    # ...but the overlapping windows show the full name to the LLM
+    assert any("Zorblax Quillon" in review for review in tool.call_openai.reviewed)
+    assert "Zorblax" not in result["sanitized"] and "Quillon" not in result["sanitized"]
+    assert result["redacted"] == {"NAME": 1}
+
+
+def test_placeholders_are_consistent_across_chunks(tool):
+    # Both names recur in every chunk; Quillon is only reported from the last chunk's review
+    chunks = [f"Visit {i} with Zorblax and Quillon, {filler(10)}." for i in range(6)]
+    text = "\n".join(chunks)
+    finder = FindNames("Zorblax")
+
+    def reply(messages, **kwargs):
+        names = finder(messages, **kwargs)
+        return names + "\nNAME: Quillon" if "Visit 5" in messages[-1]["content"] else names
+
+    tool.call_openai = reply
+    state = {}
+    progress = list(tool.iter_sanitize(text, mode="llm", state=state))
+    sanitized = state["sanitized"]
+
+    total = state["chunks"]
+    assert total > 2
+    assert progress[-1] == (total, total)
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+    assert "Zorblax" not in sanitized and "Quillon" not in sanitized
+    # Numbering follows the order reviews finish in, but every chunk uses the same two placeholders
+    pairs = {tuple(re.findall(r"\[NAME_\d\]", line)) for line in sanitized.splitlines()}
+    assert len(pairs) == 1
+    assert sorted(pairs.pop()) == ["[NAME_1]", "[NAME_2]"]
+
+
+def test_placeholders_map_is_opt_in(tool):
+    tool.call_openai = FindNames()
+    text = "Seen by Dr. Alvarez on 03/04/2024, SSN 123-45-6789."
+    assert "placeholders" not in tool.sanitize(text, mode="local")
+    placeholders = tool.sanitize(text, mode="local", include_placeholders=True)["placeholders"]
+    assert sorted(placeholders) == ["[DATE_1]", "[NAME_1]", "[SSN_1]"]
+
+
+def test_implausible_llm_findings_are_dropped(tool):
+    tool.call_openai = lambda messages, **kwargs: "OTHER: the\nOTHER: cough\nNAME: Nobody Here\nID: 4471"
+    findings = tool._llm_find_phi("Persistent cough, ticket 4471 closed by the nurse.")
+    assert findings == [("ID", "4471")]
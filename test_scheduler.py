@@ -0,0 +1,47 @@
+import threading
+import time
+
+from utils.scheduler import LLMScheduler
+
+
+def queue_waiter(scheduler, priority, order):
+    """Start a thread that takes a slot, notes its priority and hands the slot on; returns once it is queued"""
+    queued = scheduler.stats()["mock"]["queued"]
+
+    def run():
+        with scheduler.slot("mock", priority):
+            order.append(priority)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while scheduler.stats()["mock"]["queued"] == queued:
+        time.sleep(0.005)
+    return thread
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = LLMScheduler(limits={"mock": 1})
+    scheduler.acquire("mock", "interactive")
+    order = []
+    threads = [queue_waiter(scheduler, priority, order) for priority in ("batch", "default", "interactive", "batch")]
+
+    scheduler.release("mock")
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["interactive", "default", "batch", "batch"]
+    assert scheduler.stats()["mock"]["in_flight"] == 0
+
+
+def test_waiting_batch_work_is_promoted_by_aging():
+    scheduler = LLMScheduler(limits={"mock": 1}, aging_seconds=0.05)
+    scheduler.acquire("mock", "interactive")
+    order = []
+    threads = [queue_waiter(scheduler, "batch", order)]
+    # Two aging periods lift batch to interactive, where it was first in line
+    time.sleep(0.12)
+    threads.append(queue_waiter(scheduler, "interactive", order))
+
+    scheduler.release("mock")
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["batch", "interactive"]
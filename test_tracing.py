@@ -0,0 +1,41 @@
+import os
+import threading
+
+import pytest
+
+from utils.tracing import Tracer
+
+
+def flushes(tracer, timeout=5):
+    flusher = threading.Thread(target=tracer.flush, daemon=True)
+    flusher.start()
+    flusher.join(timeout)
+    return not flusher.is_alive()
+
+
+@pytest.mark.skipif(not os.path.exists("/dev/full"), reason="needs /dev/full")
+def test_flush_returns_when_spans_cannot_be_written():
+    tracer = Tracer()
+    # Every write fails once the file buffer fills, halfway through the backlog
+    tracer.trace_file = "/dev/full"
+    tracer.trace_file_max_bytes = 0
+    for index in range(200):
+        tracer._queue.put({"name": f"span-{index}", "padding": "x" * 200})
+    tracer._ensure_writer()
+    assert flushes(tracer)
+
+
+def test_trace_file_is_rotated(tmp_path):
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.trace_file = str(tmp_path / "traces.jsonl")
+    tracer.trace_file_max_bytes = 1000
+    for index in range(50):
+        with tracer.span(f"span-{index}"):
+            pass
+        assert flushes(tracer)
+
+    assert (tmp_path / "traces.jsonl.1").exists()
+    assert not (tmp_path / "traces.jsonl.2").exists()
+    # Each file holds at most one write beyond the cap
+    assert (tmp_path / "traces.jsonl").stat().st_size < 2000
@@ -0,0 +1,305 @@
+# utils/cassette.py
+
+import base64
+import hashlib
+import importlib
+import io
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import feedparser.http
+import pandas as pd
+import requests
+import yfinance as yf
+from loguru import logger
+from requests.structures import CaseInsensitiveDict
+
+# The OpenAI client's HTTP library: httpx, or httpx2 in newer releases
+HTTP_CLIENTS = []
+for _name in ("httpx", "httpx2"):
+    try:
+        HTTP_CLIENTS.append(importlib.import_module(_name))
+    except ImportError:
+        pass
+
+# The body is stored decoded, so these no longer describe it
+_BODY_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def _encode_body(body: bytes) -> Dict:
+    try:
+        return {"body": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(entry: Dict) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+def _body_hash(body) -> str:
+    """Hash of a request body, with JSON keys sorted so equal payloads match"""
+    if body is None:
+        return ""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return hashlib.sha1(body).hexdigest()
+
+
+def _chunks(body: bytes) -> List[bytes]:
+    """Split a body on lines, the unit of NDJSON and server-sent-event streams"""
+    return body.splitlines(keepends=True) or [body]
+
+
+class _ReplayRaw:
+    """Stands in for urllib3's response, yielding the body at the recorded pace"""
+
+    def __init__(self, body: bytes, delay: float):
+        self._chunks = _chunks(body)
+        self._delay = delay / len(self._chunks)
+
+    def stream(self, chunk_size=None, decode_content=True):
+        for chunk in self._chunks:
+            if self._delay:
+                time.sleep(self._delay)
+            yield chunk
+        self._chunks = []
+
+    def read(self, amt=None, decode_content=True):
+        return b"".join(self.stream())
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class Cassette:
+    """
+    Record or replay the outbound interactions of a run
+
+    In record mode every HTTP request made through requests (Ollama) and
+    httpx/httpx2 (the OpenAI client), every feed feedparser downloads and every
+    yfinance history is passed through and appended to a JSONL cassette. In replay mode
+    nothing leaves the process: requests are answered from the cassette, at the
+    recorded latency scaled by latency (0 for as fast as possible). Requests
+    match on method, URL and body; when the body differs (prompts with
+    timestamps, say) the recordings for the same URL are served in turn.
+    Unrecorded requests fail like an unreachable server.
+    """
+
+    def __init__(self, path: str = None, mode: str = None, latency=None):
+        self.path = path or os.getenv("CASSETTE_FILE", "cassettes/run.jsonl")
+        self.mode = mode or os.getenv("CASSETTE_MODE", "replay")
+        latency = latency if latency is not None else os.getenv("CASSETTE_LATENCY", "recorded")
+        self.latency = {"recorded": 1.0, "zero": 0.0}.get(latency, None)
+        if self.latency is None:
+            self.latency = float(latency)
+        self.misses: List[str] = []
+        self._exact: Dict[tuple, List[Dict]] = {}
+        self._loose: Dict[tuple, List[Dict]] = {}
+        self._turns: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._originals = None
+
+    def start(self):
+        """Install the hooks, once per process"""
+        with self._lock:
+            if self._originals is not None:
+                return self
+            if self.mode not in ("record", "replay"):
+                raise ValueError(f"Unknown cassette mode '{self.mode}', expected 'record' or 'replay'")
+            if self.mode == "replay":
+                self._load()
+            elif os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._originals = {
+                "requests": requests.adapters.HTTPAdapter.send,
+                "feed": feedparser.http.get,
+                "yfinance": yf.Ticker.history,
+            }
+            for client in HTTP_CLIENTS:
+                self._originals[client.__name__] = client.HTTPTransport.handle_request
+            self._install()
+        logger.info(f"[Cassette] {self.mode.capitalize()}ing {self.path}")
+        return self
+
+    def stop(self):
+        with self._lock:
+            if self._originals is None:
+                return
+            requests.adapters.HTTPAdapter.send = self._originals["requests"]
+            for client in HTTP_CLIENTS:
+                client.HTTPTransport.handle_request = self._originals[client.__name__]
+            feedparser.http.get = self._originals["feed"]
+            yf.Ticker.history = self._originals["yfinance"]
+            self._originals = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _load(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry: Dict):
+        self._exact.setdefault((entry["kind"], entry["key"], entry.get("body_sha1", "")), []).append(entry)
+        self._loose.setdefault((entry["kind"], entry["key"]), []).append(entry)
+
+    def _append(self, entry: Dict):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _find(self, kind: str, key: str, body_sha1: str = "") -> Optional[Dict]:
+        """The recording for this exact request, else the next one for the same URL"""
+        with self._lock:
+            # Exact hits take turns among identical requests, fallbacks among all requests to the URL
+            turn_key = (kind, key, body_sha1)
+            entries = self._exact.get(turn_key)
+            if not entries:
+                turn_key = (kind, key)
+                entries = self._loose.get(turn_key)
+            if not entries:
+                self.misses.append(f"{kind} {key}")
+                logger.warning(f"[Cassette] No recording for {kind} {key}")
+                return None
+            turn = self._turns.get(turn_key, 0)
+            self._turns[turn_key] = turn + 1
+            return entries[turn % len(entries)]
+
+    def _sleep(self, seconds: float):
+        if self.latency and seconds > 0:
+            time.sleep(seconds * self.latency)
+
+    def _install(self):
+        cassette = self
+        originals = self._originals
+
+        def adapter_send(adapter, request, *args, **kwargs):
+            key = f"{request.method} {request.url}"
+            body_sha1 = _body_hash(request.body)
+            if cassette.mode == "record":
+                started = time.perf_counter()
+                response = originals["requests"](adapter, request, *args, **kwargs)
+                ttfb = time.perf_counter() - started
+                # Read eagerly; iter_lines and friends serve the cached content afterwards
+                body = response.content
+                cassette._append({
+                    "kind": "http", "key": key, "body_sha1": body_sha1,
+                    "status": response.status_code, "reason": response.reason,
+                    "headers": dict(response.headers), **_encode_body(body),
+                    "ttfb": ttfb, "elapsed": time.perf_counter() - started,
+                })
+                return response
+            entry = cassette._find("http", key, body_sha1)
+            if entry is None:
+                raise requests.ConnectionError(f"Not in cassette: {key}", request=request)
+            cassette._sleep(entry["ttfb"])
+            response = requests.models.Response()
+            response.status_code = entry["status"]
+            response.reason = entry.get("reason")
+            response.headers = CaseInsensitiveDict(
+                {k: v for k, v in entry["headers"].items() if k.lower() not in _BODY_HEADERS}
+            )
+            response.raw = _ReplayRaw(_decode_body(entry), (entry["elapsed"] - entry["ttfb"]) * cassette.latency)
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response.connection = adapter
+            return response
+
+        def transport_handle_request(client):
+            class ReplayStream(client.SyncByteStream):
+                def __init__(self, body: bytes, delay: float):
+                    self._raw = _ReplayRaw(body, delay)
+
+                def __iter__(self):
+                    yield from self._raw.stream()
+
+            def handle_request(transport, request):
+                key = f"{request.method} {request.url}"
+                body_sha1 = _body_hash(request.read())
+                if cassette.mode == "record":
+                    started = time.perf_counter()
+                    response = originals[client.__name__](transport, request)
+                    ttfb = time.perf_counter() - started
+                    body = response.read()
+                    cassette._append({
+                        "kind": "http", "key": key, "body_sha1": body_sha1,
+                        "status": response.status_code, "headers": dict(response.headers), **_encode_body(body),
+                        "ttfb": ttfb, "elapsed": time.perf_counter() - started,
+                    })
+                    return response
+                entry = cassette._find("http", key, body_sha1)
+                if entry is None:
+                    raise client.ConnectError(f"Not in cassette: {key}", request=request)
+                cassette._sleep(entry["ttfb"])
+                return client.Response(
+                    entry["status"],
+                    headers={k: v for k, v in entry["headers"].items() if k.lower() not in _BODY_HEADERS},
+                    stream=ReplayStream(_decode_body(entry), (entry["elapsed"] - entry["ttfb"]) * cassette.latency),
+                    request=request,
+                )
+            return handle_request
+
+        def feed_get(url, etag=None, modified=None, agent=None, referrer=None, handlers=None,
+                     request_headers=None, result=None):
+            if cassette.mode == "record":
+                started = time.perf_counter()
+                before = set(result)
+                data = originals["feed"](url, etag, modified, agent, referrer, handlers, request_headers, result)
+                added = {k: v for k, v in result.items() if k not in before and k != "bozo_exception"}
+                cassette._append({
+                    "kind": "feed", "key": url, "result": json.loads(json.dumps(added, default=str)),
+                    **_encode_body(data or b""), "elapsed": time.perf_counter() - started,
+                })
+                return data
+            entry = cassette._find("feed", url)
+            if entry is None:
+                raise requests.ConnectionError(f"Not in cassette: feed {url}")
+            cassette._sleep(entry["elapsed"])
+            result.update(entry["result"])
+            return _decode_body(entry)
+
+        def ticker_history(ticker, *args, **kwargs):
+            key = f"{ticker.ticker} {json.dumps([args, kwargs], sort_keys=True, default=str)}"
+            if cassette.mode == "record":
+                started = time.perf_counter()
+                frame = originals["yfinance"](ticker, *args, **kwargs)
+                cassette._append({
+                    "kind": "yfinance", "key": key,
+                    "frame": frame.to_json(orient="split", date_format="iso", date_unit="ns"),
+                    "elapsed": time.perf_counter() - started,
+                })
+                return frame
+            entry = cassette._find("yfinance", key)
+            if entry is None:
+                raise requests.ConnectionError(f"Not in cassette: yfinance {key}")
+            cassette._sleep(entry["elapsed"])
+            return pd.read_json(io.StringIO(entry["frame"]), orient="split")
+
+        requests.adapters.HTTPAdapter.send = adapter_send
+        for client in HTTP_CLIENTS:
+            client.HTTPTransport.handle_request = transport_handle_request(client)
+        feedparser.http.get = feed_get
+        yf.Ticker.history = ticker_history
+
+
+# Driven by CASSETTE_MODE / CASSETTE_FILE / CASSETTE_LATENCY; started by the app when CASSETTE_MODE is set
+cassette = Cassette()
@@ -0,0 +1,133 @@
+# utils/circuit_breaker.py
+
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+import openai
+import requests
+from loguru import logger
+
+from utils.ollama_pool import ollama_pool
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that is known to be down"""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """Failures that say something about the backend, not about the request"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, openai.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status is not None and status >= 500
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a backend is down
+
+    After failure_threshold consecutive backend failures the circuit opens and
+    calls are refused. Once reset_timeout has passed, the next caller runs the
+    cheap probe (half-open): on success the circuit closes, otherwise it stays
+    open for another reset_timeout.
+    """
+
+    def __init__(self, name: str, probe: Callable[[], bool], failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+        self.reset_timeout = reset_timeout or float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the backend may be called"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if self.state == HALF_OPEN or remaining > 0:
+                raise CircuitOpenError(
+                    f"{self.name} is unavailable (circuit {self.state}, retry in {max(remaining, 0):.0f}s): {self.last_error}"
+                )
+            self.state = HALF_OPEN
+
+        try:
+            healthy = self.probe()
+        except Exception as e:
+            healthy = False
+            self.last_error = str(e)
+        with self._lock:
+            if healthy:
+                logger.info(f"[CircuitBreaker] {self.name} probe succeeded, closing circuit")
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        raise CircuitOpenError(f"{self.name} is unavailable (health probe failed): {self.last_error}")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = CLOSED
+
+    def record_failure(self, error: Exception):
+        if not is_backend_failure(error):
+            return
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state != OPEN and self.failures >= self.failure_threshold:
+                logger.warning(f"[CircuitBreaker] Opening {self.name} circuit after {self.failures} failures: {error}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def status(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": retry_in,
+                "last_error": self.last_error,
+            }
+
+
+def _probe_ollama() -> bool:
+    for endpoint in ollama_pool.endpoints:
+        try:
+            if requests.get(f"{endpoint}/api/tags", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            continue
+    return False
+
+
+def _probe_openai() -> bool:
+    base_url = str(openai.base_url or "").rstrip("/")
+    response = requests.get(
+        f"{base_url}/models",
+        headers={"Authorization": f"Bearer {openai.api_key}"},
+        timeout=3,
+    )
+    return response.status_code < 500
+
+
+breakers = {
+    "ollama": CircuitBreaker("Ollama", _probe_ollama),
+    "openai": CircuitBreaker("OpenAI", _probe_openai),
+}
@@ -0,0 +1,42 @@
+# utils/hedging.py
+
+import os
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyTracker:
+    """
+    Rolling time-to-first-token samples per backend
+    hedge_delay() is the backend's p95 once enough samples exist, LLM_HEDGE_DELAY before that.
+    """
+
+    def __init__(self, history: int = 200, min_samples: int = 20):
+        self.default_delay = float(os.getenv("LLM_HEDGE_DELAY", "2.0"))
+        self.min_samples = min_samples
+        self._history = history
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, backend: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(backend, deque(maxlen=self._history)).append(seconds)
+
+    def percentile(self, backend: str, fraction: float):
+        with self._lock:
+            samples = sorted(self._samples.get(backend, ()))
+        if not samples:
+            return None
+        return samples[int(fraction * (len(samples) - 1))]
+
+    def hedge_delay(self, backend: str) -> float:
+        with self._lock:
+            count = len(self._samples.get(backend, ()))
+        if count < self.min_samples:
+            return self.default_delay
+        return self.percentile(backend, 0.95)
+
+
+# Shared by every agent, so all calls to a backend feed one distribution
+latency_tracker = LatencyTracker()
@@ -1,6 +1,7 @@
 # utils/logger.py
 
 from loguru import logger
+import random
 import sys
 import os
 
@@ -8,7 +9,39 @@ import os
 if not os.path.exists("logs"):
     os.makedirs("logs")
 
+# Longest payload (message body, reply, data dump) written to the log
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "500"))
+# Fraction of calls whose payloads are logged at DEBUG level
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
 # Configure logger
+# enqueue=True hands records to a background thread, so request threads never wait on the sinks
 logger.remove()  # Remove the default logger
-logger.add(sys.stdout, level="INFO", format="<green>{time}</green> <level>{message}</level>")
-logger.add("logs/multi_agent_system.log", rotation="1 MB", retention="10 days", level="DEBUG", format="{time} {level} {message}")
\ No newline at end of file
+logger.add(
+    sys.stdout,
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="<green>{time}</green> <level>{message}</level>",
+    enqueue=True,
+)
+logger.add(
+    "logs/multi_agent_system.log",
+    rotation="1 MB",
+    retention="10 days",
+    level=os.getenv("LOG_FILE_LEVEL", "DEBUG"),
+    format="{time} {level} {message}",
+    enqueue=True,
+)
+
+
+def preview(value, limit: int = None) -> str:
+    """str(value) capped at limit (LOG_PAYLOAD_CHARS) characters"""
+    limit = limit or LOG_PAYLOAD_CHARS
+    text = str(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text) - limit} more chars)"
+
+
+def sample_payloads() -> bool:
+    """Whether to log this call's payloads, for LOG_PAYLOAD_SAMPLE_RATE of calls"""
+    return LOG_PAYLOAD_SAMPLE_RATE >= 1 or random.random() < LOG_PAYLOAD_SAMPLE_RATE
@@ -0,0 +1,106 @@
+# utils/model_router.py
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from utils.ollama_pool import model_key, ollama_pool
+
+ROUTES_FILE = Path(__file__).parent.parent / "model_routes.json"
+
+
+class ModelRouter:
+    """
+    Pick a model per call from the agent's routes, the prompt size and a latency SLO
+
+    model_routes.json lists, per agent and backend, candidate models in order of
+    preference, and a latency target (slo_seconds). The first candidate whose
+    context fits prompt + max_tokens and whose estimated latency meets the SLO is
+    used; when none meets it, the fastest one that fits. Latency estimates start
+    from the throughput priors in the file and follow measured tokens per second.
+    """
+
+    def __init__(self, routes_file: Path = None, defaults: Dict[str, str] = None):
+        self.defaults = defaults or {
+            "ollama": os.getenv("OLLAMA_MODEL", "tinyllama:latest").strip('"'),
+            "openai": os.getenv("GROQ_MODEL", "llama-3.2-3b-preview"),
+        }
+        routes_file = Path(os.getenv("MODEL_ROUTES_FILE", routes_file or ROUTES_FILE))
+        config = {}
+        if routes_file.exists():
+            with open(routes_file, "r") as f:
+                config = json.load(f)
+        self.default_slo = float(config.get("slo_seconds", 60))
+        self.profiles: Dict[str, Dict] = config.get("models", {})
+        self.routes: Dict[str, Dict] = config.get("agents", {})
+        self._measured: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _profile(self, model: str) -> Dict:
+        profile = {"context": 4096, "prompt_tps": 200.0, "decode_tps": 20.0, "overhead": 0.5}
+        profile.update(self.profiles.get(model, {}))
+        with self._lock:
+            profile.update(self._measured.get(model, {}))
+        return profile
+
+    def context_window(self, model: str) -> int:
+        """Tokens of prompt plus reply the model can attend to"""
+        return int(self._profile(model)["context"])
+
+    def estimate_latency(self, model: str, prompt_tokens: int, max_tokens: int) -> float:
+        """Seconds to prefill the prompt and decode max_tokens, a worst case for the reply"""
+        profile = self._profile(model)
+        return profile["overhead"] + prompt_tokens / profile["prompt_tps"] + max_tokens / profile["decode_tps"]
+
+    def _available(self, backend: str, model: str, default: str) -> bool:
+        if model == default or backend != "ollama":
+            return True
+        # Only route to Ollama models a server is known to have installed
+        installed = ollama_pool.installed_models()
+        return installed is not None and model_key(model) in installed
+
+    def candidates(self, backend: str, agent: str, default: str = None) -> List[str]:
+        """The agent's routed models that are available, or its default model"""
+        default = default or self.defaults[backend]
+        models = self.routes.get(agent, {}).get(backend) or [default]
+        return [model for model in models if self._available(backend, model, default)] or [default]
+
+    def routed_models(self, backend: str) -> List[str]:
+        """Every available model some agent may be routed to on backend"""
+        models = [self.defaults[backend]]
+        for agent in self.routes:
+            models.extend(m for m in self.candidates(backend, agent) if m not in models)
+        return models
+
+    def choose(self, backend: str, agent: str, prompt_tokens: int, max_tokens: int, default: str = None) -> str:
+        slo = float(self.routes.get(agent, {}).get("slo_seconds", self.default_slo))
+        candidates = self.candidates(backend, agent, default)
+        fitting = [m for m in candidates if prompt_tokens + max_tokens <= self._profile(m)["context"]] or candidates
+        for model in fitting:
+            if self.estimate_latency(model, prompt_tokens, max_tokens) <= slo:
+                return model
+        return min(fitting, key=lambda m: self.estimate_latency(m, prompt_tokens, max_tokens))
+
+    def record(self, model: str, prompt_tokens: int = 0, prompt_seconds: float = 0.0,
+               completion_tokens: int = 0, completion_seconds: float = 0.0, alpha: float = 0.3):
+        """Fold one call's measured throughput into the model's moving average"""
+        with self._lock:
+            measured = self._measured.setdefault(model, {})
+            for key, tokens, seconds in (
+                ("prompt_tps", prompt_tokens, prompt_seconds),
+                ("decode_tps", completion_tokens, completion_seconds),
+            ):
+                # Tiny samples are dominated by fixed costs
+                if tokens >= 8 and seconds > 0:
+                    rate = tokens / seconds
+                    measured[key] = rate if key not in measured else (1 - alpha) * measured[key] + alpha * rate
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {model: dict(values) for model, values in self._measured.items()}
+
+
+# Shared by every agent, so all calls to a model feed one measurement
+router = ModelRouter()
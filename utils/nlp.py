@@ -0,0 +1,21 @@
+# utils/nlp.py
+
+import os
+from functools import lru_cache
+
+import spacy
+from loguru import logger
+
+
+@lru_cache(maxsize=None)
+def load_spacy(model: str = "en_core_web_sm"):
+    """
+    The spaCy pipeline for model, loaded once per process and shared by all agents
+    Downloads the model if it is missing.
+    """
+    try:
+        return spacy.load(model)
+    except OSError:
+        logger.info("Downloading spaCy model...")
+        os.system(f"python -m spacy download {model}")
+        return spacy.load(model)
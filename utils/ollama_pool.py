@@ -0,0 +1,137 @@
+# utils/ollama_pool.py
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from loguru import logger
+
+
+def model_key(model: str) -> str:
+    """Ollama treats "name" and "name:latest" as the same model"""
+    return model if ":" in model else f"{model}:latest"
+
+
+class OllamaPool:
+    """
+    A set of Ollama servers used as one backend
+
+    Requests go to the healthy endpoint with the fewest outstanding requests,
+    preferring endpoints that already have the model loaded as long as they are
+    not more than affinity_slack requests busier. Endpoint health, installed
+    models and loaded models are refreshed from /api/tags and /api/ps every
+    health_interval seconds, in the background.
+    """
+
+    def __init__(self, endpoints: List[str] = None, health_interval: float = None, affinity_slack: int = None):
+        if endpoints is None:
+            urls = os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+            endpoints = [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+        self.endpoints = endpoints
+        self.health_interval = health_interval or float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))
+        self.affinity_slack = affinity_slack if affinity_slack is not None else int(os.getenv("OLLAMA_AFFINITY_SLACK", "2"))
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked_at = 0.0
+        self._turn = 0
+        self._state: Dict[str, Dict] = {
+            url: {"healthy": True, "outstanding": 0, "installed": None, "loaded": set()}
+            for url in endpoints
+        }
+
+    def _probe(self, url: str) -> Dict:
+        try:
+            tags = requests.get(f"{url}/api/tags", timeout=2)
+            tags.raise_for_status()
+            installed = {model_key(m["name"]) for m in tags.json().get("models", [])}
+            loaded = set()
+            try:
+                ps = requests.get(f"{url}/api/ps", timeout=2)
+                if ps.status_code == 200:
+                    loaded = {model_key(m["name"]) for m in ps.json().get("models", [])}
+            except requests.RequestException:
+                pass  # Older servers have no /api/ps
+            return {"healthy": True, "installed": installed, "loaded": loaded}
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"[OllamaPool] Health check failed for {url}: {e}")
+            return {"healthy": False}
+
+    def refresh(self):
+        """Probe every endpoint now"""
+        results = {url: self._probe(url) for url in self.endpoints}
+        with self._lock:
+            for url, result in results.items():
+                self._state[url].update(result)
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._checked_at < self.health_interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="ollama-pool-health", daemon=True).start()
+
+    def acquire(self, model: str) -> str:
+        """Pick an endpoint for model and count the request as outstanding there"""
+        if len(self.endpoints) > 1:
+            self._refresh_if_stale()
+        model = model_key(model)
+        with self._lock:
+            candidates = [url for url in self.endpoints if self._state[url]["healthy"]]
+            # With every endpoint marked down, try them all rather than fail without a request
+            candidates = candidates or list(self.endpoints)
+            serving = [url for url in candidates if self._state[url]["installed"] is None or model in self._state[url]["installed"]]
+            candidates = serving or candidates
+
+            self._turn += 1
+            # Rotate ties so equally loaded endpoints share the work
+            order = candidates[self._turn % len(candidates):] + candidates[:self._turn % len(candidates)]
+            least = min(order, key=lambda url: self._state[url]["outstanding"])
+            warm = [url for url in order if model in self._state[url]["loaded"]]
+            choice = least
+            if warm:
+                warmest = min(warm, key=lambda url: self._state[url]["outstanding"])
+                if self._state[warmest]["outstanding"] <= self._state[least]["outstanding"] + self.affinity_slack:
+                    choice = warmest
+            self._state[choice]["outstanding"] += 1
+            return choice
+
+    def release(self, url: str, model: str, error: Optional[Exception] = None):
+        """Finish a request; connection failures take the endpoint out until the next health check"""
+        with self._lock:
+            state = self._state[url]
+            state["outstanding"] -= 1
+            if error is None:
+                state["loaded"].add(model_key(model))
+            elif isinstance(error, (requests.ConnectionError, requests.Timeout)):
+                state["healthy"] = False
+                logger.warning(f"[OllamaPool] Marking {url} unhealthy: {error}")
+
+    def installed_models(self) -> Optional[set]:
+        """Models installed on any endpoint, or None before the first successful health check"""
+        with self._lock:
+            known = [state["installed"] for state in self._state.values() if state["installed"] is not None]
+        return set().union(*known) if known else None
+
+    def mark_loaded(self, url: str, model: str):
+        with self._lock:
+            if url in self._state:
+                self._state[url]["loaded"].add(model_key(model))
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                url: {
+                    "healthy": state["healthy"],
+                    "outstanding": state["outstanding"],
+                    "loaded": sorted(state["loaded"]),
+                }
+                for url, state in self._state.items()
+            }
+
+
+# Shared by every agent in the process
+ollama_pool = OllamaPool()
@@ -0,0 +1,161 @@
+# utils/pipeline.py
+
+import inspect
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple
+
+from utils.tracing import propagate, tracer
+
+_DONE = object()
+
+
+def _run_stages(item, stages: Sequence[Tuple[str, Callable]]) -> List:
+    outputs = [item]
+    for name, fn in stages:
+        with tracer.span(f"stage.{name}", kind="stage"):
+            outputs.append(fn(outputs[-1]))
+    return outputs
+
+
+def pipeline(source: Iterable, stages: Sequence[Tuple[str, Callable]], max_workers: int = 4) -> Iterator[List]:
+    """
+    Push every item from source through stages, given as (name, fn) pairs, as soon as it is produced
+    Yields [item, stage1_output, stage2_output, ...] per item, in source order.
+
+    The source is consumed on its own thread, so a slow producer (e.g. a
+    streamed LLM reply) keeps producing while earlier items are processed.
+    """
+    futures = queue.Queue()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def produce():
+            try:
+                for item in source:
+                    futures.put(executor.submit(propagate(_run_stages), item, stages))
+            except Exception as e:
+                futures.put(e)
+            finally:
+                futures.put(_DONE)
+
+        producer = threading.Thread(target=propagate(produce), daemon=True)
+        producer.start()
+        while True:
+            future = futures.get()
+            if future is _DONE:
+                break
+            if isinstance(future, Exception):
+                raise future
+            yield future.result()
+        producer.join()
+
+
+class _StageFailed(Exception):
+    pass
+
+
+class DAGExecutor:
+    """
+    Run named stages concurrently as soon as their dependencies are available
+
+    A stage whose function returns a generator is a streaming stage: consumers
+    that list it in streams receive an iterator over its items while it is
+    still running; consumers that list it in deps receive the list of all items.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add_stage(self, name: str, fn: Callable, deps: Sequence[str] = (), streams: Sequence[str] = ()):
+        """fn is called with the outputs of deps and streams as keyword arguments named after the stages"""
+        for dependency in list(deps) + list(streams):
+            if dependency not in self.stages:
+                # Stages must be added after their dependencies, which also rules out cycles
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = {"fn": fn, "deps": list(deps), "streams": list(streams)}
+        return self
+
+    def run(self) -> dict:
+        """Execute all stages and return their outputs by name; per-stage timings end up in self.timings"""
+        started = time.perf_counter()
+        results = {}
+        errors = {}
+        done = {name: threading.Event() for name in self.stages}
+        subscribers = {name: [] for name in self.stages}
+        inboxes = {}
+        for name, stage in self.stages.items():
+            for producer in stage["streams"]:
+                inbox = queue.Queue()
+                subscribers[producer].append(inbox)
+                inboxes[(name, producer)] = inbox
+        self.timings = {}
+
+        def consume(producer, inbox):
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                yield item
+            if producer in errors:
+                raise _StageFailed(f"Stage '{producer}' failed: {errors[producer]}")
+
+        def run_stage(name):
+            stage = self.stages[name]
+            timing = {}
+            try:
+                kwargs = {}
+                for dependency in stage["deps"]:
+                    done[dependency].wait()
+                    if dependency in errors:
+                        raise _StageFailed(f"Stage '{dependency}' failed: {errors[dependency]}")
+                    kwargs[dependency] = results[dependency]
+                for producer in stage["streams"]:
+                    kwargs[producer] = consume(producer, inboxes[(name, producer)])
+
+                timing["start"] = time.perf_counter() - started
+                with tracer.span(f"stage.{name}", kind="stage") as span:
+                    output = stage["fn"](**kwargs)
+                    if inspect.isgenerator(output):
+                        items = []
+                        for item in output:
+                            if not items:
+                                timing["first_item"] = time.perf_counter() - started
+                                span.mark_first_token()
+                            items.append(item)
+                            for inbox in subscribers[name]:
+                                inbox.put(item)
+                        output = items
+                        span.set(items=len(items))
+                results[name] = output
+            except Exception as e:
+                errors[name] = e
+            finally:
+                timing.setdefault("start", time.perf_counter() - started)
+                timing["end"] = time.perf_counter() - started
+                timing["duration"] = timing["end"] - timing["start"]
+                self.timings[name] = timing
+                for inbox in subscribers[name]:
+                    inbox.put(_DONE)
+                done[name].set()
+
+        threads = [
+            threading.Thread(target=propagate(run_stage), args=(name,), name=f"stage-{name}", daemon=True)
+            for name in self.stages
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total = time.perf_counter() - started
+        self.timings["total"] = {"start": 0.0, "end": total, "duration": total}
+
+        # Report the root cause rather than the failures it caused downstream
+        for name in self.stages:
+            if name in errors and not isinstance(errors[name], _StageFailed):
+                raise errors[name]
+        for error in errors.values():
+            raise error
+        return results
@@ -0,0 +1,188 @@
+# utils/profiler.py
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents")
+NO_AGENT = "(no agent)"
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("PROFILE", "false").lower() in ("1", "true", "yes")
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one pipeline run
+
+    A background thread snapshots every thread's stack each interval. Only the
+    thread that started the profiler and threads currently running agent code
+    are kept, so idle pool workers and background threads stay out of the
+    profile. Each sample is attributed to the innermost agent on its stack.
+    Results are written as a speedscope file and as folded stacks for
+    flamegraph.pl; top_functions() lists the hot functions per agent.
+    """
+
+    def __init__(self, name: str = "run", interval: float = None, output_dir: str = None):
+        self.name = name
+        self.interval = interval or float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", "logs/profiles")
+        # (thread name, stack of frame keys, agent) per sample, outermost frame first
+        self.samples: List[tuple] = []
+        self.duration = 0.0
+        self._frames: Dict[tuple, int] = {}
+        self._agent_code: Dict[object, bool] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._owner = None
+        self._started = 0.0
+
+    def _is_agent_code(self, code) -> bool:
+        known = self._agent_code.get(code)
+        if known is None:
+            known = os.path.abspath(code.co_filename).startswith(AGENTS_DIR)
+            self._agent_code[code] = known
+        return known
+
+    def _agent_of(self, frame) -> Optional[str]:
+        """Class name of the agent whose method this frame runs, if any"""
+        code = frame.f_code
+        if not self._is_agent_code(code) or code.co_varnames[:1] != ("self",):
+            return None
+        agent = frame.f_locals.get("self")
+        module = type(agent).__module__ or ""
+        return type(agent).__name__ if module.startswith("agents.") else None
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            stack = []
+            agent = None
+            while frame is not None:
+                code = frame.f_code
+                stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+                if agent is None:
+                    agent = self._agent_of(frame)
+                frame = frame.f_back
+            if ident != self._owner and agent is None:
+                continue
+            stack.reverse()
+            self.samples.append((names.get(ident, str(ident)), tuple(stack), agent or NO_AGENT))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception as e:
+                logger.error(f"[Profiler] Sampling failed: {e}")
+                return
+
+    def start(self):
+        self._owner = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _frame_index(self, frame: tuple) -> int:
+        if frame not in self._frames:
+            self._frames[frame] = len(self._frames)
+        return self._frames[frame]
+
+    def speedscope(self) -> Dict:
+        """The samples in speedscope's file format, one profile per thread"""
+        by_thread = defaultdict(list)
+        for thread, stack, _ in self.samples:
+            by_thread[thread].append([self._frame_index(frame) for frame in stack])
+        profiles = [
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": len(stacks) * self.interval,
+                "samples": stacks,
+                "weights": [self.interval] * len(stacks),
+            }
+            for thread, stacks in by_thread.items()
+        ]
+        frames = sorted(self._frames, key=self._frames.get)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "shared": {"frames": [{"name": name, "file": file, "line": line} for name, file, line in frames]},
+            "profiles": profiles,
+        }
+
+    def folded(self) -> str:
+        """Folded stacks ("agent;outer;...;inner count"), the input of flamegraph.pl"""
+        counts = Counter(
+            ";".join([agent] + [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack])
+            for _, stack, agent in self.samples
+        )
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def top_functions(self, n: int = None) -> Dict[str, List[Dict]]:
+        """Per agent, the n functions with the most samples on top of the stack (self) and anywhere (total)"""
+        n = n or int(os.getenv("PROFILE_TOP_N", "15"))
+        own = defaultdict(Counter)
+        total = defaultdict(Counter)
+        for _, stack, agent in self.samples:
+            if not stack:
+                continue
+            labels = [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack]
+            own[agent][labels[-1]] += 1
+            # Recursive functions count once per sample
+            total[agent].update(set(labels))
+        return {
+            agent: [
+                {
+                    "function": function,
+                    "self_s": round(count * self.interval, 3),
+                    "total_s": round(total[agent][function] * self.interval, 3),
+                }
+                for function, count in counter.most_common(n)
+            ]
+            for agent, counter in own.items()
+        }
+
+    def save(self) -> Dict[str, str]:
+        """Write the speedscope, folded-stack and hot-function files; returns their paths"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.name}")
+        paths = {
+            "speedscope": f"{base}.speedscope.json",
+            "folded": f"{base}.folded",
+            "top": f"{base}.top.json",
+        }
+        with open(paths["speedscope"], "w") as f:
+            json.dump(self.speedscope(), f)
+        with open(paths["folded"], "w") as f:
+            f.write(self.folded())
+        with open(paths["top"], "w") as f:
+            json.dump(self.top_functions(), f, indent=2)
+        logger.info(
+            f"[Profiler] {len(self.samples)} samples over {self.duration:.2f}s written to {paths['speedscope']}"
+        )
+        return paths
@@ -0,0 +1,153 @@
+# utils/retry.py
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import openai
+import requests
+
+# Status codes worth another attempt; any other 4xx is the request's own fault
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+CONNECTION_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    openai.APIConnectionError,  # Includes APITimeoutError
+)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After or the Groq reset headers"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    # Groq reports resets as durations such as "7.66s" or "2m59.56s"
+    for header in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(header)
+        if value:
+            seconds = _parse_duration(value)
+            if seconds is not None:
+                return seconds
+    return None
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    total = 0.0
+    number = ""
+    try:
+        for char in value:
+            if char.isdigit() or char == ".":
+                number += char
+            elif char == "h":
+                total, number = total + float(number) * 3600, ""
+            elif char == "m":
+                total, number = total + float(number) * 60, ""
+            elif char == "s":
+                total, number = total + float(number), ""
+        return total + (float(number) if number else 0.0)
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Decide whether a failed LLM call is retried, and after how long"""
+
+    def __init__(self, base_delay: float = None, max_delay: float = None):
+        self.base_delay = base_delay or float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+        self.max_delay = max_delay or float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, CONNECTION_ERRORS):
+            return True
+        status = _status_code(error)
+        # Errors without a status (e.g. a malformed reply) get the benefit of the doubt
+        return status is None or status in RETRYABLE_STATUS
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        return _status_code(error) == 429
+
+    def delay(self, error: Exception, attempt: int) -> float:
+        """Retry-After when the server sent one, otherwise full-jitter exponential backoff"""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and tokens, shared by all callers
+    acquire() blocks until the request fits both budgets; pause() holds everyone
+    back after the provider answered 429.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._tokens = 0
+        self._paused_until = 0.0
+
+    def _expire(self, now: float):
+        while self._window and now - self._window[0][0] >= 60:
+            _, tokens = self._window.popleft()
+            self._tokens -= tokens
+
+    def acquire(self, tokens: int) -> float:
+        """Reserve a request of tokens tokens; returns the seconds spent waiting"""
+        # A single request larger than the whole budget can only ever run alone
+        tokens = min(tokens, self.tokens_per_minute)
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if len(self._window) >= self.requests_per_minute:
+                        wait = 60 - (now - self._window[0][0])
+                    elif self._tokens + tokens > self.tokens_per_minute:
+                        # Wait until enough of the oldest reservations expire
+                        freed = self._tokens
+                        for stamp, reserved in self._window:
+                            freed -= reserved
+                            if freed + tokens <= self.tokens_per_minute:
+                                wait = 60 - (now - stamp)
+                                break
+                    else:
+                        self._window.append((now, tokens))
+                        self._tokens += tokens
+                        return now - started
+            time.sleep(max(wait, 0.01))
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+retry_policy = RetryPolicy()
+# Groq free-tier defaults; raise them for paid plans
+groq_rate_limiter = RateLimiter(
+    requests_per_minute=int(os.getenv("GROQ_RPM_LIMIT", "30")),
+    tokens_per_minute=int(os.getenv("GROQ_TPM_LIMIT", "6000")),
+)
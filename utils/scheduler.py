@@ -0,0 +1,122 @@
+# utils/scheduler.py
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+from utils.ollama_pool import ollama_pool
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2}
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of the LLM backends
+
+    Each backend has a concurrency cap; requests beyond it wait in a queue ordered
+    by priority class, then arrival. A waiting request is promoted one class for
+    every aging_seconds it has waited, so batch work cannot starve.
+    """
+
+    def __init__(self, limits: Dict[str, int] = None, aging_seconds: float = None, history: int = 500):
+        self.limits = {
+            # Two concurrent requests per Ollama server unless configured otherwise
+            "ollama": int(os.getenv("LLM_CONCURRENCY_OLLAMA", str(2 * len(ollama_pool.endpoints)))),
+            "openai": int(os.getenv("LLM_CONCURRENCY_OPENAI", "8")),
+        }
+        self.limits.update(limits or {})
+        self.aging_seconds = aging_seconds or float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "30"))
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._waiting = {}
+        self._in_flight = {}
+        self._completed = {}
+        self._waits = {}
+        self._history = history
+
+    def _backend_state(self, backend: str):
+        if backend not in self._waiting:
+            self._waiting[backend] = []
+            self._in_flight[backend] = 0
+            self._completed[backend] = 0
+            self._waits[backend] = deque(maxlen=self._history)
+
+    def _next_waiter(self, backend: str, now: float):
+        def rank(waiter):
+            promoted = int((now - waiter["queued_at"]) // self.aging_seconds)
+            return (max(waiter["priority"] - promoted, 0), waiter["sequence"])
+        return min(self._waiting[backend], key=rank)
+
+    def _grant(self, backend: str):
+        """Wake waiters while the backend has free slots; caller holds the lock"""
+        now = time.monotonic()
+        while self._waiting[backend] and self._in_flight[backend] < self.limits.get(backend, 1):
+            waiter = self._next_waiter(backend, now)
+            self._waiting[backend].remove(waiter)
+            self._in_flight[backend] += 1
+            waiter["event"].set()
+
+    def acquire(self, backend: str, priority: str = "default") -> float:
+        """Block until backend has a free slot; returns the seconds spent waiting"""
+        queued_at = time.monotonic()
+        waiter = {
+            "priority": PRIORITIES.get(priority, PRIORITIES["default"]),
+            "queued_at": queued_at,
+            "event": threading.Event(),
+        }
+        with self._lock:
+            self._backend_state(backend)
+            self._sequence += 1
+            waiter["sequence"] = self._sequence
+            self._waiting[backend].append(waiter)
+            self._grant(backend)
+        waiter["event"].wait()
+        waited = time.monotonic() - queued_at
+        with self._lock:
+            self._waits[backend].append(waited)
+        return waited
+
+    def release(self, backend: str):
+        with self._lock:
+            self._in_flight[backend] -= 1
+            self._completed[backend] += 1
+            self._grant(backend)
+
+    @contextmanager
+    def slot(self, backend: str, priority: str = "default"):
+        """Hold one of backend's slots for the duration of the with block"""
+        self.acquire(backend, priority)
+        try:
+            yield
+        finally:
+            self.release(backend)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Queue depth, in-flight requests and recent wait times per backend"""
+        with self._lock:
+            stats = {}
+            for backend in self._waiting:
+                waits = sorted(self._waits[backend])
+                depth = {name: 0 for name in PRIORITIES}
+                for waiter in self._waiting[backend]:
+                    name = next(n for n, value in PRIORITIES.items() if value == waiter["priority"])
+                    depth[name] += 1
+                stats[backend] = {
+                    "limit": self.limits.get(backend, 1),
+                    "in_flight": self._in_flight[backend],
+                    "queued": len(self._waiting[backend]),
+                    "queued_by_priority": depth,
+                    "completed": self._completed[backend],
+                    "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                    "wait_max": waits[-1] if waits else 0.0,
+                }
+            return stats
+
+
+# Shared by every agent and Streamlit session in the process
+scheduler = LLMScheduler()
@@ -0,0 +1,65 @@
+# utils/tokens.py
+
+import re
+from typing import Iterable, List
+
+# Words, digit runs and single punctuation marks roughly map to BPE pieces
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens text takes up in a llama-style tokenizer
+    Long words and numbers split into several pieces; errs on the high side.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for piece in TOKEN_PIECE.findall(text):
+        if piece[0].isalpha():
+            tokens += 1 + (len(piece) - 1) // 5
+        elif piece[0].isdigit():
+            tokens += 1 + (len(piece) - 1) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    """Tokens of a chat message list, including a few per message for the chat template"""
+    return sum(estimate_tokens(str(message.get("content", ""))) + 4 for message in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a sentence boundary when one is close enough"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = " ".join(words[:low])
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1]
+    return cut + "..."
+
+
+def pack_lines(lines: Iterable[str], budget: int) -> List[str]:
+    """
+    Take lines in order for as long as they fit in budget tokens
+    Lines that do not fit are skipped, so a shorter one further down can still get in.
+    """
+    packed = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            continue
+        packed.append(line)
+        used += cost
+    return packed
@@ -0,0 +1,281 @@
+# utils/tracing.py
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def incr(self, key: str, amount: int = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+        return self
+
+    def mark_first_token(self, seconds_ago: float = 0.0):
+        """Record time-to-first-token once; seconds_ago backdates it, e.g. by the decode time"""
+        elapsed = time.perf_counter() - self._started - seconds_ago
+        self.attributes.setdefault("ttft_ms", max(elapsed, 0.0) * 1000)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": self.duration * 1000 if self.duration is not None else None,
+            "error": self.error,
+            **self.attributes,
+        }
+
+
+class _NoSpan:
+    """Stands in for current_span() outside any span, so callers need no checks"""
+
+    def set(self, **attributes):
+        return self
+
+    def incr(self, key: str, amount: int = 1):
+        return self
+
+    def mark_first_token(self, seconds_ago: float = 0.0):
+        pass
+
+
+class _Metrics:
+    """Aggregates finished spans into Prometheus counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[tuple, list] = {}
+        self._counters: Dict[tuple, float] = {}
+
+    def _observe(self, metric: str, labels: tuple, value: float):
+        key = (metric, labels)
+        histogram = self._durations.setdefault(key, [0] * len(DURATION_BUCKETS) + [0, 0.0])
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram[index] += 1
+        histogram[-2] += 1
+        histogram[-1] += value
+
+    def _count(self, metric: str, labels: tuple, value: float = 1):
+        self._counters[(metric, labels)] = self._counters.get((metric, labels), 0) + value
+
+    def record(self, span: Span):
+        labels = (("kind", span.kind), ("name", span.name))
+        with self._lock:
+            self._observe("span_duration_seconds", labels, span.duration)
+            if span.error:
+                self._count("span_errors_total", labels)
+            attributes = span.attributes
+            if "ttft_ms" in attributes:
+                self._observe("time_to_first_token_seconds", labels, attributes["ttft_ms"] / 1000)
+            for key in ("prompt_tokens", "completion_tokens", "retries", "cache_hits"):
+                if attributes.get(key):
+                    self._count(f"{key}_total", labels, attributes[key])
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for metric in sorted({m for m, _ in self._durations}):
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, labels), histogram in self._durations.items():
+                    if name != metric:
+                        continue
+                    for bound, count in zip(DURATION_BUCKETS, histogram):
+                        lines.append(f"{metric}_bucket{label_text(labels, [('le', bound)])} {count}")
+                    lines.append(f"{metric}_bucket{label_text(labels, [('le', '+Inf')])} {histogram[-2]}")
+                    lines.append(f"{metric}_count{label_text(labels)} {histogram[-2]}")
+                    lines.append(f"{metric}_sum{label_text(labels)} {histogram[-1]}")
+            for metric in sorted({m for m, _ in self._counters}):
+                lines.append(f"# TYPE {metric} counter")
+                for (name, labels), value in self._counters.items():
+                    if name == metric:
+                        lines.append(f"{metric}{label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """
+    Spans around agents, LLM calls and pipeline stages
+
+    Finished spans are appended to a JSONL file (TRACE_FILE) by a background
+    writer and aggregated into Prometheus metrics. TRACING=false turns spans
+    into no-ops. Once the file reaches TRACE_FILE_MAX_BYTES it is moved to
+    TRACE_FILE.1, replacing the previous one (0 never rotates).
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("TRACING", "true").lower() in ("1", "true", "yes")
+        self.trace_file = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+        self.trace_file_max_bytes = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.metrics = _Metrics()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._server = None
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_spans, name="trace-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _write_spans(self):
+        while True:
+            spans = [self._queue.get()]
+            # Write whatever else queued up in the same go
+            while True:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                directory = os.path.dirname(self.trace_file)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._rotate()
+                with open(self.trace_file, "a") as f:
+                    for span in spans:
+                        f.write(json.dumps(span, default=str) + "\n")
+            except Exception as e:
+                logger.error(f"[Tracer] Could not write {len(spans)} spans: {e}")
+            finally:
+                # Every span taken is settled, written or not, so flush() cannot hang
+                for _ in spans:
+                    self._queue.task_done()
+
+    def _rotate(self):
+        if not self.trace_file_max_bytes:
+            return
+        try:
+            if os.path.getsize(self.trace_file) >= self.trace_file_max_bytes:
+                os.replace(self.trace_file, f"{self.trace_file}.1")
+        except FileNotFoundError:
+            pass
+
+    def flush(self):
+        """Wait until every finished span has been written"""
+        self._queue.join()
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", activate: bool = True, **attributes):
+        """
+        Time the with block as a child of the current span
+        activate=False keeps the span out of the context, for spans held across a generator's yields.
+        """
+        if not self.enabled:
+            yield _NoSpan()
+            return
+        span = Span(name, kind, _current_span.get(), attributes)
+        token = _current_span.set(span) if activate else None
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._started
+            if token is not None:
+                _current_span.reset(token)
+            self.metrics.record(span)
+            self._ensure_writer()
+            self._queue.put(span.to_dict())
+
+    def traced(self, name: str = None, kind: str = "internal"):
+        """Decorator form of span()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name or fn.__qualname__, kind):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def start_metrics_server(self, port: int, host: str = None):
+        """
+        Serve the metrics in Prometheus text format on /metrics, once per process
+        Listens on METRICS_HOST, localhost by default; set 0.0.0.0 for a scraper on another machine.
+        """
+        host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+        with self._writer_lock:
+            if self._server is not None:
+                return
+            tracer = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip("/") != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = tracer.metrics.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info(f"[Tracer] Serving metrics on {host}:{port}/metrics")
+
+
+def current_span():
+    """The innermost active span, or a no-op stand-in"""
+    return _current_span.get() or _NoSpan()
+
+
+def propagate(fn: Callable) -> Callable:
+    """Run fn in a copy of the caller's context, so spans it opens on another thread keep their parent"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+tracer = Tracer()
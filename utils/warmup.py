@@ -0,0 +1,100 @@
+# utils/warmup.py
+
+import os
+import threading
+import time
+from typing import Dict, List
+
+import requests
+from loguru import logger
+
+from utils.model_router import router
+from utils.ollama_pool import model_key, ollama_pool
+
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def warmup_models() -> List[str]:
+    """OLLAMA_MODEL, the installed models agents are routed to, and OLLAMA_WARMUP_MODELS"""
+    models = router.routed_models("ollama")
+    for model in os.getenv("OLLAMA_WARMUP_MODELS", "").split(","):
+        model = model.strip().strip('"')
+        if model and model_key(model) not in map(model_key, models):
+            models.append(model)
+    return models
+
+
+def _loaded_models(endpoint: str) -> set:
+    try:
+        response = requests.get(f"{endpoint}/api/ps", timeout=2)
+        if response.status_code == 200:
+            return {model_key(m["name"]) for m in response.json().get("models", [])}
+    except (requests.RequestException, ValueError):
+        pass
+    return set()
+
+
+def warm_up(models: List[str] = None, endpoints: List[str] = None) -> List[Dict]:
+    """
+    Load every model on every Ollama endpoint with an empty request and pin it with keep_alive
+    Returns one entry per (endpoint, model): whether it was already resident and the load time.
+    """
+    if models is None:
+        # Learn which models are installed, so routed models can be included
+        ollama_pool.refresh()
+        models = warmup_models()
+    endpoints = endpoints or ollama_pool.endpoints
+    report = []
+    for endpoint in endpoints:
+        loaded = _loaded_models(endpoint)
+        for model in models:
+            entry = {"endpoint": endpoint, "model": model, "state": "warm" if model_key(model) in loaded else "cold"}
+            started = time.perf_counter()
+            try:
+                # An empty prompt only loads the model; keep_alive resets its unload timer
+                response = requests.post(
+                    f"{endpoint}/api/generate",
+                    json={"model": model, "prompt": "", "keep_alive": KEEP_ALIVE, "stream": False},
+                    timeout=(5, 600),
+                )
+                response.raise_for_status()
+                ollama_pool.mark_loaded(endpoint, model)
+            except requests.RequestException as e:
+                entry["error"] = str(e)
+            entry["seconds"] = time.perf_counter() - started
+            report.append(entry)
+            logger.info(
+                f"[Warmup] {model} on {endpoint}: {entry['state']}, {entry['seconds']:.2f}s"
+                + (f" ({entry['error']})" if "error" in entry else "")
+            )
+    return report
+
+
+class KeepWarm:
+    """Run warm_up at startup and then every interval seconds, on a background thread"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or float(os.getenv("OLLAMA_WARMUP_INTERVAL", "600"))
+        self.report: List[Dict] = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        threading.Thread(target=self._run, name="ollama-keep-warm", daemon=True).start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.report = warm_up()
+            except Exception as e:
+                logger.error(f"[Warmup] Warm-up failed: {e}")
+            time.sleep(self.interval)
+
+
+# One per process, however many Streamlit sessions start it
+keep_warm = KeepWarm()